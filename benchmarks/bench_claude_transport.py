@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Claude transport benchmark - request latency of each way of reaching Claude
+
+Compares, for the same mock reply latency:
+
+- spawn:        one `claude --print` process per request (the old path)
+- pool:         a warm stream-json worker from ClaudeWorkerPool
+- proxy:        POST /claude over ClaudeProxyClient's keep-alive pool
+- proxy-fresh:  POST /claude on a new connection per request
+
+Uses benchmarks/mock_claude_cli.py as the CLI (its --startup-ms stands in
+for Node.js and CLI start-up) and runs benchmarks/mock_claude_proxy.py
+in-process, so no Claude install is needed.
+
+Run from the repository root:
+    python -m benchmarks.bench_claude_transport --requests 20 --startup-ms 1500 --latency-ms 300
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+import httpx
+import uvicorn
+
+from benchmarks.mock_claude_proxy import create_app
+from src.claude_pool import ClaudeWorkerPool
+from src.claude_proxy_client import ClaudeProxyClient
+
+MOCK_CLI = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mock_claude_cli.py')
+PROXY_PORT = 8765
+
+
+async def spawn_request(args, prompt):
+    process = await asyncio.create_subprocess_exec(
+        MOCK_CLI, '--print', prompt, '--startup-ms', str(args.startup_ms), '--latency-ms', str(args.latency_ms),
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    )
+    await process.communicate()
+
+
+async def time_requests(request, count):
+    """Latencies in seconds of `count` sequential requests"""
+    latencies = []
+    for index in range(count):
+        started = time.perf_counter()
+        await request(f"request {index}")
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def report(name, latencies):
+    latencies = sorted(latencies)
+    p50 = latencies[len(latencies) // 2]
+    p95 = latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)]
+    mean = sum(latencies) / len(latencies)
+    print(f"  {name:12s} mean {mean * 1000:8.1f} ms   p50 {p50 * 1000:8.1f} ms   p95 {p95 * 1000:8.1f} ms")
+
+
+async def run(args):
+    server = uvicorn.Server(uvicorn.Config(
+        create_app(args.latency_ms, 0.0, 0.0), host='127.0.0.1', port=PROXY_PORT, log_level='warning'
+    ))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    print(f"{args.requests} sequential requests, startup {args.startup_ms:g} ms, "
+          f"reply latency {args.latency_ms:g} ms:")
+    try:
+        report("spawn", await time_requests(lambda prompt: spawn_request(args, prompt), args.requests))
+
+        pool = ClaudeWorkerPool(MOCK_CLI, size=1, extra_args=[
+            '--startup-ms', str(args.startup_ms), '--latency-ms', str(args.latency_ms)
+        ])
+        await pool.start()
+        # The bot starts the pool in on_ready, long before the first utterance
+        await asyncio.sleep(args.startup_ms / 1000.0 + 0.2)
+        try:
+            report("pool", await time_requests(lambda prompt: pool.request(prompt, 'bench'), args.requests))
+        finally:
+            await pool.stop()
+
+        proxy = ClaudeProxyClient(f"http://127.0.0.1:{PROXY_PORT}")
+        await proxy.warm_up()
+        try:
+            report("proxy", await time_requests(lambda prompt: proxy.request(prompt), args.requests))
+        finally:
+            await proxy.close()
+
+        async def fresh_request(prompt):
+            async with httpx.AsyncClient() as client:
+                await client.post(f"http://127.0.0.1:{PROXY_PORT}/claude", json={"text": prompt})
+        report("proxy-fresh", await time_requests(fresh_request, args.requests))
+    finally:
+        server.should_exit = True
+        await server_task
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare Claude transport latency")
+    parser.add_argument('--requests', type=int, default=20)
+    parser.add_argument('--startup-ms', type=float, default=1500.0)
+    parser.add_argument('--latency-ms', type=float, default=300.0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Resampler benchmark - CPU cost and aliasing of the 48kHz -> 16kHz path
+
+Compares the old `audio_array[::3]` decimation with the streaming
+PolyphaseResampler, both fed 20ms Discord-sized chunks, and reports the CPU
+time spent per second of audio plus how much of an out-of-band tone leaks
+into the 16kHz output.
+
+Run from the repository root:
+    python -m benchmarks.bench_resampler
+"""
+
+import time
+
+import numpy as np
+
+from src.audio_dsp import int16_to_float32, pcm16_to_array
+from src.resampler import PolyphaseResampler
+
+SAMPLE_RATE = 48000
+CHUNK_SAMPLES = 960  # 20ms of 48kHz mono
+AUDIO_SECONDS = 60
+
+
+def slice_decimate(chunks):
+    """Baseline: int16 -> float32 then keep every 3rd sample"""
+    for chunk in chunks:
+        int16_to_float32(pcm16_to_array(chunk))[::3]
+
+
+def polyphase_resample(chunks):
+    """Stateful polyphase FIR, one call per 20ms chunk"""
+    resampler = PolyphaseResampler(SAMPLE_RATE, 16000)
+    for chunk in chunks:
+        resampler.process_pcm16(chunk)
+
+
+def cpu_ms_per_audio_second(func, chunks, repeats=5):
+    """Best-of-N process CPU time, normalized per second of input audio"""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.process_time()
+        func(chunks)
+        best = min(best, time.process_time() - start)
+    return best * 1000 / AUDIO_SECONDS
+
+
+def alias_level_db(tone_hz):
+    """Output level (dBFS relative to input) of a tone above the 8kHz output Nyquist"""
+    t = np.arange(SAMPLE_RATE) / SAMPLE_RATE
+    tone = (0.5 * np.sin(2 * np.pi * tone_hz * t)).astype(np.float32)
+    reference_rms = np.sqrt(np.mean(tone ** 2))
+
+    sliced = tone[::3]
+    filtered = PolyphaseResampler(SAMPLE_RATE, 16000).process(tone)[100:]
+
+    to_db = lambda x: 20 * np.log10(max(np.sqrt(np.mean(x ** 2)), 1e-12) / reference_rms)
+    return to_db(sliced), to_db(filtered)
+
+
+def main():
+    rng = np.random.default_rng(0)
+    audio = (rng.standard_normal(SAMPLE_RATE * AUDIO_SECONDS) * 3000).astype('<i2').tobytes()
+    chunk_bytes = CHUNK_SAMPLES * 2
+    chunks = [audio[i:i + chunk_bytes] for i in range(0, len(audio), chunk_bytes)]
+
+    print(f"CPU per second of audio ({AUDIO_SECONDS}s input, 20ms chunks):")
+    print(f"  [::3] slicing      {cpu_ms_per_audio_second(slice_decimate, chunks):8.3f} ms")
+    print(f"  polyphase FIR      {cpu_ms_per_audio_second(polyphase_resample, chunks):8.3f} ms")
+
+    print("Alias leakage into 16kHz output:")
+    for tone_hz in (10000, 12000, 15000):
+        sliced_db, filtered_db = alias_level_db(tone_hz)
+        print(f"  {tone_hz:5d} Hz tone    slicing {sliced_db:7.1f} dB   polyphase {filtered_db:7.1f} dB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Mock ASR server - stand-in for the whisper webservice when testing routing
+
+Serves GET /docs and POST /asr like onerahmet/openai-whisper-asr-webservice,
+answering after a configurable latency with a canned transcript that names the
+port, so it is easy to see which backend served each segment. A failure rate
+makes it return 503s so backend ejection and probing can be exercised.
+
+Run several from the repository root, e.g.:
+    python -m benchmarks.mock_asr_server --port 9101 --latency-ms 150
+    python -m benchmarks.mock_asr_server --port 9102 --latency-ms 600
+    python -m benchmarks.mock_asr_server --port 9103 --fail-rate 0.5
+
+then point `whisper.backends` in config/stt_config.json at them:
+    "backends": ["http://localhost:9101", "http://localhost:9102", "http://localhost:9103"]
+
+Kill one mid-run to watch it being ejected and restart it to see it probed
+back in.
+"""
+
+import argparse
+import asyncio
+import random
+
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request
+
+
+def create_app(port: int, latency_ms: float, jitter_ms: float, fail_rate: float) -> FastAPI:
+    """Build the mock webservice app"""
+    app = FastAPI(title=f"Mock ASR :{port}")
+    app.state.requests = 0
+
+    @app.post("/asr")
+    async def asr(request: Request):
+        body = await request.body()
+        app.state.requests += 1
+
+        delay = max(latency_ms + random.uniform(-jitter_ms, jitter_ms), 0.0) / 1000.0
+        await asyncio.sleep(delay)
+
+        if random.random() < fail_rate:
+            raise HTTPException(status_code=503, detail="mock failure")
+
+        return {
+            "text": f"mock transcript {app.state.requests} from port {port} ({len(body)} bytes)",
+            "language": request.query_params.get('language', 'en')
+        }
+
+    @app.get("/stats")
+    async def stats():
+        return {"port": port, "requests": app.state.requests}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock whisper /asr backend")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9101)
+    parser.add_argument('--latency-ms', type=float, default=300.0)
+    parser.add_argument('--jitter-ms', type=float, default=50.0)
+    parser.add_argument('--fail-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    app = create_app(args.port, args.latency_ms, args.jitter_ms, args.fail_rate)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
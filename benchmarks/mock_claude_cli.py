@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Mock Claude CLI - stand-in for the `claude` executable in latency benchmarks
+
+Understands the two ways the bot drives the CLI:
+
+    mock_claude_cli.py --print "prompt"                       (one process per request)
+    mock_claude_cli.py --print --input-format stream-json \\
+        --output-format stream-json --verbose [--include-partial-messages]
+
+Process startup sleeps for --startup-ms to stand in for Node.js start-up and
+CLI initialisation, and every reply takes --latency-ms, so spawning per
+request can be compared with the warm worker pool and the proxy transport.
+"""
+
+import argparse
+import json
+import sys
+import time
+import uuid
+
+
+def reply_for(prompt: str, turn: int) -> str:
+    return f"Mock reply {turn}. You said: {prompt}. That is all."
+
+
+def run_stream_json(args):
+    session_id = args.resume or str(uuid.uuid4())
+    print(json.dumps({"type": "system", "subtype": "init", "session_id": session_id}), flush=True)
+
+    for turn, line in enumerate(sys.stdin, start=1):
+        message = json.loads(line)
+        prompt = ''.join(block.get('text', '') for block in message['message']['content'])
+        time.sleep(args.latency_ms / 1000.0)
+        reply = reply_for(prompt, turn)
+
+        if args.include_partial_messages:
+            print(json.dumps({"type": "stream_event", "session_id": session_id,
+                              "event": {"type": "content_block_start",
+                                        "content_block": {"type": "text", "text": ""}}}), flush=True)
+            for start in range(0, len(reply), 8):
+                print(json.dumps({"type": "stream_event", "session_id": session_id,
+                                  "event": {"type": "content_block_delta",
+                                            "delta": {"type": "text_delta", "text": reply[start:start + 8]}}}),
+                      flush=True)
+        print(json.dumps({"type": "assistant", "session_id": session_id,
+                          "message": {"role": "assistant", "content": [{"type": "text", "text": reply}]}}),
+              flush=True)
+        print(json.dumps({"type": "result", "subtype": "success", "is_error": False,
+                          "result": reply, "session_id": session_id}), flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock Claude CLI")
+    parser.add_argument('prompt', nargs='?')
+    parser.add_argument('--print', action='store_true')
+    parser.add_argument('--input-format', default='text')
+    parser.add_argument('--output-format', default='text')
+    parser.add_argument('--verbose', action='store_true')
+    parser.add_argument('--include-partial-messages', action='store_true')
+    parser.add_argument('--resume')
+    parser.add_argument('--startup-ms', type=float, default=1500.0)
+    parser.add_argument('--latency-ms', type=float, default=300.0)
+    args, _ = parser.parse_known_args()
+
+    time.sleep(args.startup_ms / 1000.0)
+
+    if args.input_format == 'stream-json':
+        run_stream_json(args)
+    else:
+        time.sleep(args.latency_ms / 1000.0)
+        print(reply_for(args.prompt or sys.stdin.read(), 1))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Mock Claude proxy - stand-in for claude_proxy.py when testing the proxy transport
+
+Serves POST /claude, POST /claude/stream and GET /health with the same
+request and response shapes as claude_proxy.py, answering after a
+configurable latency with a canned reply (streamed word by word on
+/claude/stream), so the bot's proxy transport (connection reuse, timeouts,
+retries) can be exercised without the Claude CLI. A failure rate makes it
+return 503s to exercise retries.
+
+Run from the repository root:
+    python -m benchmarks.mock_claude_proxy --port 8001 --latency-ms 300
+
+then set "transport": "proxy" in config/claude_config.json (the URL comes
+from proxy.url or CLAUDE_PROXY_URL, default http://localhost:8001).
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import uuid
+from typing import Optional
+
+import uvicorn
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+
+class ClaudeRequest(BaseModel):
+    text: str
+    session_id: Optional[str] = None
+    is_command: bool = False
+
+
+def create_app(latency_ms: float, jitter_ms: float, fail_rate: float) -> FastAPI:
+    """Build the mock proxy app"""
+    app = FastAPI(title="Mock Claude Proxy")
+    app.state.requests = 0
+
+    @app.post("/claude")
+    async def claude(request: ClaudeRequest):
+        app.state.requests += 1
+
+        delay = max(latency_ms + random.uniform(-jitter_ms, jitter_ms), 0.0) / 1000.0
+        await asyncio.sleep(delay)
+
+        if random.random() < fail_rate:
+            raise HTTPException(status_code=503, detail="mock failure")
+
+        return {
+            "response": f"Mock reply {app.state.requests}. You said: {request.text}",
+            "session_id": request.session_id or str(uuid.uuid4()),
+            "success": True,
+            "error": None
+        }
+
+    @app.post("/claude/stream")
+    async def claude_stream(request: ClaudeRequest):
+        app.state.requests += 1
+        if random.random() < fail_rate:
+            raise HTTPException(status_code=503, detail="mock failure")
+
+        session_id = request.session_id or str(uuid.uuid4())
+        reply = f"Mock reply {app.state.requests}. You said: {request.text}"
+        delay = max(latency_ms + random.uniform(-jitter_ms, jitter_ms), 0.0) / 1000.0
+        words = reply.split(' ')
+
+        async def lines():
+            yield json.dumps({"type": "session", "session_id": session_id}) + "\n"
+            for index, word in enumerate(words):
+                await asyncio.sleep(delay / len(words))
+                text = word if index == 0 else ' ' + word
+                yield json.dumps({"type": "text", "text": text}) + "\n"
+            yield json.dumps({"type": "done", "response": reply, "session_id": session_id,
+                              "success": True, "error": None}) + "\n"
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy", "claude_available": True, "requests": app.state.requests}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock claude_proxy.py")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--latency-ms', type=float, default=300.0)
+    parser.add_argument('--jitter-ms', type=float, default=50.0)
+    parser.add_argument('--fail-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    app = create_app(args.latency_ms, args.jitter_ms, args.fail_rate)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,26 +4,55 @@ Claude Code Proxy Server
 
 This runs on the host and provides an HTTP API for Docker containers
 to interact with Claude Code CLI.
+
+Each session_id gets one persistent Claude process driven over stream-json
+stdio, so requests after the first skip process startup and keep their
+context. At most CLAUDE_PROXY_MAX_SESSIONS processes are live: the least
+recently used idle session is evicted to make room, and sessions idle for
+CLAUDE_PROXY_IDLE_TTL_S are evicted in the background. An evicted session
+resumes its conversation (--resume) if it comes back.
+
+POST /claude/stream returns the reply as JSON lines while Claude writes it,
+with heartbeats during quiet periods; disconnecting cancels the request.
 """
 
 import asyncio
 import json
 import logging
+import os
 import subprocess
+import time
 import uuid
-from typing import Optional
-from fastapi import FastAPI, HTTPException
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Optional, Set
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 import uvicorn
 
+from src.claude_pool import ClaudeWorker, stream_json_command
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+ALLOWED_TOOLS = "Bash,Edit,Write,Read,Grep,Glob,LS,WebFetch,WebSearch"
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start idle-session eviction and stop every Claude process on shutdown"""
+    await proxy.start()
+    try:
+        yield
+    finally:
+        await proxy.stop()
+
 app = FastAPI(
     title="Claude Code Proxy",
     description="HTTP proxy for Claude Code CLI integration",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 class ClaudeRequest(BaseModel):
@@ -37,76 +66,301 @@ class ClaudeResponse(BaseModel):
     success: bool
     error: Optional[str] = None
 
+class ProxySession:
+    """One caller session and the persistent Claude process that holds its context"""
+    
+    def __init__(self, session_id: str, worker: ClaudeWorker, tools: bool):
+        self.session_id = session_id
+        self.worker = worker
+        self.tools = tools
+        self.lock = asyncio.Lock()  # One request at a time per process
+        self.pending = 0  # Requests holding or waiting for the session; never evicted while > 0
+        self.created_at = time.time()
+        self.last_used = self.created_at
+        
+        # Counters
+        self.requests = 0
+        self.errors = 0
+        self.total_latency_s = 0.0
+    
+    def stats(self) -> dict:
+        return {
+            "busy": self.lock.locked(),
+            "pending": self.pending,
+            "tools": self.tools,
+            "age_s": time.time() - self.created_at,
+            "idle_s": time.time() - self.last_used,
+            "requests": self.requests,
+            "errors": self.errors,
+            "mean_latency_s": self.total_latency_s / self.requests if self.requests else None,
+            "pid": self.worker.process.pid if self.worker.alive else None,
+            "rss_mb": self.worker.rss_mb(),
+            "restarts": self.worker.restarts
+        }
+
 class ClaudeProxy:
-    def __init__(self):
+    """Multiplexes sessions onto persistent Claude processes, one per session_id"""
+    
+    def __init__(self, max_sessions: int = 8, idle_ttl_s: float = 600.0, request_timeout_s: float = 30.0,
+                 stream_timeout_s: float = 600.0, heartbeat_s: float = 5.0):
         self.claude_path = "/usr/local/bin/claude"
-        self.active_sessions = {}
+        self.cwd = "/home/travis/brodan"
+        self.max_sessions = max_sessions
+        self.idle_ttl_s = idle_ttl_s
+        self.request_timeout_s = request_timeout_s
+        self.stream_timeout_s = stream_timeout_s  # Streams show progress, so long tasks get longer
+        self.heartbeat_s = heartbeat_s
         
-    async def process_request(self, request: ClaudeRequest) -> ClaudeResponse:
-        """Process Claude Code request"""
-        try:
-            # Generate session ID if not provided
-            session_id = request.session_id or str(uuid.uuid4())
-            
-            # Build Claude command
-            cmd = [
-                self.claude_path,
-                "--print",
-                "--output-format", "text"
-            ]
-            
-            # Add tool permissions for commands
-            if request.is_command:
-                cmd.extend([
-                    "--allowedTools", 
-                    "Bash,Edit,Write,Read,Grep,Glob,LS,WebFetch,WebSearch"
-                ])
-            
-            # Add session continuity
-            if session_id in self.active_sessions:
-                cmd.extend(["--continue"])
+        # Live sessions in LRU order (least recently used first)
+        self.active_sessions: "OrderedDict[str, ProxySession]" = OrderedDict()
+        # CLI session ids of evicted sessions, so they resume with their context
+        self.resumable: "OrderedDict[str, str]" = OrderedDict()
+        self.max_resumable = 1000
+        self.sessions_lock = asyncio.Lock()
+        self.reaper_task: Optional[asyncio.Task] = None
+        self.stopping: Set[asyncio.Task] = set()  # Evicted processes shutting down
+        
+        # Counters
+        self.evictions = 0
+        self.sessions_created = 0
+        self.streams_cancelled = 0
+    
+    def _command(self, tools: bool) -> list:
+        """CLI invocation for a session process; tool permissions only for command sessions"""
+        extra_args = ["--allowedTools", ALLOWED_TOOLS] if tools else []
+        return stream_json_command(self.claude_path, include_partial_messages=True, extra_args=extra_args)
+    
+    async def start(self):
+        """Start evicting idle sessions in the background"""
+        if self.reaper_task is None:
+            self.reaper_task = asyncio.get_running_loop().create_task(self._reap_idle_sessions())
+    
+    async def stop(self):
+        """Stop the reaper and every session process"""
+        if self.reaper_task:
+            self.reaper_task.cancel()
+            await asyncio.gather(self.reaper_task, return_exceptions=True)
+            self.reaper_task = None
+        async with self.sessions_lock:
+            sessions = list(self.active_sessions.values())
+            self.active_sessions.clear()
+        await asyncio.gather(*[session.worker.stop() for session in sessions], *self.stopping,
+                             return_exceptions=True)
+    
+    async def acquire_session(self, session_id: str, tools: bool) -> ProxySession:
+        """Live session for `session_id`, spawning (or resuming) its process if needed; release() it after use"""
+        async with self.sessions_lock:
+            session = self.active_sessions.get(session_id)
+            if session:
+                self.active_sessions.move_to_end(session_id)
+                session.pending += 1
+                return session
             
-            # Add the text prompt
-            cmd.append(request.text)
+            if len(self.active_sessions) >= self.max_sessions:
+                idle = [s for s in self.active_sessions.values() if not s.pending]
+                if not idle:
+                    raise HTTPException(status_code=503, detail="All Claude sessions are busy")
+                # Stopping can take seconds; don't hold the lock for it
+                self._stop_in_background(self._evict(idle[0], "LRU"))
             
-            logger.info(f"Executing Claude command for session {session_id}")
+            worker = ClaudeWorker(self.sessions_created, self._command(tools), self.cwd)
+            await worker.spawn(resume=self.resumable.pop(session_id, None))
+            session = ProxySession(session_id, worker, tools)
+            session.pending += 1
+            self.active_sessions[session_id] = session
+            self.sessions_created += 1
+            logger.info(f"Started Claude process for session {session_id} "
+                        f"({len(self.active_sessions)}/{self.max_sessions} live)")
+            return session
+    
+    def _evict(self, session: ProxySession, reason: str) -> ClaudeWorker:
+        """
+        Drop a session, remembering its CLI session id for a later resume
+
+        Call with sessions_lock held. Returns the session's worker, which the
+        caller stops after releasing the lock.
+        """
+        self.active_sessions.pop(session.session_id, None)
+        if session.worker.session_id:
+            self.resumable[session.session_id] = session.worker.session_id
+            while len(self.resumable) > self.max_resumable:
+                self.resumable.popitem(last=False)
+        self.evictions += 1
+        logger.info(f"Evicted Claude session {session.session_id} ({reason})")
+        return session.worker
+    
+    def _stop_in_background(self, worker: ClaudeWorker):
+        task = asyncio.get_running_loop().create_task(worker.stop())
+        self.stopping.add(task)
+        task.add_done_callback(self.stopping.discard)
+    
+    async def _reap_idle_sessions(self):
+        """Evict sessions idle for longer than idle_ttl_s"""
+        while True:
+            await asyncio.sleep(max(self.idle_ttl_s / 4, 1.0))
+            now = time.time()
+            async with self.sessions_lock:
+                evicted = [self._evict(session, "idle") for session in list(self.active_sessions.values())
+                           if not session.pending and now - session.last_used > self.idle_ttl_s]
+            await asyncio.gather(*[worker.stop() for worker in evicted], return_exceptions=True)
+    
+    def release(self, session: ProxySession):
+        session.pending -= 1
+    
+    async def _prepare_worker(self, session: ProxySession, tools: bool) -> ClaudeWorker:
+        """The session's process, restarted if it died or needs tool permissions"""
+        worker = session.worker
+        if tools and not session.tools:
+            # Grant tools by restarting the process; --resume keeps the context
+            worker.command = self._command(True)
+            session.tools = True
+            await worker.restart(resume=worker.session_id)
+        elif not worker.alive:
+            await worker.restart(resume=worker.session_id)
+        return worker
+    
+    async def stream_request(self, request: ClaudeRequest, session: ProxySession,
+                             is_disconnected: Callable[[], Awaitable[bool]]) -> AsyncIterator[dict]:
+        """
+        Run a request on an acquired session, yielding events as Claude produces them
+        
+        Yields {"type": "text"} deltas, a {"type": "heartbeat"} whenever nothing
+        else has been sent for heartbeat_s, and a final {"type": "done"} carrying
+        the same fields as ClaudeResponse. If the client goes away the turn is
+        abandoned and the process restarted from its saved CLI session.
+        """
+        completed = False
+        try:
+            async with session.lock:
+                worker = await self._prepare_worker(session, request.is_command)
+                logger.info(f"Streaming Claude request for session {session.session_id}")
+                started = time.time()
+                session.requests += 1
+                events = worker.send(request.text, self.stream_timeout_s)
+                next_event = asyncio.ensure_future(events.__anext__())
+                saw_deltas = False
+                try:
+                    while True:
+                        done, _ = await asyncio.wait({next_event}, timeout=self.heartbeat_s)
+                        if not done:
+                            if await is_disconnected():
+                                self.streams_cancelled += 1
+                                logger.info(f"Client left, cancelling stream for session {session.session_id}")
+                                return
+                            yield {"type": "heartbeat"}
+                            continue
+                        
+                        try:
+                            event = next_event.result()
+                        except StopAsyncIteration:
+                            break
+                        next_event = asyncio.ensure_future(events.__anext__())
+                        
+                        event_type = event.get("type")
+                        if event_type == "stream_event":
+                            stream_event = event.get("event", {})
+                            if stream_event.get("type") == "content_block_start" and saw_deltas:
+                                yield {"type": "text", "text": "\n"}
+                            delta = stream_event.get("delta", {})
+                            if delta.get("type") == "text_delta":
+                                saw_deltas = True
+                                yield {"type": "text", "text": delta.get("text", "")}
+                        elif event_type == "assistant" and not saw_deltas:
+                            for block in event.get("message", {}).get("content", []):
+                                if block.get("type") == "text":
+                                    yield {"type": "text", "text": block.get("text", "") + "\n"}
+                        elif event_type == "result":
+                            completed = True
+                            response = self._response_for(event, session)
+                            yield {"type": "done", **response.dict()}
+                            return
+                finally:
+                    # No awaits here: this also runs while the response is being cancelled
+                    next_event.cancel()
+                    session.last_used = time.time()
+                    session.total_latency_s += session.last_used - started
+                    if not completed:
+                        # Abandon the turn; the next request resumes from the saved CLI session
+                        worker.kill()
             
-            # Execute Claude CLI
-            process = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-                cwd="/home/travis/brodan"
-            )
+            session.errors += 1
+            yield {"type": "done", **self._response_for(None, session).dict()}
+        except asyncio.CancelledError:
+            # The server cancels the response when the client disconnects
+            self.streams_cancelled += 1
+            raise
+        except asyncio.TimeoutError:
+            session.errors += 1
+            yield {"type": "done", "response": "That request is taking too long to process.",
+                   "session_id": session.session_id, "success": False, "error": "Timeout"}
+        except Exception as e:
+            session.errors += 1
+            logger.error(f"Error streaming Claude request: {e}")
+            yield {"type": "done", "response": "I'm having trouble processing that right now.",
+                   "session_id": session.session_id, "success": False, "error": str(e)}
+        finally:
+            self.release(session)
+    
+    def _response_for(self, result: Optional[dict], session: ProxySession) -> ClaudeResponse:
+        """ClaudeResponse for a stream-json result event (None if the turn produced none)"""
+        if result and not result.get("is_error"):
+            response_text = (result.get("result") or "").strip()
+            if not response_text:
+                response_text = "Task completed successfully."
             
-            stdout, stderr = await asyncio.wait_for(
-                process.communicate(), 
-                timeout=30.0
+            return ClaudeResponse(
+                response=response_text,
+                session_id=session.session_id,
+                success=True
             )
+        
+        if result:
+            session.errors += 1
+        error_msg = (result or {}).get("result") or "No result from Claude"
+        logger.error(f"Claude command failed: {error_msg}")
+        return ClaudeResponse(
+            response="I encountered an error processing that request.",
+            session_id=session.session_id,
+            success=False,
+            error=error_msg
+        )
+    
+    async def _run_on_session(self, session: ProxySession, request: ClaudeRequest) -> Optional[dict]:
+        """Send one request over the session's process stdio and return the result event"""
+        async with session.lock:
+            worker = await self._prepare_worker(session, request.is_command)
+            logger.info(f"Executing Claude request for session {session.session_id}")
+            started = time.time()
+            session.requests += 1
+            try:
+                result = None
+                async for event in worker.send(request.text, self.request_timeout_s):
+                    if event.get("type") == "result":
+                        result = event
+            except BaseException:
+                # Mid-turn state is unknown; the next request resumes from the saved CLI session
+                session.errors += 1
+                worker.kill()
+                raise
+            finally:
+                session.last_used = time.time()
+                session.total_latency_s += session.last_used - started
+            return result
+    
+    async def process_request(self, request: ClaudeRequest) -> ClaudeResponse:
+        """Process Claude Code request on the session's persistent process"""
+        # Generate session ID if not provided
+        session_id = request.session_id or str(uuid.uuid4())
+        try:
+            session = await self.acquire_session(session_id, request.is_command)
+            try:
+                result = await self._run_on_session(session, request)
+            finally:
+                self.release(session)
             
-            # Track active session
-            self.active_sessions[session_id] = True
-            
-            if process.returncode == 0:
-                response_text = stdout.decode('utf-8', errors='ignore').strip()
-                if not response_text:
-                    response_text = "Task completed successfully."
-                
-                return ClaudeResponse(
-                    response=response_text,
-                    session_id=session_id,
-                    success=True
-                )
-            else:
-                error_msg = stderr.decode('utf-8', errors='ignore').strip()
-                logger.error(f"Claude command failed: {error_msg}")
-                
-                return ClaudeResponse(
-                    response="I encountered an error processing that request.",
-                    session_id=session_id,
-                    success=False,
-                    error=error_msg
-                )
+            if result is None:
+                session.errors += 1
+            return self._response_for(result, session)
                 
         except asyncio.TimeoutError:
             return ClaudeResponse(
@@ -115,6 +369,8 @@ class ClaudeProxy:
                 success=False,
                 error="Timeout"
             )
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Error processing Claude request: {e}")
             return ClaudeResponse(
@@ -123,24 +379,68 @@ class ClaudeProxy:
                 success=False,
                 error=str(e)
             )
+    
+    def stats(self) -> dict:
+        """Per-session stats plus multiplexer counters"""
+        return {
+            "active_sessions": list(self.active_sessions.keys()),
+            "max_sessions": self.max_sessions,
+            "idle_ttl_s": self.idle_ttl_s,
+            "sessions_created": self.sessions_created,
+            "evictions": self.evictions,
+            "streams_cancelled": self.streams_cancelled,
+            "resumable": len(self.resumable),
+            "sessions": {session_id: session.stats() for session_id, session in self.active_sessions.items()}
+        }
 
 # Global proxy instance
-proxy = ClaudeProxy()
+proxy = ClaudeProxy(
+    max_sessions=int(os.getenv("CLAUDE_PROXY_MAX_SESSIONS", 8)),
+    idle_ttl_s=float(os.getenv("CLAUDE_PROXY_IDLE_TTL_S", 600)),
+    request_timeout_s=float(os.getenv("CLAUDE_PROXY_TIMEOUT_S", 30)),
+    stream_timeout_s=float(os.getenv("CLAUDE_PROXY_STREAM_TIMEOUT_S", 600)),
+    heartbeat_s=float(os.getenv("CLAUDE_PROXY_HEARTBEAT_S", 5))
+)
 
 @app.post("/claude", response_model=ClaudeResponse)
 async def process_claude_request(request: ClaudeRequest):
     """Process a Claude Code request"""
     return await proxy.process_request(request)
 
+@app.post("/claude/stream")
+async def stream_claude_request(request: ClaudeRequest, http_request: Request):
+    """
+    Stream a Claude Code request as JSON lines (application/x-ndjson)
+    
+    Lines are {"type": "text", "text": ...} deltas while Claude writes,
+    {"type": "heartbeat"} during quiet periods, and a final {"type": "done"}
+    with the same fields as the /claude response. Disconnecting cancels the
+    request.
+    """
+    session_id = request.session_id or str(uuid.uuid4())
+    session = await proxy.acquire_session(session_id, request.is_command)
+    
+    async def lines():
+        yield json.dumps({"type": "session", "session_id": session_id}) + "\n"
+        async for event in proxy.stream_request(request, session, http_request.is_disconnected):
+            yield json.dumps(event) + "\n"
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "claude_available": True}
+    return {
+        "status": "healthy",
+        "claude_available": True,
+        "live_sessions": len(proxy.active_sessions),
+        "max_sessions": proxy.max_sessions
+    }
 
 @app.get("/sessions")
 async def list_sessions():
-    """List active sessions"""
-    return {"active_sessions": list(proxy.active_sessions.keys())}
+    """List live sessions with per-session stats"""
+    return proxy.stats()
 
 if __name__ == "__main__":
     print("🚀 Starting Claude Code Proxy Server on port 8001")
@@ -0,0 +1,95 @@
+"""
+Audio DSP - vectorized PCM helpers shared by the voice pipeline
+
+Discord delivers 20ms frames of little-endian 16-bit PCM and the whisper
+service expects 16-bit WAV. These helpers do the per-frame work (energy,
+downmix, sample format conversion, WAV framing) as whole-array NumPy
+operations on a single np.frombuffer view instead of per-sample struct loops.
+"""
+
+import io
+import struct
+import wave
+from typing import Tuple, Union
+
+import numpy as np
+
+PCM_DTYPE = np.dtype('<i2')  # Little-endian signed 16-bit
+
+PCMLike = Union[bytes, bytearray, memoryview]
+
+
+def pcm16_to_array(pcm_data: PCMLike) -> np.ndarray:
+    """View 16-bit PCM bytes as an int16 array without copying (odd trailing byte ignored)"""
+    sample_count = len(pcm_data) // 2
+    return np.frombuffer(pcm_data, dtype=PCM_DTYPE, count=sample_count)
+
+
+def rms_energy(pcm_data: PCMLike) -> float:
+    """Root-mean-square energy of a 16-bit PCM buffer, in int16 sample units"""
+    samples = pcm16_to_array(pcm_data)
+    if samples.size == 0:
+        return 0.0
+
+    # Square in float32 to avoid int16 overflow
+    as_float = samples.astype(np.float32)
+    return float(np.sqrt(np.dot(as_float, as_float) / samples.size))
+
+
+def stereo_to_mono(stereo_data: PCMLike) -> bytes:
+    """Downmix interleaved stereo 16-bit PCM to mono by averaging both channels"""
+    samples = pcm16_to_array(stereo_data)
+    frame_count = samples.size // 2
+    if frame_count == 0:
+        return b''
+
+    # Widen before summing so L + R cannot overflow, then floor-divide by 2
+    frames = samples[:frame_count * 2].reshape(frame_count, 2).astype(np.int32)
+    mono = (frames[:, 0] + frames[:, 1]) >> 1
+    return mono.astype(PCM_DTYPE).tobytes()
+
+
+def int16_to_float32(samples: np.ndarray) -> np.ndarray:
+    """Convert int16 samples to float32 normalized to [-1, 1)"""
+    return samples.astype(np.float32) / 32768.0
+
+
+def float32_to_int16(audio: np.ndarray) -> np.ndarray:
+    """Convert normalized float32 samples back to int16, clipping out-of-range values"""
+    return (np.clip(audio, -1.0, 1.0) * 32767).astype(PCM_DTYPE)
+
+
+def wav_header(sample_count: int, sample_rate: int = 16000, num_channels: int = 1) -> bytes:
+    """Build the 44-byte RIFF header for 16-bit PCM audio"""
+    bits_per_sample = 16
+    byte_rate = sample_rate * num_channels * bits_per_sample // 8
+    block_align = num_channels * bits_per_sample // 8
+    data_size = sample_count * num_channels * bits_per_sample // 8
+
+    return struct.pack('<4sI4s4sIHHIIHH4sI',
+        b'RIFF', 36 + data_size, b'WAVE', b'fmt ', 16,
+        1, num_channels, sample_rate, byte_rate, block_align, bits_per_sample,
+        b'data', data_size
+    )
+
+
+def pcm_to_wav(samples: np.ndarray, sample_rate: int = 16000) -> bytes:
+    """Frame mono int16 samples as a WAV file"""
+    samples = np.asarray(samples, dtype=PCM_DTYPE)
+    return wav_header(samples.size, sample_rate) + samples.tobytes()
+
+
+def wav_to_pcm16(wav_data: bytes) -> Tuple[np.ndarray, int]:
+    """Decode a 16-bit WAV file to mono int16 samples and its sample rate"""
+    with wave.open(io.BytesIO(wav_data), 'rb') as wav_file:
+        if wav_file.getsampwidth() != 2:
+            raise ValueError(f"Unsupported WAV sample width: {wav_file.getsampwidth()} bytes")
+        channels = wav_file.getnchannels()
+        sample_rate = wav_file.getframerate()
+        frames = wav_file.readframes(wav_file.getnframes())
+
+    samples = pcm16_to_array(frames)
+    if channels > 1:
+        usable = samples.size - samples.size % channels
+        samples = samples[:usable].reshape(-1, channels).mean(axis=1).astype(PCM_DTYPE)
+    return samples, sample_rate
@@ -1,13 +1,18 @@
 import discord
 import asyncio
-import audioop
-import struct
 import logging
 import json
 import os
 from typing import Optional
+from .audio_dsp import rms_energy, stereo_to_mono, wav_to_pcm16
 from .stt_client import WhisperLiveClient
 from .discord_audio_bridge import get_bridge_instance
+from .frame_handoff import FrameHandoff
+from .opus_decoding import OpusDecodePool
+from .resampler import resample_pcm16
+from .vad import SpeakerVADs
+
+OPUS_SILENCE = b"\xf8\xff\xfe"  # Comfort-noise frame Discord sends when a speaker goes quiet
 
 
 class STTAudioSink(discord.sinks.Sink):
@@ -25,16 +30,88 @@ class STTAudioSink(discord.sinks.Sink):
         self.channels = audio_config.get('channels', 2)  # Discord uses stereo
         self.frame_size = 3840  # 20ms frame at 48kHz stereo 16-bit
         
-        # Discord Audio Bridge integration
-        self.bridge = get_bridge_instance()
+        # Spectral VAD with a per-speaker adaptive noise floor; 'energy' keeps
+        # the plain RMS threshold
+        vad_config = config.get('vad', {})
+        self.vads: Optional[SpeakerVADs] = None
+        if vad_config.get('mode', 'spectral') == 'spectral':
+            self.vads = SpeakerVADs(vad_config, self.sample_rate, self.energy_threshold)
         
-    def wants_opus(self) -> bool:
-        """We want PCM data, not Opus"""
-        return False
+        # Opus passthrough: receive raw packets and decode them to mono on a
+        # worker pool instead of taking 48kHz stereo PCM on the receive thread
+        self.opus_mode = audio_config.get('sink_mode', 'pcm') == 'opus'
+        self.decode_pool: Optional[OpusDecodePool] = None
+        if self.opus_mode:
+            self.decode_pool = OpusDecodePool(
+                self._process_mono_frame,
+                num_workers=audio_config.get('decode_workers', 2),
+                queue_size=audio_config.get('decode_queue_size', 100),
+                sample_rate=audio_config.get('opus_decode_rate', 16000)
+            )
+            self.decode_pool.start()
+        
+        # Receive-thread to STT handoff; speaker streams are thread-safe, so
+        # 'direct' mode feeds them without waking the event loop at all
+        handoff_config = config.get('handoff', {})
+        self.handoff = FrameHandoff(
+            self._deliver_frames,
+            loop=loop,
+            mode=handoff_config.get('mode', 'direct'),
+            batch_interval_ms=handoff_config.get('batch_interval_ms', 40)
+        )
+        # The client's own processing-task wakeups count toward the handoff's metric
+        stt_client.on_wake = self.handoff.record_wakeup
+        
+    def install_opus_passthrough(self, voice_client) -> bool:
+        """
+        Route raw Opus packets from the voice client to the decode pool
+        
+        py-cord decodes every packet to 48kHz stereo on its own decoder thread
+        before calling write(), so the sink never sees Opus. This replaces the
+        client's unpack_audio so packets from known speakers reach write() as
+        RawData (decrypted Opus plus SSRC) instead; packets whose SSRC is not
+        mapped to a user yet still go through py-cord's decoder. Returns False,
+        and turns Opus mode off, if this py-cord has no such receive path.
+        """
+        raw_data_class = getattr(discord.sinks, 'RawData', None)
+        original = getattr(voice_client, 'unpack_audio', None)
+        if raw_data_class is None or original is None:
+            logging.warning("py-cord receive path cannot be hooked; Opus passthrough disabled")
+            self.opus_mode = False
+            if self.decode_pool:
+                self.decode_pool.stop()
+                self.decode_pool = None
+            return False
+        
+        def unpack_audio(data):
+            if 200 <= data[1] <= 204 or getattr(voice_client, 'paused', False):
+                return original(data)  # RTCP or paused: py-cord ignores these itself
+            packet = raw_data_class(data, voice_client)
+            if packet.decrypted_data == OPUS_SILENCE:
+                return
+            user = voice_client.ws.ssrc_map.get(packet.ssrc, {}).get('user_id')
+            if user is None:
+                return original(data)
+            self.write(packet, user)
+        
+        voice_client.unpack_audio = unpack_audio
+        return True
+    
+    @staticmethod
+    def remove_opus_passthrough(voice_client):
+        """Give the voice client back its own unpack_audio"""
+        vars(voice_client).pop('unpack_audio', None)
     
     def write(self, data, user):
         """Override write method to intercept and process audio data"""
         try:
+            if self.opus_mode:
+                opus_packet = self._extract_opus(data)
+                if opus_packet is not None:
+                    # Decode off the receive thread; raw packets are not kept by the parent sink
+                    self.decode_pool.submit(self._extract_ssrc(data, user), user, opus_packet)
+                    return
+            
             # Process the raw audio data from Discord
             if hasattr(data, 'decrypted_data'):
                 pcm_data = data.decrypted_data
@@ -47,18 +124,8 @@ class STTAudioSink(discord.sinks.Sink):
             if not pcm_data:
                 return super().write(data, user)
             
-            
-            # Simple voice activity detection
-            if self._is_speech(pcm_data):
-                # Convert stereo to mono for STT (take left channel)
-                mono_data = self._stereo_to_mono(pcm_data)
-                
-                # Send to both STT service and Discord Audio Bridge
-                self._schedule_stt_send(mono_data)
-                
-                # Send to Discord Audio Bridge for voice-mode MCP integration
-                if self.bridge and mono_data:
-                    self.bridge.add_discord_audio(mono_data)
+            # Convert stereo to mono for STT (average both channels)
+            self._process_mono_frame(self._stereo_to_mono(pcm_data), user, self.sample_rate)
             
             # Call parent write to maintain normal sink functionality
             return super().write(data, user)
@@ -68,32 +135,60 @@ class STTAudioSink(discord.sinks.Sink):
             # Always call parent write to maintain sink functionality
             return super().write(data, user)
     
-    def _schedule_stt_send(self, audio_data: bytes):
-        """Thread-safe method to schedule STT sending"""
+    def _process_mono_frame(self, mono_data: bytes, user, sample_rate: Optional[int] = None):
+        """Run VAD on a mono frame and forward it to STT"""
+        if not mono_data:
+            return
+        sample_rate = sample_rate or self.decode_pool.sample_rate
+        
+        # Voice activity detection with the speaker's own noise floor
+        is_speech = self._is_speech(mono_data, user, sample_rate)
+        
+        # Every frame goes to the speaker's STT stream so its endpointer
+        # can see trailing silence and close the utterance
+        self._schedule_stt_send(mono_data, user, is_speech, sample_rate)
+    
+    def _extract_opus(self, data) -> Optional[bytes]:
+        """Get the Opus payload from a receive-layer packet object, if it carries one"""
+        for attribute in ('opus', 'decrypted_data'):
+            payload = getattr(data, attribute, None)
+            if payload:
+                return payload
+        return None
+    
+    def _extract_ssrc(self, data, user):
+        """Get the packet's SSRC, falling back to the user so decoder state stays per speaker"""
+        ssrc = getattr(data, 'ssrc', None)
+        if ssrc is None:
+            ssrc = getattr(getattr(data, 'packet', None), 'ssrc', None)
+        return ssrc if ssrc is not None else user
+    
+    def _schedule_stt_send(self, audio_data: bytes, user=None, is_speech: bool = True,
+                           sample_rate: Optional[int] = None):
+        """Thread-safe method to hand a frame (at `sample_rate`) to the STT client"""
         try:
-            # Use call_soon_threadsafe to schedule the coroutine in the bot's event loop
-            asyncio.run_coroutine_threadsafe(self._send_to_stt(audio_data), self.loop)
+            self.handoff.submit(audio_data, user, is_speech, sample_rate)
         except Exception as e:
             logging.error(f"Error scheduling STT send: {e}")
     
-    def _is_speech(self, pcm_data: bytes) -> bool:
-        """Basic voice activity detection using energy threshold"""
+    def _deliver_frames(self, frames):
+        """Feed a batch of (audio, user, is_speech, sample_rate) frames to the speaker streams"""
+        if not self.stt_client.connected:
+            return
+        for audio_data, user, is_speech, sample_rate in frames:
+            self.stt_client.push_audio(audio_data, user_id=user, is_speech=is_speech,
+                                       sample_rate=sample_rate)
+    
+    def _is_speech(self, pcm_data: bytes, user=None, sample_rate: Optional[int] = None) -> bool:
+        """Voice activity detection - spectral per speaker, or a basic energy threshold"""
         try:
-            # Calculate RMS energy
             if len(pcm_data) < 2:
                 return False
-                
-            # Convert bytes to 16-bit integers
-            samples = struct.unpack(f'<{len(pcm_data)//2}h', pcm_data)
-            
-            # Calculate RMS
-            sum_squares = sum(sample * sample for sample in samples)
-            rms = (sum_squares / len(samples)) ** 0.5
             
-            is_speech = rms > self.energy_threshold
+            if self.vads:
+                return self.vads.is_speech(user, pcm_data, sample_rate)
             
-            
-            return is_speech
+            return rms_energy(pcm_data) > self.energy_threshold
             
         except Exception as e:
             logging.debug(f"Voice activity detection error: {e}")
@@ -105,36 +200,18 @@ class STTAudioSink(discord.sinks.Sink):
             if len(stereo_data) < 4:  # Need at least 4 bytes for one stereo sample
                 return stereo_data
             
-            # Convert stereo to mono by averaging left and right channels
-            mono_samples = []
-            for i in range(0, len(stereo_data), 4):  # 4 bytes = 1 stereo frame (16-bit L + 16-bit R)
-                if i + 3 < len(stereo_data):
-                    # Extract left and right samples
-                    left_sample = struct.unpack('<h', stereo_data[i:i+2])[0]
-                    right_sample = struct.unpack('<h', stereo_data[i+2:i+4])[0]
-                    
-                    # Mix by averaging (prevent overflow)
-                    mixed_sample = (left_sample + right_sample) // 2
-                    mono_samples.append(mixed_sample)
-            
-            if not mono_samples:
-                return b''
-            
-            return struct.pack(f'<{len(mono_samples)}h', *mono_samples)
+            return stereo_to_mono(stereo_data)
             
         except Exception as e:
             logging.debug(f"Stereo to mono conversion error: {e}")
             # Fallback: return original data truncated to valid length
             return stereo_data[:len(stereo_data) - (len(stereo_data) % 4)]
     
-    async def _send_to_stt(self, audio_data: bytes):
-        """Send audio data to STT service"""
-        try:
-            if self.stt_client.connected:
-                
-                await self.stt_client.send_audio(audio_data)
-        except Exception as e:
-            logging.debug(f"Error sending audio to STT: {e}")
+    def cleanup(self):
+        """Stop the decode pool along with the sink"""
+        if self.decode_pool:
+            self.decode_pool.stop()
+        super().cleanup()
     
     def format_audio(self, audio):
         """Required method for discord.sinks.Sink compatibility"""
@@ -151,6 +228,7 @@ class AudioProcessor:
         self.stt_client = WhisperLiveClient()
         self.audio_sink: Optional[STTAudioSink] = None
         self.recording = False
+        self.bridge_forward_task: Optional[asyncio.Task] = None
         
     async def initialize_stt(self) -> bool:
         """Initialize STT connection with retry logic"""
@@ -158,9 +236,10 @@ class AudioProcessor:
         retry_delay = 2
         
         for attempt in range(max_retries):
-            success = self.stt_client.connect()
+            success = await self.stt_client.connect()
             if success:
                 print("✅ Connected to STT service")
+                self._start_bridge_forwarding()
                 return True
             
             if attempt < max_retries - 1:
@@ -171,6 +250,18 @@ class AudioProcessor:
         
         return False
     
+    def _start_bridge_forwarding(self):
+        """Share each final transcript with the Discord Audio Bridge for voice-mode MCP integration"""
+        if self.bridge_forward_task and not self.bridge_forward_task.done():
+            return
+        subscription = self.stt_client.subscribe(types=["final"])
+        self.bridge_forward_task = asyncio.create_task(self._forward_to_bridge(subscription))
+    
+    async def _forward_to_bridge(self, subscription):
+        bridge = get_bridge_instance()
+        async for transcription in subscription:
+            bridge.add_transcription(transcription)
+    
     def create_audio_sink(self, loop: asyncio.AbstractEventLoop) -> STTAudioSink:
         """Create new audio sink for voice capture"""
         self.audio_sink = STTAudioSink(self.stt_client, loop, self.config)
@@ -191,11 +282,15 @@ class AudioProcessor:
             # Get the current event loop and create audio sink
             loop = asyncio.get_event_loop()
             sink = self.create_audio_sink(loop)
+            if sink.opus_mode:
+                # Before start_recording, so the receive thread never sees the unhooked path
+                sink.install_opus_passthrough(voice_client)
             voice_client.start_recording(sink, self._recording_finished)
             self.recording = True
             
         except Exception as e:
             logging.error(f"Failed to start recording: {e}")
+            STTAudioSink.remove_opus_passthrough(voice_client)
             self.recording = False
     
     def stop_recording(self, voice_client: discord.VoiceClient):
@@ -205,6 +300,7 @@ class AudioProcessor:
             
         try:
             voice_client.stop_recording()
+            STTAudioSink.remove_opus_passthrough(voice_client)
             self.recording = False
         except Exception as e:
             logging.error(f"Error stopping recording: {e}")
@@ -215,15 +311,50 @@ class AudioProcessor:
         logging.debug(f"Recording finished with sink: {sink}, args: {args}")
         pass
     
+    def get_vad_stats(self) -> dict:
+        """Fraction of audio rejected by VAD and seconds actually uploaded to whisper"""
+        stats = self.audio_sink.vads.stats() if self.audio_sink and self.audio_sink.vads else {}
+        stats["seconds_uploaded"] = self.stt_client.audio_seconds_sent
+        return stats
+    
+    def start_playback_reference(self, wav_data: bytes):
+        """Tell the echo gate what the bot is about to play"""
+        try:
+            samples, sample_rate = wav_to_pcm16(wav_data)
+            reference = resample_pcm16(samples.tobytes(), sample_rate, self.stt_client.target_sample_rate)
+            self.stt_client.echo_gate.start_playback(reference)
+        except Exception as e:
+            logging.error(f"Error registering playback reference: {e}")
+    
+    def stop_playback_reference(self):
+        """Playback finished; only the echo tail is still gated"""
+        self.stt_client.echo_gate.stop_playback()
+    
+    def get_echo_stats(self) -> dict:
+        """Seconds of playback echo dropped before reaching the STT buffer"""
+        return self.stt_client.echo_gate.stats()
+    
+    def get_handoff_stats(self) -> dict:
+        """Frames handed off and event loop wakeups per second"""
+        return self.audio_sink.handoff.stats() if self.audio_sink else {}
+    
+    def get_dispatch_stats(self) -> dict:
+        """Queue depth and in-flight /asr requests"""
+        return self.stt_client.get_dispatch_stats()
+    
+    def subscribe_transcriptions(self, user_id=None, types=None):
+        """Push-based stream of transcriptions; close() it to stop delivery"""
+        return self.stt_client.subscribe(user_id, types)
+    
     def get_latest_transcription(self):
         """Get latest transcription from STT service"""
         return self.stt_client.get_transcription()
     
     
-    def cleanup(self):
+    async def cleanup(self):
         """Clean up resources"""
         if self.stt_client:
-            self.stt_client.disconnect()
+            await self.stt_client.disconnect()
     
     def _load_config(self):
         """Load configuration from file or use defaults"""
@@ -0,0 +1,152 @@
+"""
+Backpressure - overload policy for final segments waiting on whisper
+
+When whisper answers slower than people talk, closed utterances queue up in
+the segment dispatcher. The LoadShedder keeps that backlog bounded so the bot
+runs at a predictable latency instead of transcribing minutes-old speech:
+
+- max_backlog_s_per_speaker: queued seconds per speaker; the oldest queued
+  segments are shed once a speaker goes over the cap
+- stale_after_s: a segment that only reaches the front of the queue this long
+  after its speech ended is stale, and stale_policy decides what happens:
+    - drop: discard it
+    - merge: fold it into the speaker's next queued segment (one request
+      instead of several), or send it if it is the speaker's last one
+    - degrade: send it to degraded_base_url (a smaller, faster model)
+- every shed, stale and late (emitted after stale_after_s) second is counted
+"""
+
+import logging
+import threading
+from collections import deque
+from typing import Deque, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+STALE_POLICIES = ('drop', 'merge', 'degrade')
+
+# Decisions returned by LoadShedder.dequeue
+SEND = 'send'
+SHED = 'shed'
+DROP = 'drop'
+MERGE = 'merge'
+DEGRADE = 'degrade'
+
+
+class LoadShedder:
+    """Tracks each speaker's queued segments and decides which are worth sending"""
+
+    def __init__(self, max_backlog_s: float = 20.0, stale_after_s: float = 8.0,
+                 stale_policy: str = 'merge', degraded_base_url: Optional[str] = None):
+        self.max_backlog_s = max_backlog_s
+        self.stale_after_s = stale_after_s
+        if stale_policy not in STALE_POLICIES:
+            logger.warning(f"Unknown stale_policy '{stale_policy}', using drop")
+            stale_policy = 'drop'
+        if stale_policy == 'degrade' and not degraded_base_url:
+            logger.warning("stale_policy 'degrade' needs degraded_base_url, using drop")
+            stale_policy = 'drop'
+        self.stale_policy = stale_policy
+        self.degraded_base_url = degraded_base_url
+
+        self._lock = threading.Lock()
+        self._queued: Dict[Hashable, Deque[Tuple[Hashable, float]]] = {}
+        self._shed = set()
+
+        # Counters
+        self.segments_shed = 0
+        self.seconds_shed = 0.0
+        self.segments_stale = 0
+        self.seconds_stale_dropped = 0.0
+        self.segments_merged = 0
+        self.segments_degraded = 0
+        self.segments_late = 0
+        self.seconds_late = 0.0
+
+    @classmethod
+    def from_config(cls, backpressure_config: dict) -> 'LoadShedder':
+        """Build a shedder from the `backpressure` config section"""
+        return cls(
+            max_backlog_s=backpressure_config.get('max_backlog_s_per_speaker', 20.0),
+            stale_after_s=backpressure_config.get('stale_after_s', 8.0),
+            stale_policy=backpressure_config.get('stale_policy', 'merge'),
+            degraded_base_url=backpressure_config.get('degraded_base_url')
+        )
+
+    def enqueue(self, user_id: Hashable, segment_id: Hashable, duration: float):
+        """Record a queued segment, shedding the speaker's oldest ones past the cap"""
+        with self._lock:
+            queued = self._queued.setdefault(user_id, deque())
+            queued.append((segment_id, duration))
+
+            backlog = sum(seconds for _, seconds in queued)
+            while backlog > self.max_backlog_s and len(queued) > 1:
+                oldest, seconds = queued.popleft()
+                self._shed.add(oldest)
+                backlog -= seconds
+                self.segments_shed += 1
+                self.seconds_shed += seconds
+                logger.warning(f"Shedding {seconds:.1f}s of queued audio from {user_id}")
+
+    def dequeue(self, user_id: Hashable, segment_id: Hashable, duration: float,
+                ended_at: float, now: float) -> str:
+        """Decide what to do with a segment that is about to be sent"""
+        with self._lock:
+            if segment_id in self._shed:
+                self._shed.discard(segment_id)
+                return SHED
+
+            queued = self._queued.get(user_id, deque())
+            try:
+                queued.remove((segment_id, duration))
+            except ValueError:
+                pass
+            if not queued:
+                self._queued.pop(user_id, None)
+
+            if now - ended_at <= self.stale_after_s:
+                return SEND
+
+            self.segments_stale += 1
+            if self.stale_policy == 'merge':
+                if queued:
+                    self.segments_merged += 1
+                    return MERGE
+                return SEND
+            if self.stale_policy == 'degrade':
+                self.segments_degraded += 1
+                return DEGRADE
+            self.seconds_stale_dropped += duration
+            return DROP
+
+    def record_discarded_carry(self, decision: str, seconds: float):
+        """Count merged-forward audio thrown away with a shed or dropped segment"""
+        with self._lock:
+            if decision == SHED:
+                self.seconds_shed += seconds
+            else:
+                self.seconds_stale_dropped += seconds
+
+    def record_delivery(self, ended_at: float, duration: float, now: float):
+        """Count a transcript that reached consumers later than stale_after_s"""
+        if now - ended_at > self.stale_after_s:
+            self.segments_late += 1
+            self.seconds_late += duration
+
+    def backlog_seconds(self) -> float:
+        with self._lock:
+            return sum(seconds for queued in self._queued.values() for _, seconds in queued)
+
+    def stats(self) -> dict:
+        """Shed, stale and late audio counters"""
+        return {
+            "backlog_s": self.backlog_seconds(),
+            "segments_shed": self.segments_shed,
+            "seconds_shed": self.seconds_shed,
+            "segments_stale": self.segments_stale,
+            "seconds_stale_dropped": self.seconds_stale_dropped,
+            "segments_merged": self.segments_merged,
+            "segments_degraded": self.segments_degraded,
+            "segments_late": self.segments_late,
+            "seconds_late": self.seconds_late
+        }
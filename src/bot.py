@@ -5,12 +5,14 @@ import logging
 import threading
 import io
 import tempfile
+import time
 from dotenv import load_dotenv
 from .audio_processor import AudioProcessor
 from .discord_audio_bridge import run_bridge_server
 from .service_checker import wait_for_services
 from .tts_client import PiperTTSClient
 from .claude_bridge import ClaudeBridge
+from .metrics import LatencyHistogram
 
 load_dotenv()
 
@@ -38,10 +40,19 @@ class VoiceBot(discord.Client):
         self.claude_bridge = ClaudeBridge()
         self.voice_client = None
         self.last_transcription_text = ""  # Track last displayed text
+        self.transcription_subscription = None
+        self.monitor_task = None
+        
+        # Replies play one at a time; latency is end of user speech -> first clip
+        self.playback_lock = asyncio.Lock()
+        self.first_audio_latency = LatencyHistogram()
         
     async def on_ready(self):
         print(f"🤖 Bot ready as {self.user}")
         
+        # Warm up Claude CLI workers before the first utterance arrives
+        await self.claude_bridge.start()
+        
         # Auto-join Brodan channel and start recording
         for guild in self.guilds:
             brodan_channel = discord.utils.get(guild.voice_channels, name="Brodan")
@@ -55,7 +66,7 @@ class VoiceBot(discord.Client):
                     await self.audio_processor.start_recording(self.voice_client)
                     
                     # Start transcription monitoring only
-                    asyncio.create_task(self._monitor_transcriptions())
+                    self._start_transcription_monitor()
                     break
                 except Exception as e:
                     print(f"❌ Failed to join Brodan channel: {e}")
@@ -64,6 +75,11 @@ class VoiceBot(discord.Client):
     async def on_voice_state_update(self, member, before, after):
         """Voice state tracking with recording management"""
         if member == self.user:
+            # Stop delivering transcripts once the bot has left its channel
+            if before.channel and not after.channel:
+                self._stop_transcription_monitor()
+            elif after.channel and not before.channel:
+                self._start_transcription_monitor()
             return
             
         if after.channel and not before.channel:
@@ -71,18 +87,31 @@ class VoiceBot(discord.Client):
             if self.voice_client and not self.audio_processor.recording:
                 await self.audio_processor.start_recording(self.voice_client)
     
-    async def _monitor_transcriptions(self):
-        """Monitor and log transcription results"""
-        while True:
+    def _start_transcription_monitor(self):
+        """Subscribe to transcripts pushed by the STT client"""
+        if self.monitor_task and not self.monitor_task.done():
+            return
+        self.transcription_subscription = self.audio_processor.subscribe_transcriptions()
+        self.monitor_task = asyncio.create_task(
+            self._monitor_transcriptions(self.transcription_subscription)
+        )
+    
+    def _stop_transcription_monitor(self):
+        """Cancel the transcript subscription"""
+        if self.transcription_subscription:
+            self.transcription_subscription.close()
+            self.transcription_subscription = None
+        if self.monitor_task:
+            self.monitor_task.cancel()
+            self.monitor_task = None
+    
+    async def _monitor_transcriptions(self, subscription):
+        """Display transcription results as they are pushed"""
+        async for transcription in subscription:
             try:
-                transcription = self.audio_processor.get_latest_transcription()
-                if transcription:
-                    self._display_transcription(transcription)
-                
-                await asyncio.sleep(0.1)  # Check every 100ms
+                self._display_transcription(transcription)
             except Exception as e:
                 print(f"Transcription monitoring error: {e}")
-                await asyncio.sleep(1)
     
     def _display_transcription(self, transcription):
         """Format and display transcription results"""
@@ -115,7 +144,8 @@ class VoiceBot(discord.Client):
                     print(f"🔄 Skipping audio feedback: {text[:50]}...")
                     return
                 
-                # Skip if currently playing audio (prevent feedback)
+                # Skip anything heard while the bot is speaking (prevent feedback);
+                # kept as a fallback behind the playback-reference echo gate
                 if self.voice_client and self.voice_client.is_playing():
                     print(f"🔇 Skipping during playback: {text[:30]}...")
                     return
@@ -125,52 +155,116 @@ class VoiceBot(discord.Client):
                 self.last_transcription_text = text
                 
                 # Generate TTS response and play in voice channel
-                asyncio.create_task(self._handle_voice_response(text))
+                asyncio.create_task(self._handle_voice_response(text, transcription.get("speech_ended_at")))
             
         except Exception as e:
             print(f"Error displaying transcription: {e}")
             print(f"Raw transcription data: {transcription}")
 
-    async def _handle_voice_response(self, input_text: str):
-        """Generate TTS response and play in voice channel"""
+    async def _handle_voice_response(self, input_text: str, speech_ended_at: float = None):
+        """Stream Claude's reply through TTS sentence by sentence and play the clips in order"""
         try:
-            # Process input through Claude Code bridge
             print(f"🔄 Processing with Claude: {input_text}")
-            response_text = await self.claude_bridge.process_voice_input(input_text)
-            
-            # Generate TTS audio
-            audio_data = await self.tts_client.synthesize(response_text)
-            if not audio_data:
-                print("❌ TTS generation failed")
-                return
             
-            # Play audio in voice channel
-            if self.voice_client and self.voice_client.is_connected():
-                # Save audio to temporary file for FFmpeg compatibility
-                import tempfile
-                with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as temp_file:
-                    temp_file.write(audio_data)
-                    temp_file.flush()
-                    
-                    # Create audio source with proper mono-to-stereo conversion
-                    audio_source = discord.PCMVolumeTransformer(
-                        discord.FFmpegPCMAudio(
-                            temp_file.name,
-                            options='-ac 2 -ar 48000'  # Convert mono 22kHz to stereo 48kHz
-                        )
-                    )
-                    
-                    # Play the audio
-                    if not self.voice_client.is_playing():
-                        self.voice_client.play(audio_source)
-                        print(f"🔊 Playing TTS response: {response_text}")
-                    else:
-                        print("⏳ Audio already playing, skipping...")
-            else:
-                print("❌ No voice connection available")
+            # Claude's reply is read at its own pace (its timeout must not include
+            # playback time); only TTS is held to tts_lookahead clips ahead of playback
+            sentences = asyncio.Queue()
+            clips = asyncio.Queue(maxsize=self.claude_bridge.tts_lookahead)
+            reader = asyncio.create_task(self._read_sentences(input_text, sentences))
+            synthesizer = asyncio.create_task(self._synthesize_sentences(sentences, clips))
+            try:
+                await self._play_clips(clips, speech_ended_at)
+            finally:
+                reader.cancel()
+                synthesizer.cancel()
                 
         except Exception as e:
             print(f"Error handling voice response: {e}")
+    
+    async def _read_sentences(self, input_text: str, sentences: asyncio.Queue):
+        """Drain Claude's streamed reply into an unbounded sentence queue"""
+        try:
+            async for sentence in self.claude_bridge.stream_voice_input(input_text):
+                sentences.put_nowait(sentence)
+        except Exception as e:
+            print(f"Error streaming Claude response: {e}")
+        sentences.put_nowait(None)
+    
+    async def _synthesize_sentences(self, sentences: asyncio.Queue, clips: asyncio.Queue):
+        """Start TTS for each sentence, staying at most tts_lookahead clips ahead of playback"""
+        while True:
+            sentence = await sentences.get()
+            if sentence is None:
+                break
+            synthesis = asyncio.create_task(self.tts_client.synthesize(sentence))
+            await clips.put((sentence, synthesis))
+        await clips.put(None)
+    
+    async def _play_clips(self, clips: asyncio.Queue, speech_ended_at: float = None):
+        """Play synthesized sentences back to back, in order"""
+        async with self.playback_lock:
+            first_clip = True
+            while True:
+                item = await clips.get()
+                if item is None:
+                    return
+                sentence, synthesis = item
+                
+                audio_data = await synthesis
+                if not audio_data:
+                    print("❌ TTS generation failed")
+                    continue
+                if not (self.voice_client and self.voice_client.is_connected()):
+                    print("❌ No voice connection available")
+                    return
+                
+                if first_clip and speech_ended_at:
+                    latency = time.time() - speech_ended_at
+                    self.first_audio_latency.observe(latency)
+                    print(f"⏱️ First audio {latency * 1000:.0f}ms after end of speech")
+                first_clip = False
+                
+                print(f"🔊 Playing TTS response: {sentence}")
+                await self._play_clip(audio_data)
+    
+    async def _play_clip(self, audio_data: bytes):
+        """Play one WAV clip in the voice channel and wait for it to finish"""
+        loop = asyncio.get_running_loop()
+        finished = asyncio.Event()
+        
+        # Save audio to temporary file for FFmpeg compatibility
+        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as temp_file:
+            temp_file.write(audio_data)
+        
+        try:
+            # Create audio source with proper mono-to-stereo conversion
+            audio_source = discord.PCMVolumeTransformer(
+                discord.FFmpegPCMAudio(
+                    temp_file.name,
+                    options='-ac 2 -ar 48000'  # Convert mono 22kHz to stereo 48kHz
+                )
+            )
+            
+            def after(error):
+                self._playback_finished(error)
+                loop.call_soon_threadsafe(finished.set)
+            
+            # Play the audio, gating its echo out of the STT streams
+            self.audio_processor.start_playback_reference(audio_data)
+            self.voice_client.play(audio_source, after=after)
+            await finished.wait()
+        finally:
+            os.unlink(temp_file.name)
+    
+    def _playback_finished(self, error):
+        """Called by discord.py when TTS playback ends"""
+        self.audio_processor.stop_playback_reference()
+        if error:
+            print(f"Playback error: {error}")
+        
+        echo_stats = self.audio_processor.get_echo_stats()
+        if echo_stats["seconds_suppressed"]:
+            print(f"🔇 Echo gate has suppressed {echo_stats['seconds_suppressed']:.1f}s of playback audio")
 
 
 
@@ -5,23 +5,65 @@ This module handles routing Discord voice input to Claude Code's CLI interface
 and returns the response for TTS playback in Discord.
 """
 
-import asyncio
 import json
 import logging
+import os
 import subprocess
 import tempfile
-import httpx
-from typing import Optional, Dict, Any
+from typing import AsyncIterator, Optional, Dict, Any
+
+from .claude_pool import ClaudeTimeoutError, ClaudeWorkerError, ClaudeWorkerPool
+from .claude_proxy_client import ClaudeProxyClient, ClaudeProxyError
+from .sentence_chunker import SentenceChunker
 
 logger = logging.getLogger(__name__)
 
+CLAUDE_ERRORS = (ClaudeWorkerError, ClaudeProxyError, ClaudeTimeoutError)
+
 class ClaudeBridge:
     """Bridge between Discord voice bot and Claude Code CLI"""
     
     def __init__(self):
-        self.proxy_url = "http://localhost:8001"
+        self.config = self._load_config()
         self.session_id = None
-        self.client = httpx.AsyncClient(timeout=30.0)
+        
+        # "local" runs warm CLI workers in this container, "proxy" sends requests
+        # to claude_proxy.py over a pooled keep-alive connection
+        self.transport = self.config.get('transport', 'local')
+        self.proxy = ClaudeProxyClient.from_config(
+            self.config.get('proxy', {}), os.getenv('CLAUDE_PROXY_URL', 'http://localhost:8001')
+        )
+        self.proxy_url = self.proxy.url
+        self.proxy_session_id = None  # Assigned by the proxy when we have no session id of our own
+        self.client = self.proxy.client
+        
+        # Warm CLI workers instead of one `claude --print` process per utterance
+        self.pool = ClaudeWorkerPool.from_config(self.config)
+        self.default_conversation = self.config.get('conversation', 'voice')
+        timeouts = self.config.get('timeouts', {})
+        self.command_timeout = timeouts.get('command_s', 30.0)
+        self.conversation_timeout = timeouts.get('conversation_s', 20.0)
+        
+        # Streaming voice replies are cut into sentences for TTS as they arrive
+        voice_config = self.config.get('voice', {})
+        self.min_sentence_chars = voice_config.get('min_sentence_chars', 20)
+        self.max_response_chars = voice_config.get('max_response_chars', 500)
+        self.tts_lookahead = voice_config.get('tts_lookahead', 2)
+    
+    async def start(self):
+        """Warm up the transport so the first utterance does not pay CLI startup or a TCP handshake"""
+        if self.transport == 'proxy':
+            await self.proxy.warm_up()
+            return
+        try:
+            await self.pool.start()
+        except FileNotFoundError as e:
+            logger.error(f"Claude CLI not found, worker pool not started: {e}")
+    
+    async def close(self):
+        """Stop the worker pool and the HTTP client"""
+        await self.pool.stop()
+        await self.proxy.close()
         
     async def process_voice_input(self, input_text: str) -> str:
         """
@@ -57,6 +99,79 @@ class ClaudeBridge:
             logger.error(f"Error processing voice input: {e}")
             return f"Sorry, I encountered an error: {str(e)}"
     
+    async def stream_voice_input(self, input_text: str) -> AsyncIterator[str]:
+        """
+        Process voice input through Claude Code, yielding speakable sentences
+        
+        Each sentence is yielded as soon as Claude has finished writing it, so
+        the caller can synthesize and play it while the rest is generated.
+        """
+        cleaned_input = input_text.strip()
+        if not cleaned_input:
+            yield "I didn't catch that, could you repeat?"
+            return
+        
+        logger.info(f"Streaming voice input: {cleaned_input}")
+        is_command = self._is_command(cleaned_input)
+        timeout = self.command_timeout if is_command else self.conversation_timeout
+        chunker = SentenceChunker(self.min_sentence_chars, self.max_response_chars)
+        spoke = False
+        
+        try:
+            async for text in self._stream_text(cleaned_input, is_command, timeout):
+                for sentence in chunker.push(text):
+                    sentence = self._clean_for_voice(sentence)
+                    if sentence:
+                        spoke = True
+                        yield sentence
+            for sentence in chunker.flush():
+                sentence = self._clean_for_voice(sentence)
+                if sentence:
+                    spoke = True
+                    yield sentence
+        except ClaudeTimeoutError as e:
+            logger.error(f"Claude streaming timeout: {e}")
+            yield "My response timed out. Could you try rephrasing your question?"
+            return
+        except CLAUDE_ERRORS as e:
+            logger.error(f"Claude streaming error: {e}")
+            yield f"I encountered an error: {e}"
+            return
+        except FileNotFoundError as e:
+            logger.error(f"Claude CLI not found: {e}")
+            yield "Claude Code CLI is not installed. I can't process your message."
+            return
+        
+        if not spoke:
+            yield "Command completed successfully." if is_command else "I don't have a response for that."
+    
+    async def _stream_text(self, prompt: str, is_command: bool, timeout: float) -> AsyncIterator[str]:
+        """Text of Claude's reply as it is generated, from the worker's stream-json events"""
+        if self.transport == 'proxy':
+            async for text in self._stream_proxy_text(prompt, is_command, timeout):
+                yield text
+            return
+        
+        saw_deltas = False
+        async for event in self.pool.stream(prompt, self._conversation_key(), timeout):
+            event_type = event.get('type')
+            if event_type == 'stream_event':
+                # Token deltas (pool.include_partial_messages)
+                stream_event = event.get('event', {})
+                if stream_event.get('type') == 'content_block_start' and saw_deltas:
+                    yield "\n"  # Keep separate text blocks from running together
+                delta = stream_event.get('delta', {})
+                if delta.get('type') == 'text_delta':
+                    saw_deltas = True
+                    yield delta.get('text', '')
+            elif event_type == 'assistant' and not saw_deltas:
+                # Whole messages only, one per turn of the agent loop
+                for block in event.get('message', {}).get('content', []):
+                    if block.get('type') == 'text':
+                        yield block.get('text', '') + "\n"
+            elif event_type == 'result' and event.get('is_error'):
+                raise ClaudeWorkerError(event.get('result') or event.get('subtype', 'error'))
+    
     def _is_command(self, text: str) -> bool:
         """
         Determine if input is a command or general conversation
@@ -77,51 +192,23 @@ class ClaudeBridge:
         return any(keyword in words for keyword in command_keywords)
     
     async def _execute_claude_command(self, command: str) -> str:
-        """Execute command through Claude Code CLI with tool access"""
+        """Execute command through a warm Claude Code CLI worker with tool access"""
         try:
-            # Execute the command using Claude Code CLI
             logger.info(f"Executing Claude command: {command}")
-            
-            # Run claude CLI in non-interactive mode with the command
-            process = await asyncio.create_subprocess_exec(
-                'claude', 
-                '--print',
-                command,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-                cwd='/app'  # Ensure we're in the project directory
-            )
-            
-            # Set timeout for Claude CLI execution (30 seconds)
-            try:
-                stdout, stderr = await asyncio.wait_for(
-                    process.communicate(), 
-                    timeout=30.0
-                )
-            except asyncio.TimeoutError:
-                process.kill()
-                await process.wait()
-                return "Command timed out after 30 seconds."
-            
-            if process.returncode == 0:
-                response = stdout.decode('utf-8').strip()
-                if not response:
-                    return "Command completed successfully."
-                return response
-            else:
-                error_msg = stderr.decode('utf-8').strip()
-                logger.error(f"Claude CLI error (return code {process.returncode}): {error_msg}")
-                
-                # Provide more user-friendly error messages
-                if "command not found" in error_msg.lower():
-                    return "Claude Code CLI is not installed or not in PATH."
-                elif "permission denied" in error_msg.lower():
-                    return "Permission denied when executing command."
-                elif error_msg:
-                    return f"Command error: {error_msg}"
-                else:
-                    return f"Command failed with exit code {process.returncode}."
+            response = await self._complete(command, True, self.command_timeout)
+            return response.strip() or "Command completed successfully."
                 
+        except ClaudeTimeoutError as e:
+            logger.error(f"Claude CLI timeout: {e}")
+            return f"Command timed out after {self.command_timeout:.0f} seconds."
+        except CLAUDE_ERRORS as e:
+            logger.error(f"Claude CLI error: {e}")
+            error_msg = str(e)
+            
+            # Provide more user-friendly error messages
+            if "permission denied" in error_msg.lower():
+                return "Permission denied when executing command."
+            return f"Command error: {error_msg}"
         except FileNotFoundError as e:
             logger.error(f"Claude CLI not found: {e}")
             return "Claude Code CLI is not installed. Please install Claude Code first."
@@ -132,49 +219,18 @@ class ClaudeBridge:
             return f"Failed to execute command: {str(e)}"
     
     async def _claude_conversation(self, message: str) -> str:
-        """Handle general conversation with Claude"""
+        """Handle general conversation with Claude on the conversation's warm worker"""
         try:
-            # Use Claude Code CLI for general conversation
             logger.info(f"Processing conversation: {message}")
-            
-            # Run claude CLI in non-interactive mode for conversation
-            process = await asyncio.create_subprocess_exec(
-                'claude', 
-                '--print',
-                message,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-                cwd='/app'  # Ensure we're in the project directory
-            )
-            
-            # Set timeout for conversation (20 seconds)
-            try:
-                stdout, stderr = await asyncio.wait_for(
-                    process.communicate(), 
-                    timeout=20.0
-                )
-            except asyncio.TimeoutError:
-                process.kill()
-                await process.wait()
-                return "My response timed out. Could you try rephrasing your question?"
-            
-            if process.returncode == 0:
-                response = stdout.decode('utf-8').strip()
-                if not response:
-                    return "I don't have a response for that."
-                return response
-            else:
-                error_msg = stderr.decode('utf-8').strip()
-                logger.error(f"Claude CLI conversation error (return code {process.returncode}): {error_msg}")
-                
-                # Provide more user-friendly error messages
-                if "command not found" in error_msg.lower():
-                    return "Claude Code CLI is not available for conversation."
-                elif error_msg:
-                    return f"I encountered an error: {error_msg}"
-                else:
-                    return "I encountered an unexpected error processing your message."
+            response = await self._complete(message, False, self.conversation_timeout)
+            return response.strip() or "I don't have a response for that."
                 
+        except ClaudeTimeoutError as e:
+            logger.error(f"Claude CLI conversation timeout: {e}")
+            return "My response timed out. Could you try rephrasing your question?"
+        except CLAUDE_ERRORS as e:
+            logger.error(f"Claude CLI conversation error: {e}")
+            return f"I encountered an error: {e}"
         except FileNotFoundError as e:
             logger.error(f"Claude CLI not found for conversation: {e}")
             return "Claude Code CLI is not installed. I can't process your message."
@@ -184,6 +240,43 @@ class ClaudeBridge:
             # Return the actual error for debugging
             return f"I encountered an error: {str(e)}"
     
+    async def _stream_proxy_text(self, prompt: str, is_command: bool, timeout: float) -> AsyncIterator[str]:
+        """Text deltas from the proxy's streaming endpoint (or its whole reply if streaming is off)"""
+        if not self.proxy.streaming:
+            yield await self._complete(prompt, is_command, timeout)
+            return
+        
+        streamed = False
+        async for event in self.proxy.stream(prompt, self.session_id or self.proxy_session_id, is_command):
+            event_type = event.get('type')
+            if event_type == 'session':
+                self.proxy_session_id = event.get('session_id') or self.proxy_session_id
+            elif event_type == 'text':
+                streamed = True
+                yield event.get('text', '')
+            elif event_type == 'done':
+                if not event.get('success', True):
+                    logger.error(f"Claude proxy error: {event.get('error')}")
+                if not streamed or not event.get('success', True):
+                    # Nothing was streamed, or the proxy phrased a failure for voice
+                    yield "\n" + event.get('response', '')
+    
+    async def _complete(self, prompt: str, is_command: bool, timeout: float) -> str:
+        """Run one request on the configured transport and return Claude's reply"""
+        if self.transport != 'proxy':
+            return await self.pool.request(prompt, self._conversation_key(), timeout)
+        
+        result = await self.proxy.request(prompt, self.session_id or self.proxy_session_id, is_command, timeout)
+        self.proxy_session_id = result.get('session_id') or self.proxy_session_id
+        if not result.get('success', True):
+            # The proxy already phrases failures for voice
+            logger.error(f"Claude proxy error: {result.get('error')}")
+        return result.get('response', '')
+    
+    def _conversation_key(self) -> str:
+        """Requests in the same conversation go to the worker holding its context"""
+        return self.session_id or self.default_conversation
+    
     def _format_for_voice(self, text: str) -> str:
         """Format Claude's response for voice synthesis"""
         if not text:
@@ -205,7 +298,10 @@ class ClaudeBridge:
             else:
                 text = text[:max_chars] + "..."
         
-        # Clean up common formatting issues for voice
+        return self._clean_for_voice(text)
+    
+    def _clean_for_voice(self, text: str) -> str:
+        """Clean up common formatting issues for voice"""
         text = text.replace('\n', ' ')  # Remove line breaks
         text = text.replace('  ', ' ')  # Remove double spaces
         text = self._replace_code_references(text)
@@ -239,7 +335,23 @@ class ClaudeBridge:
     def get_status(self) -> Dict[str, Any]:
         """Get bridge status information"""
         return {
+            "transport": self.transport,
             "proxy_url": self.proxy_url,
             "session_id": self.session_id,
-            "connected": True
-        }
\ No newline at end of file
+            "connected": True,
+            "pool": self.pool.stats(),
+            "proxy": self.proxy.stats()
+        }
+    
+    def _load_config(self) -> dict:
+        """Load configuration from file or use defaults"""
+        config_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config', 'claude_config.json')
+        
+        try:
+            if os.path.exists(config_path):
+                with open(config_path, 'r') as f:
+                    return json.load(f)
+        except Exception as e:
+            logger.error(f"Error loading config: {e}")
+        
+        return {"cli_path": "claude", "cwd": "/app"}
\ No newline at end of file
@@ -0,0 +1,413 @@
+"""
+Claude Pool - warm, long-lived Claude CLI workers
+
+Spawning `claude --print` per utterance pays Node.js startup, CLI init and
+context loading every time. The pool keeps `size` CLI processes running in
+streaming mode (--input-format stream-json --output-format stream-json), so a
+request is one JSON line written to a worker's stdin and the answer streams
+back as JSON lines on its stdout, ending with a `result` message.
+
+A worker keeps the context of the conversation it has served, so requests
+carry a conversation key and go to the worker already bound to that key.
+Unbound (fresh) workers take new conversations; when none is free the least
+recently used idle conversation gives up its worker. Workers are recycled
+after max_requests_per_worker requests or when their RSS passes max_rss_mb,
+and respawned if they die; a recycled worker resumes its conversation with
+--resume so the context survives the restart.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from typing import AsyncIterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+STREAM_LIMIT_BYTES = 16 * 1024 * 1024  # One stdout line can hold a whole assistant message
+
+
+def stream_json_command(cli_path: str = 'claude', include_partial_messages: bool = False,
+                        extra_args: Optional[List[str]] = None) -> List[str]:
+    """CLI invocation for a persistent worker speaking stream-json on stdin/stdout"""
+    command = [cli_path, '--print',
+               '--input-format', 'stream-json',
+               '--output-format', 'stream-json',
+               '--verbose']
+    if include_partial_messages:
+        command.append('--include-partial-messages')
+    command.extend(extra_args or [])
+    return command
+
+
+class ClaudeWorkerError(Exception):
+    """A worker failed to answer (exited or returned an error result)"""
+
+
+class ClaudeTimeoutError(Exception):
+    """Claude produced no result in time; raised by both the pool and the proxy client"""
+
+
+class ClaudeWorker:
+    """One persistent CLI process in stream-json mode"""
+
+    def __init__(self, worker_id: int, command: List[str], cwd: Optional[str] = None):
+        self.worker_id = worker_id
+        self.command = command
+        self.cwd = cwd
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.stderr_tail: List[str] = []
+        self._stderr_task: Optional[asyncio.Task] = None
+
+        # Routing state
+        self.conversation: Optional[str] = None  # Conversation whose context this worker holds
+        self.session_id: Optional[str] = None  # CLI session id, used to --resume after recycling
+        self.busy = False
+        self.last_used = 0.0
+
+        # Counters
+        self.requests_served = 0  # Since the current process started
+        self.total_requests = 0
+        self.restarts = 0
+
+    async def spawn(self, resume: Optional[str] = None):
+        """Start the CLI process, resuming CLI session `resume` if given"""
+        command = list(self.command)
+        if resume:
+            command.extend(['--resume', resume])
+
+        self.process = await asyncio.create_subprocess_exec(
+            *command,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            cwd=self.cwd,
+            limit=STREAM_LIMIT_BYTES
+        )
+        self.requests_served = 0
+        self.stderr_tail = []
+        self._stderr_task = asyncio.get_running_loop().create_task(self._drain_stderr(self.process))
+
+    async def _drain_stderr(self, process: asyncio.subprocess.Process):
+        """Keep stderr from filling its pipe, remembering the last lines for error reports"""
+        while True:
+            line = await process.stderr.readline()
+            if not line:
+                return
+            self.stderr_tail = (self.stderr_tail + [line.decode('utf-8', errors='ignore').rstrip()])[-10:]
+
+    async def stop(self, timeout_s: float = 5.0):
+        """Close stdin and wait for the process to exit, killing it if it does not"""
+        process = self.process
+        if process is None:
+            return
+        self.process = None
+
+        if process.returncode is None:
+            try:
+                process.stdin.close()
+                await asyncio.wait_for(process.wait(), timeout_s)
+            except (asyncio.TimeoutError, ProcessLookupError, BrokenPipeError, ConnectionResetError):
+                try:
+                    process.kill()
+                except ProcessLookupError:
+                    pass
+                await process.wait()
+        if self._stderr_task:
+            self._stderr_task.cancel()
+
+    def kill(self):
+        """Kill the process without waiting; safe to call while being cancelled"""
+        process = self.process
+        if process is None:
+            return
+        self.process = None
+        if process.returncode is None:
+            try:
+                process.kill()
+            except ProcessLookupError:
+                pass
+        if self._stderr_task:
+            self._stderr_task.cancel()
+
+    async def restart(self, resume: Optional[str] = None):
+        await self.stop()
+        self.restarts += 1
+        await self.spawn(resume)
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+    def rss_mb(self) -> Optional[float]:
+        """Resident set size of the worker process from /proc, if available"""
+        if not self.alive:
+            return None
+        try:
+            with open(f"/proc/{self.process.pid}/status") as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        return int(line.split()[1]) / 1024.0
+        except (OSError, ValueError, IndexError):
+            pass
+        return None
+
+    async def send(self, prompt: str, timeout_s: float) -> AsyncIterator[dict]:
+        """Write one user message and yield stream-json events up to and including its result"""
+        if not self.alive:
+            raise ClaudeWorkerError(f"worker {self.worker_id} is not running")
+
+        message = {
+            "type": "user",
+            "message": {"role": "user", "content": [{"type": "text", "text": prompt}]}
+        }
+        try:
+            self.process.stdin.write((json.dumps(message) + '\n').encode('utf-8'))
+            await self.process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError) as e:
+            raise ClaudeWorkerError(f"worker {self.worker_id} stdin closed: {e}")
+
+        self.requests_served += 1
+        self.total_requests += 1
+        deadline = time.time() + timeout_s
+
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                raise asyncio.TimeoutError()
+            line = await asyncio.wait_for(self.process.stdout.readline(), remaining)
+            if not line:
+                try:
+                    await asyncio.wait_for(self.process.wait(), 1.0)
+                except asyncio.TimeoutError:
+                    pass
+                detail = '; '.join(self.stderr_tail) or f"exit code {self.process.returncode}"
+                raise ClaudeWorkerError(f"worker {self.worker_id} exited: {detail}")
+
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue  # Not protocol output (e.g. a warning printed to stdout)
+
+            if event.get('session_id'):
+                self.session_id = event['session_id']
+            yield event
+            if event.get('type') == 'result':
+                return
+
+    def stats(self) -> dict:
+        return {
+            "alive": self.alive,
+            "busy": self.busy,
+            "conversation": self.conversation,
+            "requests_served": self.requests_served,
+            "total_requests": self.total_requests,
+            "restarts": self.restarts,
+            "rss_mb": self.rss_mb()
+        }
+
+
+class ClaudeWorkerPool:
+    """Fixed-size pool of warm CLI workers with conversation affinity"""
+
+    def __init__(self, cli_path: str = 'claude', cwd: Optional[str] = None, size: int = 2,
+                 max_requests_per_worker: int = 50, max_rss_mb: Optional[float] = 1024,
+                 health_check_interval_s: float = 30.0, include_partial_messages: bool = False,
+                 extra_args: Optional[List[str]] = None):
+        command = stream_json_command(cli_path, include_partial_messages, extra_args)
+        self.workers = [ClaudeWorker(worker_id, command, cwd) for worker_id in range(max(1, size))]
+        self.max_requests_per_worker = max_requests_per_worker
+        self.max_rss_mb = max_rss_mb
+        self.health_check_interval_s = health_check_interval_s
+
+        self._available: Optional[asyncio.Condition] = None
+        self._health_task: Optional[asyncio.Task] = None
+        self.started = False
+
+        # Counters
+        self.requests = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.recycles = 0
+        self.affinity_hits = 0
+
+    @classmethod
+    def from_config(cls, claude_config: dict) -> 'ClaudeWorkerPool':
+        """Build a pool from claude_config.json"""
+        pool_config = claude_config.get('pool', {})
+        return cls(
+            cli_path=claude_config.get('cli_path', 'claude'),
+            cwd=claude_config.get('cwd'),
+            size=pool_config.get('size', 2),
+            max_requests_per_worker=pool_config.get('max_requests_per_worker', 50),
+            max_rss_mb=pool_config.get('max_rss_mb', 1024),
+            health_check_interval_s=pool_config.get('health_check_interval_s', 30.0),
+            include_partial_messages=pool_config.get('include_partial_messages', False),
+            extra_args=claude_config.get('extra_args', [])
+        )
+
+    async def start(self):
+        """Spawn every worker and start health checks on the running loop"""
+        if self.started:
+            return
+        self.started = True
+        self._available = asyncio.Condition()
+        try:
+            await asyncio.gather(*[worker.spawn() for worker in self.workers])
+        except BaseException:
+            self.started = False
+            await asyncio.gather(*[worker.stop() for worker in self.workers], return_exceptions=True)
+            raise
+        self._health_task = asyncio.get_running_loop().create_task(self._health_loop())
+        logger.info(f"Claude worker pool started with {len(self.workers)} workers")
+
+    async def stop(self):
+        """Stop health checks and every worker process"""
+        if not self.started:
+            return
+        self.started = False
+        if self._health_task:
+            self._health_task.cancel()
+            await asyncio.gather(self._health_task, return_exceptions=True)
+            self._health_task = None
+        await asyncio.gather(*[worker.stop() for worker in self.workers], return_exceptions=True)
+
+    async def stream(self, prompt: str, conversation: Optional[str] = None,
+                     timeout_s: float = 60.0) -> AsyncIterator[dict]:
+        """Run a prompt on the conversation's worker, yielding its stream-json events"""
+        await self.start()
+        worker = await self._acquire(conversation)
+        self.requests += 1
+        ok = False
+        try:
+            async for event in worker.send(prompt, timeout_s):
+                if event.get('type') == 'result':
+                    ok = True  # Turn complete; the worker is reusable even if the caller stops here
+                yield event
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise ClaudeTimeoutError(f"no result within {timeout_s:g}s")
+        except ClaudeWorkerError:
+            self.failures += 1
+            raise
+        finally:
+            await self._release(worker, ok)
+
+    async def request(self, prompt: str, conversation: Optional[str] = None,
+                      timeout_s: float = 60.0) -> str:
+        """Run a prompt and return the final result text"""
+        result = None
+        async for event in self.stream(prompt, conversation, timeout_s):
+            if event.get('type') == 'result':
+                result = event
+        if result is None:
+            raise ClaudeWorkerError("stream ended without a result")
+        if result.get('is_error'):
+            raise ClaudeWorkerError(result.get('result') or result.get('subtype', 'error'))
+        return result.get('result', '')
+
+    async def _acquire(self, conversation: Optional[str]) -> ClaudeWorker:
+        """Wait for the conversation's worker, a fresh one, or the LRU idle one to take over"""
+        async with self._available:
+            while True:
+                worker, reassign = self._pick(conversation)
+                if worker:
+                    break
+                await self._available.wait()
+
+            worker.busy = True
+            if worker.conversation == conversation and conversation is not None:
+                self.affinity_hits += 1
+
+        try:
+            if reassign:
+                # Drop the previous conversation's context before taking on a new one
+                await self._recycle(worker)
+            elif not worker.alive:
+                await self._recycle(worker, resume=worker.session_id if worker.conversation else None)
+        except BaseException:
+            worker.busy = False
+            async with self._available:
+                self._available.notify_all()
+            raise
+        worker.conversation = conversation
+        return worker
+
+    def _pick(self, conversation: Optional[str]):
+        """(worker, needs_fresh_context) for a conversation, or (None, False) to wait"""
+        if conversation is not None:
+            for worker in self.workers:
+                if worker.conversation == conversation:
+                    return (None, False) if worker.busy else (worker, False)
+
+        idle = [worker for worker in self.workers if not worker.busy]
+        fresh = [worker for worker in idle if worker.conversation is None and worker.requests_served == 0]
+        if fresh:
+            return fresh[0], False
+        if idle:
+            return min(idle, key=lambda worker: worker.last_used), True
+        return None, False
+
+    async def _release(self, worker: ClaudeWorker, ok: bool):
+        """Return a worker, recycling it if it failed, is worn out or is a one-off"""
+        worker.last_used = time.time()
+        try:
+            if not ok or not worker.alive:
+                # Mid-turn state is unknown after a failure; restart from the saved session
+                await self._recycle(worker, resume=worker.session_id if worker.conversation else None)
+            elif worker.conversation is None:
+                # Keyless requests never share context
+                await self._recycle(worker)
+            elif self._worn_out(worker):
+                await self._recycle(worker, resume=worker.session_id)
+        except Exception as e:
+            logger.error(f"Failed to recycle Claude worker {worker.worker_id}: {e}")
+        finally:
+            worker.busy = False
+            async with self._available:
+                self._available.notify_all()
+
+    def _worn_out(self, worker: ClaudeWorker) -> bool:
+        if self.max_requests_per_worker and worker.requests_served >= self.max_requests_per_worker:
+            return True
+        rss = worker.rss_mb()
+        return bool(self.max_rss_mb and rss is not None and rss > self.max_rss_mb)
+
+    async def _recycle(self, worker: ClaudeWorker, resume: Optional[str] = None):
+        self.recycles += 1
+        if not resume:
+            worker.conversation = None
+            worker.session_id = None
+        await worker.restart(resume)
+
+    async def _health_loop(self):
+        """Respawn dead idle workers and recycle idle ones over the memory limit"""
+        while True:
+            await asyncio.sleep(self.health_check_interval_s)
+            for worker in self.workers:
+                if worker.busy or (worker.alive and not self._worn_out(worker)):
+                    continue
+                worker.busy = True
+                try:
+                    if not worker.alive:
+                        logger.warning(f"Claude worker {worker.worker_id} died, respawning")
+                    await self._recycle(worker, resume=worker.session_id if worker.conversation else None)
+                except Exception as e:
+                    logger.error(f"Claude worker {worker.worker_id} health check failed: {e}")
+                finally:
+                    worker.busy = False
+                    async with self._available:
+                        self._available.notify_all()
+
+    def stats(self) -> dict:
+        """Pool counters plus per-worker state"""
+        return {
+            "size": len(self.workers),
+            "busy": sum(1 for worker in self.workers if worker.busy),
+            "requests": self.requests,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "recycles": self.recycles,
+            "affinity_hits": self.affinity_hits,
+            "workers": [worker.stats() for worker in self.workers]
+        }
@@ -0,0 +1,189 @@
+"""
+Claude Proxy Client - pooled keep-alive HTTP transport to claude_proxy.py
+
+With `transport: "proxy"` in claude_config.json the bot container does not
+run the Claude CLI at all; requests go to the claude_proxy.py /claude
+endpoint on a (possibly bigger) host. One httpx.AsyncClient with a bounded
+keep-alive connection pool is shared by every request, so each utterance
+reuses a warm TCP connection instead of opening a new one. Requests that
+never reached the proxy (connect errors, pool timeouts) and gateway errors
+(502/503/504) are retried with exponential backoff; read timeouts are not,
+since the proxy may still be running the request and a retry could run a
+command twice.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from typing import AsyncIterator, Optional
+
+import httpx
+
+from .claude_pool import ClaudeTimeoutError
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = (502, 503, 504)
+
+
+class ClaudeProxyError(Exception):
+    """The proxy could not be reached or returned an error"""
+
+
+class ClaudeProxyClient:
+    """Keep-alive client for the Claude proxy's HTTP API"""
+
+    def __init__(self, url: str = 'http://localhost:8001', connect_timeout_s: float = 2.0,
+                 retries: int = 2, retry_backoff_s: float = 0.25, max_connections: int = 10,
+                 max_keepalive_connections: int = 5, keepalive_expiry_s: float = 60.0,
+                 stream: bool = True, stream_idle_timeout_s: float = 30.0):
+        self.url = url.rstrip('/')
+        self.streaming = stream
+        self.stream_idle_timeout_s = stream_idle_timeout_s
+        self.connect_timeout_s = connect_timeout_s
+        self.retries = retries
+        self.retry_backoff_s = retry_backoff_s
+        self.client = httpx.AsyncClient(
+            base_url=self.url,
+            timeout=httpx.Timeout(30.0, connect=connect_timeout_s),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry_s
+            )
+        )
+
+        # Counters
+        self.requests = 0
+        self.retried = 0
+        self.failures = 0
+        self.total_latency_s = 0.0
+
+    @classmethod
+    def from_config(cls, proxy_config: dict, default_url: str) -> 'ClaudeProxyClient':
+        """Build a client from the `proxy` config section"""
+        return cls(
+            url=proxy_config.get('url') or default_url,
+            connect_timeout_s=proxy_config.get('connect_timeout_s', 2.0),
+            retries=proxy_config.get('retries', 2),
+            retry_backoff_s=proxy_config.get('retry_backoff_s', 0.25),
+            max_connections=proxy_config.get('max_connections', 10),
+            max_keepalive_connections=proxy_config.get('max_keepalive_connections', 5),
+            keepalive_expiry_s=proxy_config.get('keepalive_expiry_s', 60.0),
+            stream=proxy_config.get('stream', True),
+            stream_idle_timeout_s=proxy_config.get('stream_idle_timeout_s', 30.0)
+        )
+
+    async def warm_up(self) -> bool:
+        """Open a keep-alive connection ahead of the first request; returns whether the proxy answered"""
+        try:
+            response = await self.client.get('/health')
+            return response.status_code == 200
+        except httpx.HTTPError as e:
+            logger.warning(f"Claude proxy at {self.url} not reachable yet: {e}")
+            return False
+
+    async def request(self, text: str, session_id: Optional[str] = None, is_command: bool = False,
+                      timeout_s: float = 30.0) -> dict:
+        """POST /claude, retrying requests that never reached the proxy; returns its JSON body"""
+        payload = {"text": text, "session_id": session_id, "is_command": is_command}
+        timeout = httpx.Timeout(timeout_s, connect=self.connect_timeout_s)
+        self.requests += 1
+        started = time.time()
+
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self.retried += 1
+                await asyncio.sleep(self.retry_backoff_s * 2 ** (attempt - 1))
+            try:
+                response = await self.client.post('/claude', json=payload, timeout=timeout)
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as e:
+                error = f"proxy unreachable: {e}"
+                continue
+            except httpx.TimeoutException:
+                self.failures += 1
+                raise ClaudeTimeoutError(f"no result within {timeout_s:g}s")
+            except httpx.HTTPError as e:
+                self.failures += 1
+                raise ClaudeProxyError(f"proxy request failed: {e}")
+
+            if response.status_code in RETRY_STATUSES:
+                error = f"proxy returned HTTP {response.status_code}"
+                continue
+            if response.status_code != 200:
+                self.failures += 1
+                raise ClaudeProxyError(f"proxy returned HTTP {response.status_code}: {response.text}")
+
+            self.total_latency_s += time.time() - started
+            return response.json()
+
+        self.failures += 1
+        raise ClaudeProxyError(error)
+
+    async def stream(self, text: str, session_id: Optional[str] = None,
+                     is_command: bool = False) -> AsyncIterator[dict]:
+        """
+        POST /claude/stream and yield its JSON-line events as they arrive
+
+        There is no overall deadline: the proxy sends heartbeats while Claude
+        works, so the stream only fails if nothing at all arrives for
+        stream_idle_timeout_s. Closing the iterator early closes the
+        connection, which cancels the request on the proxy.
+        """
+        payload = {"text": text, "session_id": session_id, "is_command": is_command}
+        timeout = httpx.Timeout(self.stream_idle_timeout_s, connect=self.connect_timeout_s)
+        self.requests += 1
+        started = time.time()
+
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self.retried += 1
+                await asyncio.sleep(self.retry_backoff_s * 2 ** (attempt - 1))
+            try:
+                async with self.client.stream('POST', '/claude/stream', json=payload, timeout=timeout) as response:
+                    if response.status_code in RETRY_STATUSES:
+                        error = f"proxy returned HTTP {response.status_code}"
+                        continue
+                    if response.status_code != 200:
+                        self.failures += 1
+                        body = (await response.aread()).decode(errors='replace')
+                        raise ClaudeProxyError(f"proxy returned HTTP {response.status_code}: {body}")
+
+                    async for line in response.aiter_lines():
+                        if not line.strip():
+                            continue
+                        event = json.loads(line)
+                        if event.get('type') == 'heartbeat':
+                            continue
+                        yield event
+                        if event.get('type') == 'done':
+                            self.total_latency_s += time.time() - started
+                            return
+                    self.failures += 1
+                    raise ClaudeProxyError("proxy stream ended without a result")
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as e:
+                error = f"proxy unreachable: {e}"
+                continue
+            except httpx.TimeoutException:
+                self.failures += 1
+                raise ClaudeTimeoutError(f"no output within {self.stream_idle_timeout_s:g}s")
+            except httpx.HTTPError as e:
+                self.failures += 1
+                raise ClaudeProxyError(f"proxy request failed: {e}")
+
+        self.failures += 1
+        raise ClaudeProxyError(error)
+
+    async def close(self):
+        await self.client.aclose()
+
+    def stats(self) -> dict:
+        completed = self.requests - self.failures
+        return {
+            "url": self.url,
+            "requests": self.requests,
+            "retried": self.retried,
+            "failures": self.failures,
+            "mean_latency_s": self.total_latency_s / completed if completed else None
+        }
@@ -11,19 +11,29 @@ import io
 import json
 import logging
 import os
-import struct
+import shutil
 import threading
 import time
 import uuid
-from queue import Queue
-from typing import Dict, Optional
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Tuple
 
 import httpx
 import numpy as np
-from fastapi import FastAPI, File, Form, HTTPException, UploadFile
+from fastapi import FastAPI, File, Form, HTTPException, Request, UploadFile, WebSocket
 from fastapi.responses import JSONResponse
 import uvicorn
 
+from .audio_dsp import pcm16_to_array, rms_energy, wav_to_pcm16
+from .endpointer import UtteranceEndpointer
+from .long_audio import SilenceSplitter, WindowTranscriptionError, iter_upload_pcm, stitch_windows
+from .metrics import LatencyHistogram
+from .resampler import PolyphaseResampler, resample_pcm16
+from .stt_backends import STTBackendError, STTBackendPool
+from .transcription_stream import TranscriptionStreamSession
+from .upload_format import REJECTED_STATUSES, UploadEncoder
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
@@ -33,72 +43,208 @@ class DiscordAudioBridge:
     def __init__(self):
         self.config = self._load_config()
         self.whisper_base_url = os.getenv('WHISPER_CPP_BASE_URL', 'http://whisper-stt:9000')
+        self.backends = STTBackendPool.from_config(self.config.get('whisper', {}), self.whisper_base_url)
         self.client = httpx.AsyncClient(timeout=30.0)
+        self.upload = UploadEncoder.from_config(self.config.get('whisper', {}), 16000)
         
         # Audio streaming state
-        self.audio_streams: Dict[str, Queue] = {}
+        self.audio_streams: Dict[str, TranscriptionStreamSession] = {}
         self.active_transcriptions: Dict[str, dict] = {}
         self.stream_lock = threading.Lock()
         
-        # Discord audio processor integration
-        self.discord_audio_queue = Queue()
+        # Audio posted to /discord/audio is resampled to 16kHz as it arrives (so
+        # filter state carries across 20ms packets) and assembled into whole
+        # utterances, so whisper is called once per utterance, not per frame
+        self.discord_resampler = PolyphaseResampler(48000, 16000)
+        audio_config = self.config.get('audio', {})
+        self.energy_threshold = audio_config.get('energy_threshold', 50)
+        self.assembler = UtteranceEndpointer.from_config(
+            self.config.get('vad', {}), 16000,
+            audio_config.get('buffer_capacity_s', 60.0),
+            self.config.get('timeouts', {}).get('segment_timeout_s', 8.0)
+        )
+        
+        # Bounded so a slow whisper sheds the oldest audio instead of growing without limit
+        backpressure_config = self.config.get('backpressure', {})
+        self.queue_max_utterances = backpressure_config.get('bridge_queue_max_utterances', 20)
+        self.discord_audio_queue: Optional[asyncio.Queue] = None
+        self.utterances_dropped = 0
+        self.seconds_dropped = 0.0
+        
+        # Transcripts of the bot's own STT pipeline, shared with bridge consumers
+        self.transcriptions: deque = deque(maxlen=100)
+        self.transcription_sequence = 0
+        
+        # Ingest runs as worker tasks on uvicorn's event loop
+        bridge_config = self.config.get('bridge', {})
+        self.ingest_workers = bridge_config.get('ingest_workers', 2)
+        
+        # Long uploads are split into windows that fit the model and sent in parallel
+        self.long_audio_window_s = bridge_config.get('long_audio_window_s', 30)
+        self.long_audio_search_s = bridge_config.get('long_audio_search_s', 5)
+        self.long_audio_concurrency = bridge_config.get('long_audio_concurrency', 4)
+        self.long_audio_retries = bridge_config.get('long_audio_retries', 2)
+        
+        # Real-time WebSocket streams, each with its own flow control
+        self.max_streams = bridge_config.get('max_streams', 8)
+        self.stream_queue_chunks = bridge_config.get('stream_queue_chunks', 50)
+        self.stream_max_in_flight = bridge_config.get('stream_max_in_flight', 2)
+        self.streams_rejected = 0
         self.processing_active = False
-        self.processing_thread = None
+        self.processing_tasks: List[asyncio.Task] = []
+        self.assembler_wakeup: Optional[asyncio.Event] = None
+        self.ingest_latency = LatencyHistogram()
         
     async def start_processing(self):
-        """Start Discord audio processing thread"""
+        """Start the Discord audio ingest workers on the running (uvicorn) loop"""
         if not self.processing_active:
             self.processing_active = True
-            self.processing_thread = threading.Thread(target=self._process_discord_audio)
-            self.processing_thread.daemon = True
-            self.processing_thread.start()
-            logger.info("Discord audio processing started")
+            self.discord_audio_queue = asyncio.Queue(maxsize=self.queue_max_utterances)
+            self.assembler_wakeup = asyncio.Event()
+            loop = asyncio.get_running_loop()
+            self.processing_tasks = [
+                loop.create_task(self._ingest_worker(worker_id))
+                for worker_id in range(self.ingest_workers)
+            ]
+            self.processing_tasks.append(loop.create_task(self._poll_assembler()))
+            self.backends.start_probing(self.client)
+            logger.info(f"Discord audio processing started with {self.ingest_workers} workers")
     
     async def stop_processing(self):
-        """Stop Discord audio processing"""
+        """Cancel the ingest workers, including in-flight transcriptions"""
         self.processing_active = False
-        if self.processing_thread and self.processing_thread.is_alive():
-            self.processing_thread.join(timeout=5)
-            logger.info("Discord audio processing stopped")
+        await self.backends.stop_probing()
+        for task in self.processing_tasks:
+            task.cancel()
+        await asyncio.gather(*self.processing_tasks, return_exceptions=True)
+        self.processing_tasks = []
+        logger.info("Discord audio processing stopped")
     
-    def _process_discord_audio(self):
-        """Process Discord audio data from queue"""
-        # Create a new event loop for this thread
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        while self.processing_active:
+    async def _ingest_worker(self, worker_id: int):
+        """Transcribe queued utterances until cancelled"""
+        while True:
+            enqueued_at, audio_data = await self.discord_audio_queue.get()
             try:
-                if not self.discord_audio_queue.empty():
-                    audio_data = self.discord_audio_queue.get(timeout=1)
-                    # Process the audio data asynchronously
-                    loop.run_until_complete(self._handle_discord_audio(audio_data))
-                else:
-                    time.sleep(0.1)  # Brief sleep if no data
+                await self._handle_discord_audio(audio_data)
+                self.ingest_latency.observe(time.time() - enqueued_at)
             except Exception as e:
-                logger.error(f"Error processing Discord audio: {e}")
-                time.sleep(1)
-        
-        # Close the loop when done
-        loop.close()
+                logger.error(f"Error processing Discord audio in worker {worker_id}: {e}")
+            finally:
+                self.discord_audio_queue.task_done()
+    
+    async def _poll_assembler(self):
+        """Close an utterance whose frames stopped arriving (clients send nothing during silence)"""
+        while True:
+            with self.stream_lock:
+                deadline = self.assembler.next_deadline()
+            timeout = max(deadline - time.time(), 0.0) if deadline is not None else None
+            
+            try:
+                await asyncio.wait_for(self.assembler_wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            self.assembler_wakeup.clear()
+            
+            with self.stream_lock:
+                utterance = self.assembler.poll()
+            if utterance:
+                self._enqueue_discord_audio(utterance.samples.tobytes())
     
     async def _handle_discord_audio(self, audio_data: bytes):
         """Handle Discord audio data for real-time transcription"""
         try:
             # Convert and transcribe audio
-            transcription = await self._transcribe_audio_data(audio_data)
+            transcription = await self._transcribe_audio_data(audio_data, sample_rate=16000)
             if transcription:
-                logger.info(f"Discord transcription: {transcription}")
+                self.add_transcription({
+                    "text": transcription,
+                    "end": len(audio_data) / 2 / 16000,
+                    "completed": True,
+                    "type": "final",
+                    "source": "bridge"
+                })
         except Exception as e:
             logger.error(f"Error handling Discord audio: {e}")
     
-    def add_discord_audio(self, audio_data: bytes):
-        """Add Discord audio data to processing queue"""
+    def add_discord_audio(self, audio_data: bytes, sample_rate: int = 48000):
+        """Resample mono audio to 16kHz and feed it to the utterance assembler"""
         try:
-            self.discord_audio_queue.put(audio_data)
+            with self.stream_lock:
+                if sample_rate != 16000:
+                    samples = self.discord_resampler.process_pcm16(audio_data)
+                else:
+                    samples = pcm16_to_array(audio_data)
+                is_speech = rms_energy(samples.tobytes()) >= self.energy_threshold
+                was_open = self.assembler.in_utterance
+                utterances = self.assembler.push(samples, is_speech)
+                opened = not was_open and self.assembler.in_utterance
+            
+            for utterance in utterances:
+                self._enqueue_discord_audio(utterance.samples.tobytes())
+            if opened and self.assembler_wakeup:
+                # The poller has a new silence deadline to wait for
+                self.assembler_wakeup.set()
         except Exception as e:
             logger.error(f"Error adding Discord audio: {e}")
     
+    def add_transcription(self, transcription: dict):
+        """Record a transcript for bridge consumers (thread-safe)"""
+        with self.stream_lock:
+            self.transcription_sequence += 1
+            self.transcriptions.append({**transcription, "sequence": self.transcription_sequence})
+        logger.info(f"Discord transcription: {transcription.get('text', '')}")
+    
+    def get_transcriptions(self, since: int = 0) -> list:
+        """Transcripts recorded after sequence number `since`"""
+        with self.stream_lock:
+            return [t for t in self.transcriptions if t["sequence"] > since]
+    
+    def _enqueue_discord_audio(self, audio_data: bytes):
+        """Queue a 16kHz utterance (on the bridge loop), dropping the oldest one when full"""
+        if self.discord_audio_queue is None:
+            logger.warning("Discord audio processing not started, dropping utterance")
+            return
+        
+        while True:
+            try:
+                self.discord_audio_queue.put_nowait((time.time(), audio_data))
+                return
+            except asyncio.QueueFull:
+                try:
+                    _, dropped = self.discord_audio_queue.get_nowait()
+                    self.discord_audio_queue.task_done()
+                    self.utterances_dropped += 1
+                    self.seconds_dropped += len(dropped) / 2 / 16000
+                except asyncio.QueueEmpty:
+                    pass
+    
+    async def stream_transcription(self, websocket: WebSocket, encoding: str = 'pcm',
+                                   sample_rate: int = 48000, language: Optional[str] = None):
+        """Serve one real-time transcription stream over an accepted WebSocket"""
+        if len(self.audio_streams) >= self.max_streams:
+            self.streams_rejected += 1
+            await websocket.send_json({"type": "error", "detail": "too many concurrent streams"})
+            await websocket.close(code=1013)  # Try again later
+            return
+        
+        try:
+            session = TranscriptionStreamSession(
+                self, websocket, encoding, sample_rate, language,
+                queue_chunks=self.stream_queue_chunks, max_in_flight=self.stream_max_in_flight
+            )
+        except (ValueError, ImportError) as e:
+            await websocket.send_json({"type": "error", "detail": f"cannot decode stream: {e}"})
+            await websocket.close(code=1003)  # Unsupported data
+            return
+        
+        self.audio_streams[session.session_id] = session
+        logger.info(f"Transcription stream {session.session_id} opened ({encoding}, {sample_rate}Hz)")
+        try:
+            await session.run()
+        finally:
+            del self.audio_streams[session.session_id]
+            logger.info(f"Transcription stream {session.session_id} closed: {session.stats()}")
+    
     async def transcribe_audio(self, 
                              file: UploadFile,
                              model: str = "whisper-1",
@@ -111,155 +257,226 @@ class DiscordAudioBridge:
         Compatible with /v1/audio/transcriptions API format
         """
         try:
-            # Read audio file data
-            audio_data = await file.read()
-            
-            # Transcribe the audio
-            result = await self._transcribe_audio_data(audio_data, language=language)
+            # Decode, window and transcribe the upload in parallel
+            text, segments, duration = await self._transcribe_upload(file, language)
             
             if response_format == "json":
-                return {"text": result}
+                return {"text": text}
             elif response_format == "text":
-                return result
+                return text
             elif response_format == "srt":
-                return self._format_as_srt(result)
+                return self._format_as_srt(segments)
             elif response_format == "verbose_json":
                 return {
                     "task": "transcribe",
                     "language": language or "en",
-                    "duration": 0.0,  # We don't track duration in this simple implementation
-                    "text": result,
-                    "segments": [{"id": 0, "start": 0.0, "end": 0.0, "text": result}]
+                    "duration": duration,
+                    "text": text,
+                    "segments": segments
                 }
             else:
-                return {"text": result}
+                return {"text": text}
                 
+        except WindowTranscriptionError as e:
+            logger.error(f"Transcription error: {e}")
+            raise HTTPException(status_code=502, detail=f"Transcription failed: {str(e)}")
         except Exception as e:
             logger.error(f"Transcription error: {e}")
             raise HTTPException(status_code=500, detail=f"Transcription failed: {str(e)}")
     
-    async def _transcribe_audio_data(self, audio_data: bytes, language: Optional[str] = None) -> str:
-        """Send audio data to whisper.cpp for transcription"""
+    async def _transcribe_upload(self, file: UploadFile, language: Optional[str] = None) -> Tuple[str, list, float]:
+        """Stream-decode an upload, split it at silence and transcribe the windows concurrently"""
+        splitter = SilenceSplitter(
+            max_window_s=self.long_audio_window_s, search_s=self.long_audio_search_s
+        )
+        slots = asyncio.Semaphore(self.long_audio_concurrency)
+        
+        async def transcribe_window(offset: int, samples: np.ndarray):
+            # A failed window is retried; if it never succeeds stitch_windows fails the upload
+            for attempt in range(self.long_audio_retries + 1):
+                if attempt:
+                    logger.warning(f"Retrying long-audio window at {offset / 16000:.1f}s (attempt {attempt + 1})")
+                    await asyncio.sleep(0.5 * attempt)
+                async with slots:
+                    result = await self._transcribe_audio_result(samples.tobytes(), language, sample_rate=16000)
+                if result is not None:
+                    break
+            return offset / 16000, samples.size / 16000, result
+        
+        # Windows start transcribing while the rest of the file is still decoding
+        tasks = []
         try:
-            # Prepare audio for whisper.cpp
-            wav_data = self._prepare_audio_for_whisper(audio_data)
-            if not wav_data:
-                return ""
+            if not await self._can_decode(file):
+                # No local decoder for this format: the webservice's own ffmpeg gets the whole file
+                await file.seek(0)
+                result = await self._transcribe_audio_result(await file.read(), language, passthrough=True)
+                text, segments = stitch_windows([(0.0, 0.0, result)])
+                return text, segments, segments[-1]["end"] if segments else 0.0
             
-            # Prepare multipart form data for whisper.cpp /asr endpoint
-            files = {
-                'audio_file': ('audio.wav', wav_data, 'audio/wav')
-            }
+            async for chunk in iter_upload_pcm(file):
+                for offset, window in splitter.push(chunk):
+                    tasks.append(asyncio.create_task(transcribe_window(offset, window)))
+            for offset, window in splitter.flush():
+                tasks.append(asyncio.create_task(transcribe_window(offset, window)))
+            results = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        
+        text, segments = stitch_windows(results)
+        return text, segments, splitter.duration
+    
+    async def _can_decode(self, file: UploadFile) -> bool:
+        """16-bit WAV is decoded in-process; anything else needs ffmpeg on this host"""
+        head = await file.read(12)
+        await file.seek(0)
+        if head.startswith(b'RIFF') and head[8:12] == b'WAVE':
+            return True
+        return shutil.which('ffmpeg') is not None
+    
+    async def _transcribe_audio_data(self, audio_data: bytes, language: Optional[str] = None,
+                                     sample_rate: int = 48000) -> str:
+        """Send audio data to the least-loaded healthy whisper backend for transcription"""
+        result = await self._transcribe_audio_result(audio_data, language, sample_rate)
+        return result.get('text', '').strip() if result else ""
+    
+    async def _transcribe_audio_result(self, audio_data: bytes, language: Optional[str] = None,
+                                       sample_rate: int = 48000, passthrough: bool = False) -> Optional[dict]:
+        """Transcribe on the least-loaded healthy backend, returning whisper's JSON result"""
+        try:
+            tried = []
+            while True:
+                backend = self.backends.acquire(exclude=tried)
+                if backend is None:
+                    logger.error("No healthy whisper backend available")
+                    return None
+                
+                started = time.time()
+                try:
+                    result = await self._post_asr(backend.base_url, audio_data, language, sample_rate,
+                                                  passthrough)
+                except (httpx.HTTPError, STTBackendError) as e:
+                    logger.warning(f"Whisper backend {backend.base_url} failed: {e}")
+                    self.backends.release(backend, ok=False)
+                    tried.append(backend)
+                    continue
+                except BaseException:
+                    self.backends.release(backend)
+                    raise
+                
+                self.backends.release(backend, time.time() - started)
+                return result
+                
+        except Exception as e:
+            logger.error(f"Audio transcription error: {e}")
+            return None
+    
+    async def _post_asr(self, base_url: str, audio_data: bytes, language: Optional[str],
+                        sample_rate: int, passthrough: bool = False) -> Optional[dict]:
+        """POST audio to one whisper backend's /asr endpoint, returning its JSON result"""
+        wav_retry = False
+        while True:
+            # Prepare audio for whisper.cpp in the negotiated upload format
+            if passthrough:
+                upload = {'audio_file': ('upload', audio_data, 'application/octet-stream')}, {}
+            else:
+                upload = self._prepare_audio_for_whisper(audio_data, sample_rate,
+                                                         'wav' if wav_retry else None)
+            if not upload:
+                return None
+            files, format_params = upload
             params = {
                 'task': 'transcribe',
                 'language': language or 'en',
-                'output': 'json'
+                'output': 'json',
+                **format_params
             }
             
             # Make request to whisper.cpp service
             response = await self.client.post(
-                f"{self.whisper_base_url}/asr",
+                f"{base_url}/asr",
                 files=files,
                 params=params
             )
             
             if response.status_code == 200:
-                result = response.json()
-                text = result.get('text', '').strip()
-                return text
-            else:
-                logger.error(f"Whisper.cpp error: {response.status_code} - {response.text}")
-                return ""
-                
-        except Exception as e:
-            logger.error(f"Audio transcription error: {e}")
-            return ""
-    
-    def _prepare_audio_for_whisper(self, audio_data: bytes) -> Optional[bytes]:
-        """Prepare audio data for whisper.cpp API"""
-        try:
-            # Check if data is already WAV format
-            if audio_data.startswith(b'RIFF') and b'WAVE' in audio_data[:12]:
-                return audio_data
-            
-            # Assume PCM data and convert to WAV
-            return self._pcm_to_wav(audio_data)
+                if wav_retry:
+                    self.upload.downgrade(500)
+                return response.json()
             
-        except Exception as e:
-            logger.error(f"Audio preparation error: {e}")
+            # Passthrough uploads are not ours to re-encode
+            if not passthrough:
+                if response.status_code in REJECTED_STATUSES and self.upload.downgrade(response.status_code):
+                    continue
+                # A 500 may be transient: retry once as WAV, downgrade only if that works
+                if response.status_code == 500 and not wav_retry and self.upload.format != 'wav':
+                    wav_retry = True
+                    continue
+            if response.status_code >= 500:
+                raise STTBackendError(f"HTTP {response.status_code}")
+            logger.error(f"Whisper.cpp error: {response.status_code} - {response.text}")
             return None
     
-    def _pcm_to_wav(self, pcm_data: bytes) -> Optional[bytes]:
-        """Convert PCM data to WAV format for whisper.cpp"""
+    def _prepare_audio_for_whisper(self, audio_data: bytes, sample_rate: int = 48000,
+                                   upload_format: Optional[str] = None) -> Optional[Tuple[dict, dict]]:
+        """Prepare audio data for whisper.cpp API as (files, params)"""
         try:
-            if len(pcm_data) < 2:
-                return None
+            # WAV uploads are decoded so they can be re-sent as 16kHz pcm/flac
+            if audio_data.startswith(b'RIFF') and b'WAVE' in audio_data[:12]:
+                try:
+                    samples, sample_rate = wav_to_pcm16(audio_data)
+                    audio_data = samples.tobytes()
+                except Exception:
+                    # Formats we cannot decode go through untouched for ffmpeg
+                    return {'audio_file': ('audio.wav', audio_data, 'audio/wav')}, {}
             
-            # Convert 16-bit PCM to numpy array and resample to 16kHz
-            audio_array = self._pcm_to_float32(pcm_data)
-            if audio_array is None:
+            if len(audio_data) < 2:
                 return None
             
-            # Convert float32 back to 16-bit PCM for WAV
-            audio_int16 = (audio_array * 32767).astype(np.int16)
-            
-            # Create WAV header for 16kHz mono
-            sample_rate = 16000
-            num_channels = 1
-            bits_per_sample = 16
-            byte_rate = sample_rate * num_channels * bits_per_sample // 8
-            block_align = num_channels * bits_per_sample // 8
-            data_size = len(audio_int16) * 2
-            
-            # WAV header (44 bytes)
-            wav_header = struct.pack('<4sI4s4sIHHIIHH4sI',
-                b'RIFF', 36 + data_size, b'WAVE', b'fmt ', 16,
-                1, num_channels, sample_rate, byte_rate, block_align, bits_per_sample,
-                b'data', data_size
-            )
-            
-            return wav_header + audio_int16.tobytes()
+            # Anti-aliased resample (no-op if the audio is already 16kHz)
+            samples = resample_pcm16(audio_data, sample_rate, 16000)
+            return self.upload.encode(samples, upload_format)
             
         except Exception as e:
-            logger.error(f"PCM to WAV conversion error: {e}")
-            return None
-    
-    def _pcm_to_float32(self, pcm_data: bytes) -> Optional[np.ndarray]:
-        """Convert PCM bytes to float32 numpy array and resample to 16kHz"""
-        try:
-            # Convert 16-bit PCM to numpy array
-            samples = struct.unpack(f'<{len(pcm_data)//2}h', pcm_data)
-            
-            # Convert to float32 and normalize
-            audio_array = np.array(samples, dtype=np.float32) / 32768.0
-            
-            # Simple downsampling: 48kHz to 16kHz (take every 3rd sample)
-            resampled_array = audio_array[::3]
-            
-            return resampled_array
-            
-        except Exception as e:
-            logger.error(f"PCM conversion error: {e}")
+            logger.error(f"Audio preparation error: {e}")
             return None
     
-    def _format_as_srt(self, text: str) -> str:
-        """Format transcription as SRT subtitle format"""
-        return f"1\n00:00:00,000 --> 00:00:10,000\n{text}\n\n"
+    def _format_as_srt(self, segments: list) -> str:
+        """Format transcription segments as SRT subtitles"""
+        def timestamp(seconds: float) -> str:
+            millis = int(round(seconds * 1000))
+            hours, millis = divmod(millis, 3600000)
+            minutes, millis = divmod(millis, 60000)
+            secs, millis = divmod(millis, 1000)
+            return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis:03d}"
+        
+        return ''.join(
+            f"{index}\n{timestamp(segment['start'])} --> {timestamp(segment['end'])}\n{segment['text']}\n\n"
+            for index, segment in enumerate(segments, start=1)
+        )
     
     async def health_check(self) -> dict:
         """Health check endpoint"""
         try:
-            # Test whisper.cpp connectivity
-            response = await self.client.get(f"{self.whisper_base_url}/docs", timeout=5)
-            whisper_healthy = response.status_code == 200
-        except:
-            whisper_healthy = False
+            # Test connectivity of every whisper backend
+            healthy_backends = await self.backends.check_all(self.client, 5)
+        except Exception:
+            healthy_backends = 0
+        whisper_healthy = healthy_backends > 0
         
         return {
             "status": "healthy" if whisper_healthy else "degraded",
             "whisper_cpp": "connected" if whisper_healthy else "disconnected",
+            "whisper_backends": self.backends.stats(),
             "bridge_version": "1.0.0",
-            "active_streams": len(self.audio_streams)
+            "active_streams": len(self.audio_streams),
+            "max_streams": self.max_streams,
+            "streams_rejected": self.streams_rejected,
+            "queued_utterances": self.discord_audio_queue.qsize() if self.discord_audio_queue else 0,
+            "ingest_latency": self.ingest_latency.snapshot(),
+            "utterances_dropped": self.utterances_dropped,
+            "seconds_dropped": self.seconds_dropped
         }
     
     def _load_config(self) -> dict:
@@ -281,28 +498,28 @@ class DiscordAudioBridge:
             }
         }
 
-# Create FastAPI application
-app = FastAPI(
-    title="Discord Audio Bridge",
-    description="OpenAI-compatible STT API for Discord voice integration with Claude Code",
-    version="1.0.0"
-)
-
 # Global bridge instance
 bridge = DiscordAudioBridge()
 
-@app.on_event("startup")
-async def startup_event():
-    """Initialize bridge on startup"""
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start the ingest workers on uvicorn's loop and stop them on shutdown"""
     await bridge.start_processing()
     logger.info("Discord Audio Bridge started")
+    try:
+        yield
+    finally:
+        await bridge.stop_processing()
+        await bridge.client.aclose()
+        logger.info("Discord Audio Bridge stopped")
 
-@app.on_event("shutdown")
-async def shutdown_event():
-    """Cleanup on shutdown"""
-    await bridge.stop_processing()
-    await bridge.client.aclose()
-    logger.info("Discord Audio Bridge stopped")
+# Create FastAPI application
+app = FastAPI(
+    title="Discord Audio Bridge",
+    description="OpenAI-compatible STT API for Discord voice integration with Claude Code",
+    version="1.0.0",
+    lifespan=lifespan
+)
 
 @app.get("/health")
 async def health():
@@ -333,6 +550,19 @@ async def create_transcription(
         temperature=temperature
     )
 
+@app.websocket("/v1/audio/stream")
+async def stream_transcription(websocket: WebSocket, encoding: str = "pcm",
+                               sample_rate: int = 48000, language: str = None):
+    """
+    Real-time transcription over a WebSocket
+    
+    Send mono s16le PCM at `sample_rate` (or one Opus packet per message with
+    encoding=opus) as binary messages, and {"type": "end"} to finish. Partial
+    and final transcripts come back as JSON messages.
+    """
+    await websocket.accept()
+    await bridge.stream_transcription(websocket, encoding, sample_rate, language)
+
 @app.get("/v1/models")
 async def list_models():
     """List available models (OpenAI compatibility)"""
@@ -349,11 +579,16 @@ async def list_models():
     }
 
 @app.post("/discord/audio")
-async def receive_discord_audio(audio: bytes):
-    """Endpoint to receive Discord audio data for real-time processing"""
-    bridge.add_discord_audio(audio)
+async def receive_discord_audio(request: Request, sample_rate: int = 48000):
+    """Endpoint to receive raw mono 16-bit Discord audio (request body) for real-time processing"""
+    bridge.add_discord_audio(await request.body(), sample_rate)
     return {"status": "received"}
 
+@app.get("/discord/transcriptions")
+async def list_discord_transcriptions(since: int = 0):
+    """Transcripts of Discord speech, once per utterance, newer than sequence `since`"""
+    return {"transcriptions": bridge.get_transcriptions(since)}
+
 # Function to get bridge instance for integration with audio processor
 def get_bridge_instance() -> DiscordAudioBridge:
     """Get the global bridge instance for integration"""
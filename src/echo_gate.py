@@ -0,0 +1,153 @@
+"""
+Echo Gate - playback-reference suppression of the bot's own TTS output
+
+When the bot speaks, users' microphones pick the TTS audio back up. Rather
+than letting that echo be buffered, uploaded and transcribed before text
+heuristics throw it away, the gate keeps the PCM the bot is currently playing
+as a reference. Each incoming voiced frame is cross-correlated against the
+stretch of reference it could be an echo of (allowing for network and
+speaker-to-mic delay); frames that match are treated as silence before they
+reach the STT buffer. A match only counts once consecutive frames line up
+with consecutive stretches of the reference, so a user talking over the bot
+with a similar pitch is not mistaken for an echo. Continuity is judged from
+sample positions, not frame arrival times, so network jitter and batched
+frame delivery do not break it.
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, Hashable, Optional, Tuple
+
+import numpy as np
+
+from .audio_dsp import PCM_DTYPE, int16_to_float32
+
+logger = logging.getLogger(__name__)
+
+
+class PlaybackReferenceGate:
+    """Suppresses incoming frames that correlate with audio the bot is playing"""
+
+    def __init__(self, sample_rate: int = 16000, max_delay_ms: float = 800,
+                 correlation_threshold: float = 0.6, delay_tolerance_ms: float = 20.0,
+                 enabled: bool = True):
+        self.sample_rate = sample_rate
+        self.max_delay_s = max_delay_ms / 1000.0
+        self.correlation_threshold = correlation_threshold
+        self.delay_tolerance_samples = int(delay_tolerance_ms / 1000.0 * sample_rate)
+        self.enabled = enabled
+
+        # Reference position each speaker's next frame should line up with
+        self._positions: Dict[Hashable, int] = {}
+
+        self._lock = threading.Lock()
+        self._reference: Optional[np.ndarray] = None
+        self._started_at = 0.0
+        self._active_until = 0.0
+
+        # Metrics
+        self.frames_suppressed = 0
+        self.seconds_suppressed = 0.0
+
+    @classmethod
+    def from_config(cls, gate_config: dict, sample_rate: int = 16000) -> 'PlaybackReferenceGate':
+        """Build a gate from the `echo_gate` config section"""
+        return cls(
+            sample_rate,
+            max_delay_ms=gate_config.get('max_delay_ms', 800),
+            correlation_threshold=gate_config.get('correlation_threshold', 0.6),
+            delay_tolerance_ms=gate_config.get('delay_tolerance_ms', 20.0),
+            enabled=gate_config.get('enabled', True)
+        )
+
+    def start_playback(self, samples: np.ndarray, started_at: Optional[float] = None):
+        """Register the mono int16 PCM (at sample_rate) the bot has started playing"""
+        if not self.enabled:
+            return
+        started_at = started_at if started_at is not None else time.time()
+        reference = int16_to_float32(np.asarray(samples, dtype=PCM_DTYPE))
+        with self._lock:
+            self._reference = reference
+            self._started_at = started_at
+            self._active_until = started_at + reference.size / self.sample_rate + self.max_delay_s
+            self._positions.clear()
+
+    def stop_playback(self, now: Optional[float] = None):
+        """Playback ended early; keep the reference only for the remaining echo tail"""
+        now = now if now is not None else time.time()
+        with self._lock:
+            self._active_until = min(self._active_until, now + self.max_delay_s)
+
+    def is_active(self, now: Optional[float] = None) -> bool:
+        now = now if now is not None else time.time()
+        return self._reference is not None and now < self._active_until
+
+    def is_echo(self, samples: np.ndarray, key: Hashable = None, now: Optional[float] = None) -> bool:
+        """Check whether a speaker's mono int16 frame (at sample_rate) echoes current playback"""
+        if not self.enabled or samples.size < 2:
+            return False
+        now = now if now is not None else time.time()
+
+        with self._lock:
+            reference = self._reference
+            started_at = self._started_at
+            if reference is None or now >= self._active_until:
+                return False
+
+        # The frame ended at `now`, so it can only echo reference audio played
+        # between (now - max_delay - frame duration) and now
+        frame_duration = samples.size / self.sample_rate
+        elapsed = now - started_at
+        first = max(int((elapsed - self.max_delay_s - frame_duration) * self.sample_rate), 0)
+        last = min(int(elapsed * self.sample_rate), reference.size)
+        segment = reference[first:last]
+        if segment.size < samples.size:
+            return False
+
+        correlation, lag = self._max_correlation(int16_to_float32(samples), segment)
+        if correlation < self.correlation_threshold:
+            self._positions.pop(key, None)
+            return False
+
+        # An echo carries on where the previous frame's match ended
+        position = first + lag
+        expected = self._positions.get(key)
+        self._positions[key] = position + samples.size
+        if expected is None or abs(position - expected) > self.delay_tolerance_samples:
+            return False
+
+        self.frames_suppressed += 1
+        self.seconds_suppressed += frame_duration
+        return True
+
+    @staticmethod
+    def _max_correlation(frame: np.ndarray, segment: np.ndarray) -> Tuple[float, int]:
+        """Peak normalized cross-correlation of `frame` against `segment`, and its lag"""
+        frame = frame - frame.mean()
+        frame_norm = np.linalg.norm(frame)
+        if frame_norm == 0:
+            return 0.0, 0
+
+        n = frame.size
+        lags = segment.size - n + 1
+        fft_size = 1 << int(np.ceil(np.log2(segment.size + n)))
+        correlation = np.fft.irfft(
+            np.fft.rfft(segment, fft_size) * np.conj(np.fft.rfft(frame, fft_size)), fft_size
+        )[:lags]
+
+        # Energy of every length-n window of the segment
+        energy = np.concatenate(([0.0], np.cumsum(segment.astype(np.float64) ** 2)))
+        window_norms = np.sqrt(np.maximum(energy[n:] - energy[:-n], 0.0))
+
+        normalized = np.abs(correlation) / (frame_norm * np.maximum(window_norms, 1e-9))
+        best = int(np.argmax(normalized))
+        return float(normalized[best]), best
+
+    def stats(self) -> dict:
+        """Echo suppression counters"""
+        return {
+            "active": self.is_active(),
+            "frames_suppressed": self.frames_suppressed,
+            "seconds_suppressed": self.seconds_suppressed
+        }
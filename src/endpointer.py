@@ -0,0 +1,185 @@
+"""
+Utterance Endpointer - VAD-driven segmentation of a speaker's audio
+
+Instead of flushing whatever accumulated every segment_timeout seconds, the
+endpointer follows per-frame speech decisions and closes an utterance as soon
+as enough trailing silence has been seen, so short commands reach whisper
+right away and long sentences are not cut mid-word. It uses the `vad` section
+of stt_config.json:
+
+- min_silence_duration_ms: trailing silence that ends an utterance
+- min_speech_duration_ms: utterances with less voiced audio are discarded
+- max_speech_duration_s: utterances are force-cut at this length
+- speech_pad_ms: silence kept before onset and after the last voiced frame
+"""
+
+import logging
+import time
+from typing import List, NamedTuple, Optional
+
+import numpy as np
+
+from .audio_dsp import PCM_DTYPE
+from .ring_buffer import AudioRingBuffer
+
+logger = logging.getLogger(__name__)
+
+
+class Utterance(NamedTuple):
+    """A closed utterance: 16-bit mono samples plus wall-clock boundaries"""
+    samples: np.ndarray
+    started_at: float
+    ended_at: float
+    index: int = 0  # Per-speaker sequence number, shared with partial transcripts
+
+
+class UtteranceEndpointer:
+    """Per-speaker speech state machine that buffers audio and emits closed utterances"""
+
+    def __init__(self, sample_rate: int = 16000,
+                 min_silence_ms: Optional[float] = 800,
+                 min_speech_ms: float = 250,
+                 max_speech_s: float = 30,
+                 speech_pad_ms: float = 300,
+                 buffer_capacity_s: float = 60.0):
+        self.sample_rate = sample_rate
+        self.min_silence_s = min_silence_ms / 1000.0 if min_silence_ms is not None else None
+        self.min_silence_samples = int(self.min_silence_s * sample_rate) if min_silence_ms is not None else None
+        self.min_speech_samples = int(min_speech_ms / 1000.0 * sample_rate)
+        self.max_speech_s = max_speech_s
+        self.max_speech_samples = int(max_speech_s * sample_rate)
+        self.pad_samples = int(speech_pad_ms / 1000.0 * sample_rate)
+
+        capacity = max(int(buffer_capacity_s * sample_rate), self.max_speech_samples + self.pad_samples)
+        self.buffer = AudioRingBuffer(capacity)
+        self.preroll = AudioRingBuffer(max(self.pad_samples, 1))
+
+        # Speech state
+        self.in_utterance = False
+        self.utterance_index = 0
+        self.started_at: Optional[float] = None
+        self.last_frame_time: Optional[float] = None
+        self.voiced_samples = 0
+        self.trailing_silence = 0
+
+        # Statistics
+        self.utterances_emitted = 0
+        self.utterances_discarded = 0
+
+    @classmethod
+    def from_config(cls, vad_config: dict, sample_rate: int = 16000,
+                    buffer_capacity_s: float = 60.0, segment_timeout: float = 8.0) -> 'UtteranceEndpointer':
+        """Build an endpointer from the `vad` config section"""
+        if not vad_config.get('enabled', True):
+            # Without VAD, fall back to fixed segment_timeout windows
+            return cls(sample_rate, min_silence_ms=None, min_speech_ms=0,
+                       max_speech_s=segment_timeout, speech_pad_ms=0,
+                       buffer_capacity_s=buffer_capacity_s)
+
+        return cls(
+            sample_rate,
+            min_silence_ms=vad_config.get('min_silence_duration_ms', 800),
+            min_speech_ms=vad_config.get('min_speech_duration_ms', 250),
+            max_speech_s=vad_config.get('max_speech_duration_s', 30),
+            speech_pad_ms=vad_config.get('speech_pad_ms', 300),
+            buffer_capacity_s=buffer_capacity_s
+        )
+
+    def push(self, samples: np.ndarray, is_speech: bool, now: Optional[float] = None) -> List[Utterance]:
+        """Feed one frame with its VAD decision, returning any utterances it closes"""
+        now = now if now is not None else time.time()
+        samples = np.asarray(samples, dtype=PCM_DTYPE)
+        self.last_frame_time = now
+        closed = []
+
+        if not self.in_utterance:
+            if not is_speech:
+                # Keep the most recent speech_pad_ms of silence as pre-roll
+                if self.pad_samples:
+                    self.preroll.write(samples)
+                return closed
+
+            self._start(now)
+
+        self.buffer.write(samples)
+        if is_speech:
+            self.voiced_samples += samples.size
+            self.trailing_silence = 0
+        else:
+            self.trailing_silence += samples.size
+
+        if self.min_silence_samples is not None and self.trailing_silence >= self.min_silence_samples:
+            utterance = self._close(now, trim=self.trailing_silence - self.pad_samples)
+            if utterance:
+                closed.append(utterance)
+        elif len(self.buffer) >= self.max_speech_samples:
+            # Force a cut, but keep following the same stretch of speech
+            utterance = self._close(now, trim=0)
+            if utterance:
+                closed.append(utterance)
+            if is_speech:
+                self._start(now, with_preroll=False)
+
+        return closed
+
+    def poll(self, now: Optional[float] = None) -> Optional[Utterance]:
+        """Close the utterance if frames stopped arriving (Discord sends nothing during silence)"""
+        now = now if now is not None else time.time()
+        if not self.in_utterance:
+            return None
+
+        if self.min_silence_s is not None:
+            if now - self.last_frame_time >= self.min_silence_s:
+                return self._close(now, trim=max(self.trailing_silence - self.pad_samples, 0))
+        elif now - self.started_at >= self.max_speech_s:
+            return self._close(now, trim=0)
+        return None
+
+    def next_deadline(self) -> Optional[float]:
+        """Wall-clock time at which poll() would close the current utterance"""
+        if not self.in_utterance:
+            return None
+        if self.min_silence_s is not None:
+            return self.last_frame_time + self.min_silence_s
+        return self.started_at + self.max_speech_s
+
+    def flush(self, now: Optional[float] = None) -> Optional[Utterance]:
+        """Close the open utterance immediately, e.g. when its audio source ends"""
+        if not self.in_utterance:
+            return None
+        now = now if now is not None else time.time()
+        return self._close(now, trim=max(self.trailing_silence - self.pad_samples, 0))
+
+    def open_samples(self) -> Optional[np.ndarray]:
+        """View of the audio buffered so far for the open utterance, if any"""
+        if not self.in_utterance:
+            return None
+        return self.buffer.peek()
+
+    def _start(self, now: float, with_preroll: bool = True):
+        """Open a new utterance, seeding it with buffered pre-roll"""
+        self.in_utterance = True
+        self.utterance_index += 1
+        self.started_at = now
+        self.voiced_samples = 0
+        self.trailing_silence = 0
+        self.buffer.clear()
+        if with_preroll and len(self.preroll):
+            self.buffer.write(self.preroll.read())
+        self.preroll.clear()
+
+    def _close(self, now: float, trim: int) -> Optional[Utterance]:
+        """End the current utterance, dropping `trim` trailing samples of excess silence"""
+        self.in_utterance = False
+        keep = len(self.buffer) - max(trim, 0)
+
+        if self.voiced_samples < self.min_speech_samples or keep <= 0:
+            self.utterances_discarded += 1
+            self.buffer.clear()
+            return None
+
+        # Copy: the utterance outlives the buffer, which keeps taking this speaker's audio
+        samples = self.buffer.read(keep).copy()
+        self.buffer.clear()
+        self.utterances_emitted += 1
+        return Utterance(samples, self.started_at, now, self.utterance_index)
@@ -0,0 +1,120 @@
+"""
+Frame Handoff - moves audio frames off the Discord receive thread
+
+Scheduling one coroutine per 20ms packet costs a Future, a coroutine and an
+event loop wakeup 50 times a second per speaker. FrameHandoff offers two
+cheaper modes:
+
+- direct: the consumer is thread-safe, so frames are delivered on the
+  receive thread and the event loop is never woken
+- batched: frames are queued and drained on the event loop at most once per
+  batch interval; the loop is only woken from the receive thread when the
+  drainer is parked, so wakeups no longer scale with the number of speakers
+
+Loop wakeups are counted so the saving can be measured. Besides the
+handoff's own, the consumer reports wakeups it causes through
+record_wakeup() (the STT client wakes its processing task when an utterance
+opens or closes), so direct mode is not reported as zero.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class FrameHandoff:
+    """Receive-thread to consumer handoff with loop wakeup accounting"""
+
+    MODES = ('direct', 'batched')
+
+    def __init__(self, consumer: Callable[[List[tuple]], None],
+                 loop: Optional[asyncio.AbstractEventLoop] = None,
+                 mode: str = 'direct', batch_interval_ms: float = 40):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown handoff mode '{mode}', expected one of {self.MODES}")
+        if mode == 'batched' and loop is None:
+            raise ValueError("Batched handoff requires an event loop")
+
+        self.consumer = consumer
+        self.loop = loop
+        self.mode = mode
+        self.batch_interval = batch_interval_ms / 1000.0
+
+        self._lock = threading.Lock()
+        self._pending: List[tuple] = []
+        self._draining = False
+
+        # Metrics
+        self.frames_submitted = 0
+        self.batches_delivered = 0
+        self.loop_wakeups = 0
+        self._wakeup_times: deque = deque(maxlen=4096)
+
+    def submit(self, *frame):
+        """Hand one frame to the consumer; safe to call from any thread"""
+        if self.mode == 'direct':
+            self.frames_submitted += 1
+            self.batches_delivered += 1
+            self.consumer([frame])
+            return
+
+        with self._lock:
+            self.frames_submitted += 1
+            self._pending.append(frame)
+            if self._draining:
+                return
+            self._draining = True
+
+        # Drainer was parked - one wakeup restarts it
+        self.record_wakeup()
+        self.loop.call_soon_threadsafe(self._schedule_drain)
+
+    def _schedule_drain(self):
+        """Runs on the loop: drain after one batch interval"""
+        self.loop.call_later(self.batch_interval, self._drain)
+
+    def _drain(self):
+        """Runs on the loop: deliver everything queued, then park if nothing arrived"""
+        self.record_wakeup()
+        with self._lock:
+            batch = self._pending
+            self._pending = []
+            if not batch:
+                self._draining = False
+                return
+
+        try:
+            self.batches_delivered += 1
+            self.consumer(batch)
+        except Exception as e:
+            logger.error(f"Error delivering frame batch: {e}")
+        finally:
+            self.loop.call_later(self.batch_interval, self._drain)
+
+    def record_wakeup(self):
+        """Count one event loop wakeup; safe to call from any thread"""
+        with self._lock:
+            self.loop_wakeups += 1
+            self._wakeup_times.append(time.monotonic())
+
+    def wakeups_per_second(self, window_s: float = 5.0) -> float:
+        """Event loop wakeups per second over the recent window"""
+        cutoff = time.monotonic() - window_s
+        with self._lock:
+            recent = sum(1 for t in self._wakeup_times if t >= cutoff)
+        return recent / window_s
+
+    def stats(self) -> dict:
+        """Handoff counters for monitoring"""
+        return {
+            "mode": self.mode,
+            "frames_submitted": self.frames_submitted,
+            "batches_delivered": self.batches_delivered,
+            "loop_wakeups": self.loop_wakeups,
+            "loop_wakeups_per_second": self.wakeups_per_second()
+        }
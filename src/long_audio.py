@@ -0,0 +1,206 @@
+"""
+Long Audio - streaming decode and silence-aligned windowing of long uploads
+
+Uploads to /v1/audio/transcriptions can be whole recordings. Instead of
+reading the file into memory and sending it as one whisper request, the
+bridge decodes it incrementally to 16kHz mono int16 (16-bit WAV directly,
+anything else through an ffmpeg subprocess), cuts it into windows of at most
+max_window_s at the quietest point near each window's end, and transcribes
+the windows concurrently. Results are stitched back together with each
+window's offset so segment timestamps refer to the whole recording. A window
+that still fails after its retries fails the whole upload, rather than
+returning a transcript with a hole in the middle.
+"""
+
+import asyncio
+import logging
+import wave
+from typing import AsyncIterator, List, Optional, Tuple
+
+import numpy as np
+
+from .audio_dsp import PCM_DTYPE, pcm16_to_array
+from .resampler import PolyphaseResampler
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+READ_CHUNK_BYTES = 64 * 1024
+
+
+class WindowTranscriptionError(Exception):
+    """A window of a long upload could not be transcribed"""
+
+
+async def iter_upload_pcm(upload, chunk_bytes: int = READ_CHUNK_BYTES) -> AsyncIterator[np.ndarray]:
+    """Decode an UploadFile to 16kHz mono int16 chunks without reading it all into memory"""
+    head = await upload.read(12)
+    await upload.seek(0)
+
+    if head.startswith(b'RIFF') and head[8:12] == b'WAVE':
+        try:
+            wav_file = wave.open(upload.file, 'rb')
+        except (wave.Error, EOFError):
+            wav_file = None
+        if wav_file is not None and wav_file.getsampwidth() == 2:
+            async for chunk in _iter_wav(wav_file, chunk_bytes):
+                yield chunk
+            return
+        # Compressed or non-16-bit WAV: let ffmpeg handle it
+        await upload.seek(0)
+
+    async for chunk in _iter_ffmpeg(upload, chunk_bytes):
+        yield chunk
+
+
+async def _iter_wav(wav_file: wave.Wave_read, chunk_bytes: int) -> AsyncIterator[np.ndarray]:
+    """Stream a 16-bit WAV, downmixing and resampling to 16kHz as it goes"""
+    channels = wav_file.getnchannels()
+    resampler = PolyphaseResampler(wav_file.getframerate(), SAMPLE_RATE)
+    frames_per_chunk = max(chunk_bytes // (2 * channels), 1)
+
+    with wav_file:
+        while True:
+            frames = wav_file.readframes(frames_per_chunk)
+            if not frames:
+                break
+            samples = pcm16_to_array(frames)
+            if channels > 1:
+                usable = samples.size - samples.size % channels
+                samples = samples[:usable].reshape(-1, channels).mean(axis=1).astype(PCM_DTYPE)
+            yield resampler.process_pcm16(samples.tobytes())
+            await asyncio.sleep(0)  # Let other requests run between chunks
+
+
+async def _iter_ffmpeg(upload, chunk_bytes: int) -> AsyncIterator[np.ndarray]:
+    """Pipe the upload through ffmpeg and stream back 16kHz mono s16le"""
+    process = await asyncio.create_subprocess_exec(
+        'ffmpeg', '-hide_banner', '-loglevel', 'error', '-i', 'pipe:0',
+        '-f', 's16le', '-ac', '1', '-ar', str(SAMPLE_RATE), 'pipe:1',
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+
+    async def feed():
+        try:
+            while True:
+                data = await upload.read(chunk_bytes)
+                if not data:
+                    break
+                process.stdin.write(data)
+                await process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # ffmpeg gave up; its exit status reports why
+        finally:
+            process.stdin.close()
+
+    feeder = asyncio.create_task(feed())
+    remainder = b''
+    try:
+        while True:
+            data = await process.stdout.read(chunk_bytes)
+            if not data:
+                break
+            data = remainder + data
+            usable = len(data) - len(data) % 2
+            remainder = data[usable:]
+            yield pcm16_to_array(data[:usable]).copy()
+
+        await feeder
+        stderr = await process.stderr.read()
+        if await process.wait() != 0:
+            raise ValueError(f"ffmpeg could not decode upload: {stderr.decode(errors='replace').strip()}")
+    finally:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        feeder.cancel()
+
+
+class SilenceSplitter:
+    """Cuts a stream of samples into windows of at most max_window_s at low-energy points"""
+
+    def __init__(self, sample_rate: int = SAMPLE_RATE, max_window_s: float = 30.0,
+                 search_s: float = 5.0, frame_ms: float = 20.0):
+        self.sample_rate = sample_rate
+        self.max_window = int(max_window_s * sample_rate)
+        self.search = min(int(search_s * sample_rate), self.max_window // 2)
+        self.frame = max(int(frame_ms / 1000.0 * sample_rate), 1)
+
+        self._pending: List[np.ndarray] = []
+        self._pending_samples = 0
+        self.offset = 0  # Stream position of the first pending sample
+        self.total_samples = 0
+
+    def push(self, samples: np.ndarray) -> List[Tuple[int, np.ndarray]]:
+        """Add samples, returning (offset, window) for every window that is now complete"""
+        self._pending.append(samples)
+        self._pending_samples += samples.size
+        self.total_samples += samples.size
+
+        windows = []
+        while self._pending_samples > self.max_window:
+            buffered = np.concatenate(self._pending)
+            cut = self._quietest_cut(buffered[:self.max_window])
+            windows.append((self.offset, buffered[:cut]))
+            self.offset += cut
+            self._pending = [buffered[cut:]]
+            self._pending_samples = buffered.size - cut
+        return windows
+
+    def flush(self) -> List[Tuple[int, np.ndarray]]:
+        """Return whatever is left as the final window"""
+        if not self._pending_samples:
+            return []
+        window = (self.offset, np.concatenate(self._pending))
+        self.offset += self._pending_samples
+        self._pending = []
+        self._pending_samples = 0
+        return [window]
+
+    def _quietest_cut(self, window: np.ndarray) -> int:
+        """Index of the quietest frame boundary within the last search_s of the window"""
+        region = window[window.size - self.search:].astype(np.float32)
+        frames = region[:region.size - region.size % self.frame].reshape(-1, self.frame)
+        if not frames.size:
+            return window.size
+        energy = (frames * frames).mean(axis=1)
+        return window.size - self.search + int(np.argmin(energy)) * self.frame + self.frame // 2
+
+    @property
+    def duration(self) -> float:
+        return self.total_samples / self.sample_rate
+
+
+def stitch_windows(results: List[Tuple[float, float, Optional[dict]]]) -> Tuple[str, List[dict]]:
+    """
+    Join per-window whisper results into full text and offset segments
+
+    `results` holds (window offset s, window duration s, whisper JSON result)
+    in stream order. Whisper's own segments are shifted by the window offset;
+    a window without them becomes a single segment spanning the window. A
+    failed window (None result) raises WindowTranscriptionError.
+    """
+    texts = []
+    segments = []
+    for offset, duration, result in results:
+        if result is None:
+            raise WindowTranscriptionError(f"window at {offset:.1f}s was not transcribed")
+        text = result.get('text', '').strip()
+        if not text:
+            continue
+        texts.append(text)
+
+        window_segments = result.get('segments') or [{"start": 0.0, "end": duration, "text": text}]
+        for segment in window_segments:
+            end = float(segment.get('end', duration))
+            if duration:
+                end = min(end, duration)  # Whisper can overshoot the end of the window
+            segments.append({
+                "id": len(segments),
+                "start": round(offset + float(segment.get('start', 0.0)), 3),
+                "end": round(offset + end, 3),
+                "text": segment.get('text', '').strip()
+            })
+    return ' '.join(texts), segments
@@ -0,0 +1,66 @@
+"""
+Metrics - lightweight in-process latency histograms
+
+Stats elsewhere in the pipeline are plain counters returned from stats()
+dicts; this adds a fixed-bucket histogram for latencies so tail behaviour
+(p95, p99) is visible without pulling in a metrics client.
+"""
+
+import bisect
+import threading
+from typing import List, Optional, Sequence
+
+DEFAULT_BUCKETS_MS = (25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+class LatencyHistogram:
+    """Cumulative-style latency histogram with fixed millisecond buckets"""
+
+    def __init__(self, buckets_ms: Sequence[float] = DEFAULT_BUCKETS_MS):
+        self.buckets_ms: List[float] = sorted(buckets_ms)
+        self.counts = [0] * (len(self.buckets_ms) + 1)  # Last bucket is +Inf
+        self.count = 0
+        self.total_s = 0.0
+        self.max_s = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        """Record one latency sample"""
+        index = bisect.bisect_left(self.buckets_ms, seconds * 1000.0)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total_s += seconds
+            self.max_s = max(self.max_s, seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bucket bound (seconds) below which a fraction q of samples fall"""
+        with self._lock:
+            if not self.count:
+                return None
+            target = q * self.count
+            seen = 0
+            for index, bucket_count in enumerate(self.counts):
+                seen += bucket_count
+                if seen >= target:
+                    if index < len(self.buckets_ms):
+                        return self.buckets_ms[index] / 1000.0
+                    return self.max_s
+            return self.max_s
+
+    def snapshot(self) -> dict:
+        """Bucket counts keyed by upper bound in ms, plus count, mean and quantiles"""
+        with self._lock:
+            buckets = {f"le_{bound:g}ms": count for bound, count in zip(self.buckets_ms, self.counts)}
+            buckets["le_inf"] = self.counts[-1]
+            count, total_s, max_s = self.count, self.total_s, self.max_s
+
+        return {
+            "count": count,
+            "mean_s": total_s / count if count else None,
+            "max_s": max_s if count else None,
+            "p50_s": self.quantile(0.5),
+            "p95_s": self.quantile(0.95),
+            "p99_s": self.quantile(0.99),
+            "buckets": buckets
+        }
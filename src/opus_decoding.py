@@ -0,0 +1,122 @@
+"""
+Opus Decoding - off-thread decode pool for Opus passthrough sinks
+
+In Opus passthrough mode the sink hooks the voice client's receive path
+(STTAudioSink.install_opus_passthrough), so packets are decoded here instead
+of by py-cord's decoder thread. Each SSRC is pinned to one worker so its decoder
+state is only ever touched by a single thread and packets stay in order.
+Decoders output mono at a reduced rate (16kHz by default) directly from
+libopus, which skips the 48kHz stereo PCM and the downmix/resample work that
+follows it.
+"""
+
+import logging
+import queue
+import threading
+from typing import Callable, Dict, Hashable, List
+
+from discord.opus import Decoder
+
+logger = logging.getLogger(__name__)
+
+
+def mono_decoder_class(sample_rate: int = 16000):
+    """Build a py-cord Decoder subclass that outputs mono at `sample_rate`"""
+
+    class MonoDecoder(Decoder):
+        SAMPLING_RATE = sample_rate
+        CHANNELS = 1
+        SAMPLE_SIZE = 2
+        SAMPLES_PER_FRAME = int(sample_rate / 1000 * Decoder.FRAME_LENGTH)
+        FRAME_SIZE = SAMPLES_PER_FRAME * SAMPLE_SIZE
+
+    return MonoDecoder
+
+
+class OpusDecodePool:
+    """Bounded pool of decode workers with one Opus decoder per SSRC"""
+
+    def __init__(self, on_decoded: Callable[[bytes, Hashable], None],
+                 num_workers: int = 2, queue_size: int = 100, sample_rate: int = 16000):
+        self.on_decoded = on_decoded
+        self.sample_rate = sample_rate
+        self.decoder_class = mono_decoder_class(sample_rate)
+
+        self.queues: List[queue.Queue] = [queue.Queue(maxsize=queue_size) for _ in range(num_workers)]
+        self.workers: List[threading.Thread] = []
+        self.running = False
+
+        # Metrics
+        self.packets_decoded = 0
+        self.packets_dropped = 0
+        self.decode_errors = 0
+
+    def start(self):
+        """Start decode worker threads"""
+        if self.running:
+            return
+        self.running = True
+        for index, work_queue in enumerate(self.queues):
+            worker = threading.Thread(target=self._run_worker, args=(work_queue,),
+                                      name=f"opus-decode-{index}", daemon=True)
+            worker.start()
+            self.workers.append(worker)
+
+    def stop(self, timeout: float = 2.0):
+        """Stop workers, discarding any packets still queued"""
+        if not self.running:
+            return
+        self.running = False
+        for work_queue in self.queues:
+            try:
+                work_queue.put_nowait(None)
+            except queue.Full:
+                pass
+        for worker in self.workers:
+            worker.join(timeout=timeout)
+        self.workers = []
+
+    def submit(self, ssrc: Hashable, user: Hashable, packet: bytes) -> bool:
+        """Queue an Opus packet for decoding; drops it if the SSRC's worker is backed up"""
+        work_queue = self.queues[hash(ssrc) % len(self.queues)]
+        try:
+            work_queue.put_nowait((ssrc, user, packet))
+            return True
+        except queue.Full:
+            self.packets_dropped += 1
+            return False
+
+    def _run_worker(self, work_queue: queue.Queue):
+        """Decode packets for the SSRCs pinned to this worker"""
+        decoders: Dict[Hashable, Decoder] = {}
+
+        while self.running:
+            item = work_queue.get()
+            if item is None:
+                break
+
+            ssrc, user, packet = item
+            try:
+                decoder = decoders.get(ssrc)
+                if decoder is None:
+                    decoder = decoders[ssrc] = self.decoder_class()
+                pcm = decoder.decode(packet)
+                self.packets_decoded += 1
+            except Exception as e:
+                self.decode_errors += 1
+                logger.debug(f"Opus decode error for SSRC {ssrc}: {e}")
+                continue
+
+            try:
+                self.on_decoded(pcm, user)
+            except Exception as e:
+                logger.error(f"Error handling decoded audio: {e}")
+
+    def stats(self) -> dict:
+        """Decode pool counters for monitoring"""
+        return {
+            "packets_decoded": self.packets_decoded,
+            "packets_dropped": self.packets_dropped,
+            "decode_errors": self.decode_errors,
+            "queue_depth": sum(q.qsize() for q in self.queues)
+        }
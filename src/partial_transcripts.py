@@ -0,0 +1,95 @@
+"""
+Partial Transcripts - incremental hypotheses from overlapping windows
+
+While a speaker is still talking, the in-progress utterance is sent to whisper
+every partial_interval_ms. Each request only carries the audio that arrived
+since the previous request plus `overlap_s` of the previous window's tail,
+so partials upload about (interval + overlap) / interval times the audio
+rather than the whole utterance again. When a window slides, the previous
+window's hypothesis becomes committed text and words repeated in the
+overlap are dropped from the next one; until a window has produced a
+hypothesis it is not slid past, so no audio goes untranscribed. Words that
+two consecutive hypotheses of one window agree on are reported as stable,
+the rest as unstable.
+"""
+
+import string
+from typing import List, Optional, Tuple
+
+
+def _normalize(word: str) -> str:
+    return word.lower().strip(string.punctuation)
+
+
+class HypothesisMerger:
+    """Stable-prefix merge of successive window hypotheses for one utterance"""
+
+    def __init__(self, max_overlap_words: int = 12):
+        self.max_overlap_words = max_overlap_words
+        self.committed: List[str] = []
+        self.previous: List[str] = []
+
+    def update(self, text: str) -> Tuple[str, str]:
+        """Merge a new hypothesis for the current window, returning (stable, unstable) text"""
+        words = self._strip_overlap(text.split())
+
+        common = 0
+        for previous_word, word in zip(self.previous, words):
+            if _normalize(previous_word) != _normalize(word):
+                break
+            common += 1
+
+        self.previous = words
+        return ' '.join(self.committed + words[:common]), ' '.join(words[common:])
+
+    def commit_window(self):
+        """The window is sliding forward; everything heard in it so far becomes final"""
+        self.committed.extend(self.previous)
+        self.previous = []
+
+    def finalize(self, text: str) -> str:
+        """Merge the last window's transcript into the full utterance text"""
+        return ' '.join(self.committed + self._strip_overlap(text.split()))
+
+    def _strip_overlap(self, words: List[str]) -> List[str]:
+        """Drop leading words that repeat the tail of the committed text"""
+        if not self.committed:
+            return words
+
+        tail = [_normalize(w) for w in self.committed[-self.max_overlap_words:]]
+        head = [_normalize(w) for w in words[:self.max_overlap_words]]
+        for size in range(min(len(tail), len(head)), 0, -1):
+            if tail[-size:] == head[:size]:
+                return words[size:]
+        return words
+
+
+class PartialTranscriptState:
+    """Window bookkeeping for the partial transcripts of one open utterance"""
+
+    def __init__(self, utterance_index: int, sample_rate: int = 16000,
+                 interval_s: float = 1.0, overlap_s: float = 0.5):
+        self.utterance_index = utterance_index
+        self.interval_samples = int(interval_s * sample_rate)
+        self.overlap_samples = int(overlap_s * sample_rate)
+
+        self.merger = HypothesisMerger()
+        self.window_start = 0  # Offset into the utterance of the current window
+        self.last_request_end = 0  # Utterance offset covered by the last partial request
+        self.in_flight = False
+        self.finalized = False
+
+    def next_window(self, total_samples: int) -> Optional[Tuple[int, int]]:
+        """(start, end) offsets of the next partial request, if one is due"""
+        if self.in_flight or self.finalized:
+            return None
+        if total_samples - self.last_request_end < self.interval_samples:
+            return None
+
+        if self.merger.previous:
+            # Slide: the last window's hypothesis is final, keep only its tail as overlap
+            self.merger.commit_window()
+            self.window_start = max(self.last_request_end - self.overlap_samples, 0)
+
+        self.last_request_end = total_samples
+        return self.window_start, total_samples
@@ -0,0 +1,89 @@
+"""
+Audio Ring Buffer - fixed-capacity int16 sample FIFO for speaker streams
+
+Replaces growing io.BytesIO buffers with preallocated storage so memory stays
+flat during long sessions. Samples are written twice, into a primary and a
+mirror half, which means any run of up to `capacity` buffered samples is
+contiguous in memory and can be handed out as a NumPy view without copying.
+
+Overflow policy: when a write would exceed capacity the oldest samples are
+dropped and counted in `dropped_samples`.
+"""
+
+from typing import Optional
+
+import numpy as np
+
+from .audio_dsp import PCM_DTYPE
+
+
+class AudioRingBuffer:
+    """Preallocated ring buffer of int16 samples with zero-copy reads"""
+
+    def __init__(self, capacity: int):
+        if capacity <= 0:
+            raise ValueError("Ring buffer capacity must be positive")
+
+        self.capacity = capacity
+        self._data = np.zeros(capacity * 2, dtype=PCM_DTYPE)
+        self._start = 0  # Index of the oldest sample, always < capacity
+        self._size = 0
+        self.dropped_samples = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def write(self, samples: np.ndarray):
+        """Append samples, dropping the oldest ones if capacity is exceeded"""
+        samples = np.asarray(samples, dtype=PCM_DTYPE)
+        count = samples.size
+        if count == 0:
+            return
+
+        # A write larger than the whole buffer only keeps its newest samples
+        if count > self.capacity:
+            self.dropped_samples += count - self.capacity
+            samples = samples[-self.capacity:]
+            count = self.capacity
+
+        overflow = self._size + count - self.capacity
+        if overflow > 0:
+            self._start = (self._start + overflow) % self.capacity
+            self._size -= overflow
+            self.dropped_samples += overflow
+
+        # Write into both halves so every window stays contiguous
+        position = (self._start + self._size) % self.capacity
+        first = min(count, self.capacity - position)
+        self._data[position:position + first] = samples[:first]
+        self._data[position + self.capacity:position + self.capacity + first] = samples[:first]
+
+        remainder = count - first
+        if remainder:
+            self._data[:remainder] = samples[first:]
+            self._data[self.capacity:self.capacity + remainder] = samples[first:]
+
+        self._size += count
+
+    def peek(self, count: Optional[int] = None) -> np.ndarray:
+        """View the oldest `count` samples (all by default) without consuming them"""
+        count = self._size if count is None else min(count, self._size)
+        return self._data[self._start:self._start + count]
+
+    def read(self, count: Optional[int] = None) -> np.ndarray:
+        """
+        Consume and return the oldest `count` samples (all by default)
+
+        The result is a view into the buffer's storage that later writes will
+        overwrite. Use it synchronously (e.g. encode it right away); copy it
+        before keeping it or handing it to async work.
+        """
+        view = self.peek(count)
+        self._start = (self._start + view.size) % self.capacity
+        self._size -= view.size
+        return view
+
+    def clear(self):
+        """Discard all buffered samples (their storage is reused by later writes)"""
+        self._start = (self._start + self._size) % self.capacity
+        self._size = 0
@@ -0,0 +1,119 @@
+"""
+Segment Dispatcher - bounded, pipelined /asr requests with ordered results
+
+The processing task hands every closed utterance to the dispatcher and goes
+straight back to watching the speaker streams, instead of waiting for whisper
+to answer. Up to max_in_flight requests run at once so the GPU always has the
+next segment queued; the rest wait for a slot. Each ordered segment gets a
+sequence number and its result is released only after every earlier segment
+has finished, so consumers still see transcripts in the order they were
+spoken. Unordered work (partial hypotheses) shares the concurrency limit but
+is emitted as soon as it completes.
+"""
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class SegmentDispatcher:
+    """Runs transcription coroutines with a concurrency cap and re-sequences their results"""
+
+    def __init__(self, emit: Callable[[dict], None], max_in_flight: int = 2):
+        self.emit = emit
+        self.max_in_flight = max(1, max_in_flight)
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+        self._tasks: Set[asyncio.Task] = set()
+
+        # Ordering state
+        self._next_sequence = 0
+        self._next_to_emit = 0
+        self._finished: Dict[int, Optional[dict]] = {}
+
+        # Gauges
+        self.queue_depth = 0  # Segments waiting for a free request slot
+        self.in_flight = 0  # Requests currently awaiting whisper
+
+        # Counters
+        self.segments_submitted = 0
+        self.segments_completed = 0
+        self.segments_failed = 0
+
+    def submit(self, work: Awaitable[Optional[dict]], ordered: bool = True) -> Optional[int]:
+        """Schedule a transcription; returns its sequence number when ordered"""
+        sequence = None
+        if ordered:
+            sequence = self._next_sequence
+            self._next_sequence += 1
+
+        self.segments_submitted += 1
+        self.queue_depth += 1
+        task = asyncio.get_running_loop().create_task(self._run(work, sequence))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return sequence
+
+    async def _run(self, work: Awaitable[Optional[dict]], sequence: Optional[int]):
+        """Wait for a slot, run the request, then release its result in order"""
+        result = None
+        started = False
+        try:
+            async with self._slots:
+                self.queue_depth -= 1
+                self.in_flight += 1
+                started = True
+                try:
+                    result = await work
+                    self.segments_completed += 1
+                finally:
+                    self.in_flight -= 1
+        except asyncio.CancelledError:
+            if not started:
+                # Cancelled while still queued: the request was never sent
+                self.queue_depth -= 1
+                work.close()
+            raise
+        except Exception as e:
+            self.segments_failed += 1
+            logger.error(f"Segment {sequence} failed: {e}")
+        finally:
+            if sequence is None:
+                if result:
+                    self.emit(result)
+            else:
+                self._finished[sequence] = result
+                self._release_in_order()
+
+    def _release_in_order(self):
+        """Emit every finished result whose predecessors have all been emitted"""
+        while self._next_to_emit in self._finished:
+            result = self._finished.pop(self._next_to_emit)
+            self._next_to_emit += 1
+            if result:
+                self.emit(result)
+
+    async def drain(self):
+        """Wait until every submitted segment has finished and its result was emitted"""
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    async def cancel_all(self):
+        """Cancel queued and in-flight segments"""
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        """Queue depth and in-flight gauges plus lifetime counters"""
+        return {
+            "queue_depth": self.queue_depth,
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "awaiting_reorder": len(self._finished),
+            "segments_submitted": self.segments_submitted,
+            "segments_completed": self.segments_completed,
+            "segments_failed": self.segments_failed
+        }
@@ -0,0 +1,65 @@
+"""
+Sentence Chunker - split streamed text into speakable sentences
+
+Claude's reply arrives as small text deltas. The chunker buffers them and
+hands back each sentence as soon as its terminating punctuation (or a line
+break) has arrived, so TTS can start on the first sentence while the rest is
+still being generated. Very short fragments are held back and joined to the
+next sentence, which keeps abbreviations like "e.g." from becoming their own
+clip, and the total is capped at max_chars like the old whole-response
+truncation.
+"""
+
+import re
+from typing import List
+
+SENTENCE_END = re.compile(r'([.!?]+["\')\]]*)\s+|\n+')
+
+
+class SentenceChunker:
+    """Buffers streamed text and emits complete sentences within a character budget"""
+
+    def __init__(self, min_chars: int = 20, max_chars: int = 500):
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self.buffer = ""
+        self.chars_emitted = 0
+        self.exhausted = False
+
+    def push(self, text: str) -> List[str]:
+        """Add streamed text, returning every sentence it completes"""
+        self.buffer += text
+        sentences = []
+        start = 0
+        for match in SENTENCE_END.finditer(self.buffer):
+            end = match.end(1) if match.group(1) else match.start()
+            candidate = self.buffer[start:end].strip()
+            if match.group(1) and len(candidate) < self.min_chars:
+                continue  # Too short to speak on its own; extend to the next boundary
+            if candidate:
+                sentences.append(candidate)
+            start = match.end()
+
+        self.buffer = self.buffer[start:]
+        return self._within_budget(sentences)
+
+    def flush(self) -> List[str]:
+        """Return whatever is left once the stream has ended"""
+        remainder = self.buffer.strip()
+        self.buffer = ""
+        return self._within_budget([remainder] if remainder else [])
+
+    def _within_budget(self, sentences: List[str]) -> List[str]:
+        """Drop sentences past max_chars; a first sentence that is too long is cut"""
+        kept = []
+        for sentence in sentences:
+            if self.exhausted:
+                break
+            if self.chars_emitted + len(sentence) > self.max_chars:
+                self.exhausted = True
+                if not self.chars_emitted:
+                    kept.append(sentence[:self.max_chars] + "...")
+                break
+            self.chars_emitted += len(sentence)
+            kept.append(sentence)
+        return kept
@@ -0,0 +1,196 @@
+"""
+Speaker Streams - per-user audio buffering for the STT pipeline
+
+Each Discord speaker gets their own SpeakerStream holding resampler state and
+an utterance endpointer (audio buffer plus voice activity state), so
+overlapping speech is never mixed into one WAV and one talkative user cannot
+stretch everyone else's segments. The SpeakerStreamRegistry creates streams
+on first audio and evicts them once a user has been idle for a while.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+from .echo_gate import PlaybackReferenceGate
+from .endpointer import Utterance, UtteranceEndpointer
+from .resampler import PolyphaseResampler
+
+logger = logging.getLogger(__name__)
+
+
+class SpeakerStream:
+    """Resampler, endpointer and completed utterances for a single speaker"""
+
+    def __init__(self, user_id: Hashable, endpointer: UtteranceEndpointer,
+                 input_rate: int = 48000, output_rate: int = 16000,
+                 echo_gate: Optional[PlaybackReferenceGate] = None):
+        self.user_id = user_id
+        self.lock = threading.Lock()
+        self.echo_gate = echo_gate
+
+        # Audio is resampled to output_rate as it arrives, so the endpointer
+        # always buffers 16-bit mono at the rate whisper expects. Frames can
+        # arrive at more than one rate (Opus decoded at 16kHz alongside 48kHz
+        # PCM fallback frames), so there is one resampler per input rate.
+        self.input_rate = input_rate
+        self.output_rate = output_rate
+        self.resamplers: Dict[int, PolyphaseResampler] = {
+            input_rate: PolyphaseResampler(input_rate, output_rate)
+        }
+        self.endpointer = endpointer
+        self.completed: deque = deque()
+        self.last_activity = time.time()
+
+    def append(self, audio_chunk: bytes, is_speech: bool = True, now: Optional[float] = None,
+               sample_rate: Optional[int] = None) -> bool:
+        """
+        Resample a mono chunk and feed it to the endpointer with its VAD decision
+
+        `sample_rate` is the chunk's rate, input_rate by default.
+
+        Returns True when the chunk opened or closed an utterance, i.e. when the
+        consumer has new work or a new deadline to wait for.
+        """
+        now = now if now is not None else time.time()
+        with self.lock:
+            samples = self._resampler(sample_rate or self.input_rate).process_pcm16(audio_chunk)
+            
+            # Echoes of the bot's own playback count as silence
+            if is_speech and self.echo_gate and self.echo_gate.is_echo(samples, self.user_id, now):
+                is_speech = False
+            
+            was_open = self.endpointer.in_utterance
+            closed = self.endpointer.push(samples, is_speech, now)
+            self.completed.extend(closed)
+            self.last_activity = now
+            return bool(closed) or (not was_open and self.endpointer.in_utterance)
+
+    def _resampler(self, sample_rate: int) -> PolyphaseResampler:
+        """Resampler for one input rate, created on first use (caller holds the lock)"""
+        resampler = self.resamplers.get(sample_rate)
+        if resampler is None:
+            resampler = PolyphaseResampler(sample_rate, self.output_rate)
+            self.resamplers[sample_rate] = resampler
+        return resampler
+
+    def take_utterances(self, now: float) -> List[Utterance]:
+        """Return closed utterances, including one whose frames stopped arriving"""
+        with self.lock:
+            utterance = self.endpointer.poll(now)
+            if utterance:
+                self.completed.append(utterance)
+
+            utterances = list(self.completed)
+            self.completed.clear()
+            return utterances
+
+    def open_utterance(self) -> Optional[Tuple[int, int]]:
+        """(index, buffered samples) of the open utterance, if one is open"""
+        with self.lock:
+            samples = self.endpointer.open_samples()
+            if samples is None:
+                return None
+            return self.endpointer.utterance_index, samples.size
+
+    def open_window(self, index: int, start: int, end: int) -> Optional[np.ndarray]:
+        """Copy of samples [start, end) of open utterance `index`, if it is still open"""
+        with self.lock:
+            samples = self.endpointer.open_samples()
+            if samples is None or self.endpointer.utterance_index != index:
+                return None
+            return samples[start:end].copy()
+
+    def next_deadline(self) -> Optional[float]:
+        """When this speaker's open utterance will time out, if one is open"""
+        with self.lock:
+            return self.endpointer.next_deadline()
+
+    def is_idle(self, now: float, idle_timeout: float) -> bool:
+        """Check whether the speaker has been silent long enough to evict"""
+        with self.lock:
+            return (not self.endpointer.in_utterance and not self.completed
+                    and now - self.last_activity >= idle_timeout)
+
+
+class SpeakerStreamRegistry:
+    """Thread-safe registry of SpeakerStreams keyed by Discord user id"""
+
+    def __init__(self, idle_timeout: float = 30.0, input_rate: int = 48000, output_rate: int = 16000,
+                 buffer_capacity_s: float = 60.0, vad_config: Optional[dict] = None,
+                 segment_timeout: float = 8.0, echo_gate: Optional[PlaybackReferenceGate] = None):
+        self.idle_timeout = idle_timeout
+        self.input_rate = input_rate
+        self.output_rate = output_rate
+        self.buffer_capacity_s = buffer_capacity_s
+        self.vad_config = vad_config or {}
+        self.segment_timeout = segment_timeout
+        self.echo_gate = echo_gate
+        self.streams: Dict[Hashable, SpeakerStream] = {}
+        self.lock = threading.Lock()
+
+    def get(self, user_id: Hashable) -> SpeakerStream:
+        """Get the stream for a user, creating it on first use"""
+        with self.lock:
+            stream = self.streams.get(user_id)
+            if stream is None:
+                endpointer = UtteranceEndpointer.from_config(
+                    self.vad_config, self.output_rate, self.buffer_capacity_s, self.segment_timeout
+                )
+                stream = SpeakerStream(user_id, endpointer, self.input_rate, self.output_rate,
+                                       self.echo_gate)
+                self.streams[user_id] = stream
+                logger.debug(f"Created speaker stream for {user_id}")
+            return stream
+
+    def ready_utterances(self, now: Optional[float] = None) -> List[Tuple[Hashable, Utterance]]:
+        """Collect (user_id, utterance) for every utterance closed since the last call"""
+        now = now if now is not None else time.time()
+        with self.lock:
+            streams = list(self.streams.values())
+
+        ready = []
+        for stream in streams:
+            for utterance in stream.take_utterances(now):
+                ready.append((stream.user_id, utterance))
+        return ready
+
+    def open_streams(self) -> List[SpeakerStream]:
+        """Streams that currently have an utterance open"""
+        with self.lock:
+            streams = list(self.streams.values())
+        return [stream for stream in streams if stream.endpointer.in_utterance]
+
+    def next_deadline(self) -> Optional[float]:
+        """Earliest time any open utterance will be closed by silence"""
+        with self.lock:
+            streams = list(self.streams.values())
+
+        deadlines = [d for d in (stream.next_deadline() for stream in streams) if d is not None]
+        return min(deadlines) if deadlines else None
+
+    def evict_idle(self, now: Optional[float] = None) -> int:
+        """Drop streams for users idle longer than idle_timeout, returning how many were evicted"""
+        now = now if now is not None else time.time()
+        with self.lock:
+            idle_users = [user_id for user_id, stream in self.streams.items()
+                          if stream.is_idle(now, self.idle_timeout)]
+            for user_id in idle_users:
+                del self.streams[user_id]
+
+        if idle_users:
+            logger.debug(f"Evicted idle speaker streams: {idle_users}")
+        return len(idle_users)
+
+    def dropped_samples(self) -> int:
+        """Total samples discarded by ring buffer overflow across live streams"""
+        with self.lock:
+            return sum(stream.endpointer.buffer.dropped_samples for stream in self.streams.values())
+
+    def __len__(self) -> int:
+        with self.lock:
+            return len(self.streams)
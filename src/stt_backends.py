@@ -0,0 +1,183 @@
+"""
+STT Backends - health-aware routing across several whisper endpoints
+
+`whisper.backends` in stt_config.json lists whisper webservice base URLs;
+left empty, the single default backend is used (host/port for the bot's
+client, WHISPER_CPP_BASE_URL for the audio bridge).
+Each segment goes to the healthy backend with the lowest expected wait,
+estimated as (in-flight requests + 1) x EWMA latency, so a fast idle box
+gets work before a busy or slow one. After failure_threshold consecutive
+failures a backend is ejected; once eject_s has passed it is probed with the
+same GET /docs used for connection checks and rejoins the pool if it
+answers.
+"""
+
+import asyncio
+import logging
+import time
+from typing import List, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+class STTBackendError(Exception):
+    """A backend failed to serve a request (connection error or 5xx)"""
+
+
+class STTBackend:
+    """One whisper endpoint with its load and health state"""
+
+    def __init__(self, base_url: str, initial_latency_s: float = 1.0):
+        self.base_url = base_url.rstrip('/')
+        self.in_flight = 0
+        self.ewma_latency = initial_latency_s
+        self.healthy = True
+        self.consecutive_failures = 0
+        self.ejected_at = 0.0
+
+        # Counters
+        self.requests = 0
+        self.failures = 0
+        self.ejections = 0
+
+    def expected_wait(self) -> float:
+        return (self.in_flight + 1) * self.ewma_latency
+
+    def stats(self) -> dict:
+        return {
+            "healthy": self.healthy,
+            "in_flight": self.in_flight,
+            "ewma_latency_s": self.ewma_latency,
+            "requests": self.requests,
+            "failures": self.failures,
+            "ejections": self.ejections
+        }
+
+
+class STTBackendPool:
+    """Least-loaded routing with ejection and probing of failing backends"""
+
+    def __init__(self, base_urls: List[str], ewma_alpha: float = 0.2, failure_threshold: int = 3,
+                 eject_s: float = 10.0, probe_interval_s: float = 5.0, probe_timeout_s: float = 2.0):
+        if not base_urls:
+            raise ValueError("STTBackendPool needs at least one backend URL")
+        self.backends = [STTBackend(url) for url in base_urls]
+        self.ewma_alpha = ewma_alpha
+        self.failure_threshold = failure_threshold
+        self.eject_s = eject_s
+        self.probe_interval_s = probe_interval_s
+        self.probe_timeout_s = probe_timeout_s
+        self._probe_task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_config(cls, whisper_config: dict, default_url: str) -> 'STTBackendPool':
+        """Build a pool from the `whisper` config section, falling back to a single default URL"""
+        routing = whisper_config.get('routing', {})
+        return cls(
+            whisper_config.get('backends') or [default_url],
+            ewma_alpha=routing.get('ewma_alpha', 0.2),
+            failure_threshold=routing.get('failure_threshold', 3),
+            eject_s=routing.get('eject_s', 10.0),
+            probe_interval_s=routing.get('probe_interval_s', 5.0),
+            probe_timeout_s=routing.get('probe_timeout_s', 2.0)
+        )
+
+    def acquire(self, exclude: Optional[List[STTBackend]] = None) -> Optional[STTBackend]:
+        """Pick the healthy backend with the lowest expected wait and count the request against it"""
+        candidates = [b for b in self.backends if b.healthy and not (exclude and b in exclude)]
+        if not candidates:
+            return None
+
+        backend = min(candidates, key=STTBackend.expected_wait)
+        backend.in_flight += 1
+        backend.requests += 1
+        return backend
+
+    def release(self, backend: STTBackend, latency_s: Optional[float] = None, ok: bool = True):
+        """Record the outcome of a request sent to `backend`"""
+        backend.in_flight -= 1
+
+        if ok:
+            backend.consecutive_failures = 0
+            if latency_s is not None:
+                backend.ewma_latency += self.ewma_alpha * (latency_s - backend.ewma_latency)
+            return
+
+        backend.failures += 1
+        backend.consecutive_failures += 1
+        # The last healthy backend is never ejected; there would be nowhere to route
+        if (backend.healthy and backend.consecutive_failures >= self.failure_threshold
+                and self.healthy_count() > 1):
+            backend.healthy = False
+            backend.ejected_at = time.time()
+            backend.ejections += 1
+            logger.warning(f"Ejected STT backend {backend.base_url} after "
+                           f"{backend.consecutive_failures} consecutive failures")
+
+    async def check_all(self, client: httpx.AsyncClient, timeout_s: float) -> int:
+        """
+        Probe every backend now and return how many answered
+
+        This only reports reachability. Routing state changes solely through
+        release() (failure_threshold, last backend kept) and probe_ejected(),
+        so one slow health check cannot take backends out of rotation.
+        """
+        async def check(backend: STTBackend) -> bool:
+            try:
+                response = await client.get(f"{backend.base_url}/docs", timeout=timeout_s)
+                return response.status_code == 200
+            except Exception:
+                return False
+
+        results = await asyncio.gather(*[check(backend) for backend in self.backends])
+        return sum(results)
+
+    async def probe_ejected(self, client: httpx.AsyncClient):
+        """Probe backends whose ejection period has passed and readmit the ones that answer"""
+        now = time.time()
+        for backend in self.backends:
+            if backend.healthy or now - backend.ejected_at < self.eject_s:
+                continue
+            try:
+                response = await client.get(f"{backend.base_url}/docs", timeout=self.probe_timeout_s)
+                alive = response.status_code == 200
+            except Exception:
+                alive = False
+
+            if alive:
+                backend.healthy = True
+                backend.consecutive_failures = 0
+                logger.warning(f"STT backend {backend.base_url} is back in the pool")
+            else:
+                backend.ejected_at = now
+
+    async def _probe_loop(self, client: httpx.AsyncClient):
+        while True:
+            await asyncio.sleep(self.probe_interval_s)
+            try:
+                await self.probe_ejected(client)
+            except Exception as e:
+                logger.error(f"STT backend probe error: {e}")
+
+    def start_probing(self, client: httpx.AsyncClient):
+        """Start the background probe task on the running loop (no-op with one backend)"""
+        if self._probe_task is None and len(self.backends) > 1:
+            self._probe_task = asyncio.get_running_loop().create_task(self._probe_loop(client))
+
+    async def stop_probing(self):
+        if self._probe_task:
+            self._probe_task.cancel()
+            try:
+                await self._probe_task
+            except asyncio.CancelledError:
+                pass
+            self._probe_task = None
+
+    def healthy_count(self) -> int:
+        return sum(1 for backend in self.backends if backend.healthy)
+
+    def stats(self) -> dict:
+        """Per-backend load and health"""
+        return {backend.base_url: backend.stats() for backend in self.backends}
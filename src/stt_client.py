@@ -1,15 +1,23 @@
 import httpx
 import json
-import threading
-from queue import Queue
 import time
 import numpy as np
 import uuid
-import struct
 import logging
 import os
 import asyncio
-import io
+from contextlib import suppress
+from typing import AsyncIterator, Callable, Optional
+
+from .backpressure import DEGRADE, DROP, MERGE, SHED, LoadShedder
+from .echo_gate import PlaybackReferenceGate
+from .endpointer import Utterance
+from .partial_transcripts import PartialTranscriptState
+from .segment_dispatcher import SegmentDispatcher
+from .speaker_streams import SpeakerStreamRegistry
+from .stt_backends import STTBackendError, STTBackendPool
+from .transcription_hub import TranscriptionHub, TranscriptionSubscription
+from .upload_format import REJECTED_STATUSES, UploadEncoder
 
 # Configure STT client logging
 logger = logging.getLogger(__name__)
@@ -28,38 +36,91 @@ class WhisperLiveClient:
         self.port = port or whisper_config.get('port', 9000)
         self.base_url = f"http://{self.host}:{self.port}"
         
+        # Segments are routed across every configured whisper backend
+        self.backends = STTBackendPool.from_config(whisper_config, self.base_url)
+        
         self.client = httpx.AsyncClient(timeout=30.0)
-        self.transcription_queue = Queue()
+        # Transcripts are pushed to hub subscribers; transcription_queue is the
+        # client's own all-users subscription for get_transcription() callers
+        self.hub = TranscriptionHub()
+        self.transcription_queue = self.hub.subscribe()
         self.connected = False
         self.uid = str(uuid.uuid4())
         
-        # Audio buffer for accumulating chunks
-        self.audio_buffer = io.BytesIO()
-        self.buffer_lock = threading.Lock()
-        
         # Load timeout settings
         timeout_config = self.config.get('timeouts', {})
         self.segment_timeout = timeout_config.get('segment_timeout_s', 3.0)
         self.connection_timeout = timeout_config.get('connection_timeout_s', 5.0)
         
+        # Discord delivers 48kHz (or the Opus decode rate in passthrough mode),
+        # whisper expects 16kHz; push_audio takes a per-frame rate for sinks
+        # that mix both
+        audio_config = self.config.get('audio', {})
+        if audio_config.get('sink_mode', 'pcm') == 'opus':
+            self.sample_rate = audio_config.get('opus_decode_rate', 16000)
+        else:
+            self.sample_rate = audio_config.get('sample_rate', 48000)
+        self.target_sample_rate = audio_config.get('target_sample_rate', 16000)
+        self.min_segment_samples = self.target_sample_rate // 100  # ~10ms of audio
+        self.upload = UploadEncoder.from_config(whisper_config, self.target_sample_rate)
+        
+        # Utterances are closed by each speaker's VAD endpointer; the processing
+        # task sleeps until one closes or the earliest endpointer deadline
+        vad_config = self.config.get('vad', {})
+        
+        # Reference of the bot's own playback, used to drop echoes before buffering
+        self.echo_gate = PlaybackReferenceGate.from_config(
+            self.config.get('echo_gate', {}), self.target_sample_rate
+        )
+        
+        # Per-speaker ring buffers, each with its own resampler and endpointer
+        self.streams = SpeakerStreamRegistry(
+            idle_timeout=timeout_config.get('stream_idle_timeout_s', 30.0),
+            input_rate=self.sample_rate,
+            output_rate=self.target_sample_rate,
+            buffer_capacity_s=audio_config.get('buffer_capacity_s', 60.0),
+            vad_config=vad_config,
+            segment_timeout=self.segment_timeout,
+            echo_gate=self.echo_gate
+        )
+        
+        # Streaming mode: overlapping windows of open utterances are transcribed
+        # every partial_interval_ms and emitted as partial results
+        streaming_config = self.config.get('streaming', {})
+        self.streaming_enabled = streaming_config.get('enabled', False)
+        self.partial_interval = streaming_config.get('partial_interval_ms', 1000) / 1000.0
+        self.partial_overlap = streaming_config.get('overlap_s', 0.5)
+        self.partial_states = {}  # user_id -> PartialTranscriptState of the open utterance
+        
+        # Closed utterances are pipelined to whisper, at most max_in_flight at a time
+        self.dispatcher = SegmentDispatcher(
+            self._emit, max_in_flight=whisper_config.get('max_in_flight', 2)
+        )
+        
+        # Overload policy for segments queued behind a slow whisper
+        self.overload = LoadShedder.from_config(self.config.get('backpressure', {}))
+        self.merge_carry = {}  # user_id -> stale samples merged into their next segment
+        
         # Processing state
+        self.audio_seconds_sent = 0.0
         self.last_transcription_time = time.time()
-        self.processing_thread = None
-        self.processing_active = False
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.processing_task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        self.on_wake: Optional[Callable[[], None]] = None  # Wakeup accounting hook (FrameHandoff)
         
-    def connect(self):
-        """Test HTTP connection to whisper.cpp server"""
+    async def connect(self):
+        """Test HTTP connection to whisper.cpp server and start the processing task"""
         try:
-            # Test connection with docs endpoint (no health endpoint available)
-            response = httpx.get(f"http://{self.host}:{self.port}/docs", timeout=self.connection_timeout)
-            self.connected = response.status_code == 200
+            # Test every backend's docs endpoint (no health endpoint available)
+            reachable = await self.backends.check_all(self.client, self.connection_timeout)
+            self.connected = reachable > 0
             
-            if self.connected:
-                # Start audio processing thread
-                self.processing_active = True
-                self.processing_thread = threading.Thread(target=self._process_audio_buffer)
-                self.processing_thread.daemon = True
-                self.processing_thread.start()
+            if self.connected and not self.processing_task:
+                # Everything runs on the caller's (the bot's) event loop
+                self.loop = asyncio.get_running_loop()
+                self.processing_task = self.loop.create_task(self._process_audio_buffer())
+                self.backends.start_probing(self.client)
             
             return self.connected
             
@@ -68,181 +129,317 @@ class WhisperLiveClient:
             self.connected = False
             return False
     
-    def _process_audio_buffer(self):
-        """Process accumulated audio data periodically"""
-        # Create a new event loop for this thread
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+    async def _process_audio_buffer(self):
+        """Transcribe each speaker's utterances as soon as their endpointer closes them"""
+        while self.connected:
+            try:
+                await self._wait_for_work()
+                
+                # Only process utterances with enough audio
+                utterances = [
+                    (user_id, utterance)
+                    for user_id, utterance in self.streams.ready_utterances()
+                    if utterance.samples.size > self.min_segment_samples
+                ]
+                # Partial hypotheses are the first thing shed once segments queue up
+                partials = (self._due_partial_windows()
+                            if self.streaming_enabled and self.dispatcher.queue_depth == 0 else [])
+                
+                # Hand segments to the dispatcher in the order speech ended and go
+                # straight back to watching the streams; results come back in order
+                for user_id, utterance in sorted(utterances, key=lambda item: item[1].ended_at):
+                    state = self._claim_partial_state(user_id, utterance)
+                    self.overload.enqueue(user_id, self._segment_id(user_id, utterance),
+                                          utterance.samples.size / self.target_sample_rate)
+                    self.dispatcher.submit(self._transcribe_audio(utterance, user_id, state))
+                for user_id, state, samples in partials:
+                    state.in_flight = True
+                    self.dispatcher.submit(self._transcribe_partial(user_id, state, samples),
+                                           ordered=False)
+                
+                self.streams.evict_idle()
+                
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error in audio processing: {e}")
+                await asyncio.sleep(1)
+    
+    async def _wait_for_work(self):
+        """Sleep until an utterance opens or closes, or the next deadline passes"""
+        timeout = self.streams.idle_timeout
+        deadline = self.streams.next_deadline()
+        if deadline is not None:
+            timeout = min(timeout, max(deadline - time.time(), 0.0))
+        if self.streaming_enabled and self.streams.open_streams():
+            timeout = min(timeout, self.partial_interval)
         
-        try:
-            while self.processing_active and self.connected:
-                try:
-                    time.sleep(self.segment_timeout)  # Process every segment_timeout seconds
-                    
-                    audio_data = None
-                    with self.buffer_lock:
-                        if self.audio_buffer.tell() > 0:
-                            # Get audio data from buffer
-                            audio_data = self.audio_buffer.getvalue()
-                            self.audio_buffer = io.BytesIO()  # Reset buffer
-                    
-                    if audio_data and len(audio_data) > 1024:  # Only process if we have enough audio
-                        loop.run_until_complete(self._transcribe_audio(audio_data))
-                        
-                except Exception as e:
-                    print(f"Error in audio processing: {e}")
-                    time.sleep(1)
-        finally:
-            loop.close()
+        with suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        self._wakeup.clear()
     
-    async def _transcribe_audio(self, audio_data: bytes):
-        """Send audio to whisper.cpp for transcription"""
-        try:
-            # Convert PCM to WAV format for the API
-            wav_data = self._pcm_to_wav(audio_data)
-            if not wav_data:
-                return
+    def _wake(self):
+        """Wake the processing task from any thread"""
+        if self.loop and not self.loop.is_closed():
+            if self.on_wake:
+                self.on_wake()
+            self.loop.call_soon_threadsafe(self._wakeup.set)
+    
+    def _due_partial_windows(self):
+        """Collect (user_id, state, samples) for open utterances due a partial transcript"""
+        due = []
+        for stream in self.streams.open_streams():
+            opened = stream.open_utterance()
+            if opened is None:
+                continue
+            index, total_samples = opened
             
-            # Prepare multipart form data for /asr endpoint
-            files = {
-                'audio_file': ('audio.wav', wav_data, 'audio/wav')
-            }
+            state = self.partial_states.get(stream.user_id)
+            if state is None or state.utterance_index != index:
+                state = PartialTranscriptState(
+                    index, self.target_sample_rate, self.partial_interval, self.partial_overlap
+                )
+                self.partial_states[stream.user_id] = state
+            
+            window = state.next_window(total_samples)
+            if window is None:
+                continue
+            samples = stream.open_window(index, *window)
+            if samples is not None and samples.size > self.min_segment_samples:
+                due.append((stream.user_id, state, samples))
+        return due
+    
+    async def _request_transcription(self, samples: np.ndarray, base_url: Optional[str] = None):
+        """Transcribe samples on the least-loaded healthy backend (or `base_url`), returning the text"""
+        self.audio_seconds_sent += samples.size / self.target_sample_rate
+        if base_url:
+            return await self._post_asr(base_url, samples)
+        
+        # Fail over to the next backend when one errors out
+        tried = []
+        while True:
+            backend = self.backends.acquire(exclude=tried)
+            if backend is None:
+                return None
+            
+            started = time.time()
+            try:
+                text = await self._post_asr(backend.base_url, samples)
+            except (httpx.HTTPError, STTBackendError) as e:
+                logger.warning(f"STT backend {backend.base_url} failed: {e}")
+                self.backends.release(backend, ok=False)
+                tried.append(backend)
+                continue
+            except BaseException:
+                self.backends.release(backend)
+                raise
+            
+            self.backends.release(backend, time.time() - started)
+            return text
+    
+    async def _post_asr(self, base_url: str, samples: np.ndarray):
+        """POST samples to one whisper /asr endpoint, returning the transcript text"""
+        wav_retry = False
+        while True:
+            # Encode in the negotiated wire format (wav, raw pcm or flac)
+            files, format_params = self.upload.encode(samples, 'wav' if wav_retry else None)
             params = {
                 'task': 'transcribe',
                 'language': self.config.get('whisper', {}).get('language', 'en'),
-                'output': 'json'
+                'output': 'json',
+                **format_params
             }
             
             # Make request to whisper service /asr endpoint
             response = await self.client.post(
-                f"{self.base_url}/asr",
+                f"{base_url}/asr",
                 files=files,
                 params=params
             )
             
             if response.status_code == 200:
-                result = response.json()
-                text = result.get('text', '').strip()
-                
-                if text:
-                    # Create transcription result
-                    transcription = {
-                        "text": text,
-                        "start": 0,
-                        "end": self.segment_timeout,
-                        "completed": True,
-                        "uid": self.uid,
-                        "type": "final"
-                    }
-                    
-                    self.transcription_queue.put(transcription)
-                    self.last_transcription_time = time.time()
+                if wav_retry:
+                    self.upload.downgrade(500)
+                return response.json().get('text', '').strip()
+            
+            # A server that cannot take the compact format gets WAV from now on
+            if response.status_code in REJECTED_STATUSES and self.upload.downgrade(response.status_code):
+                continue
+            # A 500 may be transient: retry once as WAV, downgrade only if that works
+            if response.status_code == 500 and not wav_retry and self.upload.format != 'wav':
+                wav_retry = True
+                continue
+            if response.status_code >= 500:
+                raise STTBackendError(f"HTTP {response.status_code}")
+            return None
+    
+    async def _transcribe_partial(self, user_id, state: PartialTranscriptState, samples: np.ndarray):
+        """Transcribe a window of an open utterance into a merged partial hypothesis"""
+        try:
+            text = await self._request_transcription(samples)
+            
+            # The utterance may have closed while this window was in flight
+            if not text or state.finalized:
+                return None
             
+            stable, unstable = state.merger.update(text)
+            return {
+                "text": f"{stable} {unstable}".strip(),
+                "stable_text": stable,
+                "unstable_text": unstable,
+                "start": 0,
+                "end": state.last_request_end / self.target_sample_rate,
+                "completed": False,
+                "uid": self.uid,
+                "user_id": user_id,
+                "type": "partial"
+            }
         except Exception as e:
-            print(f"Transcription error: {e}")
+            print(f"Partial transcription error: {e}")
+            return None
+        finally:
+            state.in_flight = False
     
-    def _pcm_to_wav(self, pcm_data: bytes) -> bytes:
-        """Convert PCM data to WAV format for whisper.cpp API"""
+    def _claim_partial_state(self, user_id, utterance: Utterance) -> Optional[PartialTranscriptState]:
+        """Take the partial-transcript state of a closed utterance, if partials were sent for it"""
+        state = self.partial_states.get(user_id)
+        if state is None or state.utterance_index != utterance.index:
+            return None
+        del self.partial_states[user_id]
+        state.finalized = True
+        return state
+    
+    @staticmethod
+    def _segment_id(user_id, utterance: Utterance):
+        return (user_id, utterance.index, utterance.ended_at)
+    
+    async def _transcribe_audio(self, utterance: Utterance, user_id=None,
+                                state: Optional[PartialTranscriptState] = None):
+        """Send an utterance to whisper.cpp for transcription"""
         try:
-            # Convert 16-bit PCM to numpy array and resample
-            audio_array = self._pcm_to_float32(pcm_data)
-            if audio_array is None:
+            # This runs once the dispatcher has a free slot: apply the overload policy
+            duration = utterance.samples.size / self.target_sample_rate
+            decision = self.overload.dequeue(user_id, self._segment_id(user_id, utterance),
+                                             duration, utterance.ended_at, time.time())
+            # Taken first so audio carried for this segment never outlives it
+            carried = self.merge_carry.pop(user_id, None)
+            if decision in (SHED, DROP):
+                if carried is not None:
+                    # Older than the segment being discarded, so it goes too
+                    self.overload.record_discarded_carry(decision, carried.size / self.target_sample_rate)
                 return None
             
-            # Convert float32 back to 16-bit PCM for WAV
-            audio_int16 = (audio_array * 32767).astype(np.int16)
+            samples = utterance.samples
+            if decision == MERGE:
+                # Ride along with this speaker's next queued segment
+                self.merge_carry[user_id] = np.concatenate((carried, samples)) if carried is not None else samples
+                return None
             
-            # Create WAV header
-            sample_rate = 16000  # whisper.cpp expects 16kHz
-            num_channels = 1
-            bits_per_sample = 16
-            byte_rate = sample_rate * num_channels * bits_per_sample // 8
-            block_align = num_channels * bits_per_sample // 8
-            data_size = len(audio_int16) * 2  # 2 bytes per sample
+            window_start = state.window_start if state else 0
+            if carried is not None:
+                # Merged audio is transcribed whole, so partial windows no longer apply
+                samples, state, window_start = np.concatenate((carried, samples)), None, 0
             
-            # WAV header (44 bytes)
-            wav_header = struct.pack('<4sI4s4sIHHIIHH4sI',
-                b'RIFF', 36 + data_size, b'WAVE', b'fmt ', 16,
-                1, num_channels, sample_rate, byte_rate, block_align, bits_per_sample,
-                b'data', data_size
-            )
+            # With partials already sent, only the last window still needs transcribing
+            base_url = self.overload.degraded_base_url if decision == DEGRADE else None
+            text = await self._request_transcription(samples[window_start:], base_url)
+            if text and state:
+                text = state.merger.finalize(text)
             
-            # Combine header and audio data
-            wav_data = wav_header + audio_int16.tobytes()
+            if text:
+                self.overload.record_delivery(utterance.ended_at, duration, time.time())
+                
+                # Create transcription result
+                return {
+                    "text": text,
+                    "start": 0,
+                    "end": samples.size / self.target_sample_rate,
+                    "speech_ended_at": utterance.ended_at,
+                    "completed": True,
+                    "uid": self.uid,
+                    "user_id": user_id,
+                    "type": "final"
+                }
             
-            return wav_data
         except Exception as e:
-            print(f"PCM to WAV conversion error: {e}")
-            return None
+            print(f"Transcription error: {e}")
+        return None
     
-    async def send_audio(self, audio_chunk: bytes):
-        """Buffer audio chunk for periodic transcription"""
+    def _emit(self, transcription: dict):
+        """Push a transcription to every subscriber, including transcription_queue"""
+        self.hub.publish(transcription)
+        if transcription.get("completed"):
+            self.last_transcription_time = time.time()
+    
+    def get_dispatch_stats(self) -> dict:
+        """Queue depth and in-flight gauges of the /asr segment dispatcher, plus shed audio"""
+        return {**self.dispatcher.stats(), **self.overload.stats(),
+                "ring_buffer_dropped_samples": self.streams.dropped_samples(),
+                "backends": self.backends.stats()}
+    
+    def push_audio(self, audio_chunk: bytes, user_id=None, is_speech: bool = True,
+                   sample_rate: Optional[int] = None) -> bool:
+        """Resample a mono chunk and feed it to the speaker's endpointer (thread-safe)"""
         if self.connected and len(audio_chunk) > 0:
             try:
-                with self.buffer_lock:
-                    self.audio_buffer.write(audio_chunk)
+                if self.streams.get(user_id).append(audio_chunk, is_speech, sample_rate=sample_rate):
+                    self._wake()
                 return True
             except Exception as e:
                 print(f"Error buffering audio: {e}")
                 return False
         return False
     
-    def _pcm_to_float32(self, pcm_data: bytes) -> np.ndarray:
-        """Convert PCM bytes to float32 numpy array and resample to 16kHz"""
-        try:
-            # Convert 16-bit PCM to numpy array
-            if len(pcm_data) < 2:
-                return None
-            
-            # Unpack as 16-bit signed integers  
-            samples = struct.unpack(f'<{len(pcm_data)//2}h', pcm_data)
-            
-            # Convert to float32 and normalize to [-1, 1]
-            audio_array = np.array(samples, dtype=np.float32) / 32768.0
-            
-            # Resample from 48kHz (Discord) to 16kHz (WhisperLive requirement)
-            # Simple downsampling: take every 3rd sample (48000/16000 = 3)
-            resampled_array = audio_array[::3]
-            
-            return resampled_array
-            
-        except Exception as e:
-            print(f"PCM to float32 conversion error: {e}")
-            return None
+    async def send_audio(self, audio_chunk: bytes, user_id=None, is_speech: bool = True,
+                         sample_rate: Optional[int] = None):
+        """Async wrapper around push_audio"""
+        return self.push_audio(audio_chunk, user_id, is_speech, sample_rate)
     
     def get_transcription(self):
         """Get latest transcription if available"""
-        if not self.transcription_queue.empty():
-            return self.transcription_queue.get()
-        return None
+        try:
+            return self.transcription_queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return None
+    
+    async def next_transcription(self):
+        """Wait for the next transcription; None once the client has disconnected"""
+        return await self.transcription_queue.get()
+    
+    async def transcriptions(self) -> AsyncIterator[dict]:
+        """Async iterator over transcriptions until the client disconnects"""
+        async for transcription in self.transcription_queue:
+            yield transcription
     
-    def test_connection(self):
+    def subscribe(self, user_id=None, types=None) -> TranscriptionSubscription:
+        """Push-based stream of transcriptions, optionally for one user and/or result types"""
+        return self.hub.subscribe(user_id, types)
+    
+    async def test_connection(self):
         """Test basic connectivity to STT service"""
         try:
-            response = httpx.get(f"http://{self.host}:{self.port}/docs", timeout=self.connection_timeout)
-            return response.status_code == 200
+            return await self.backends.check_all(self.client, self.connection_timeout) > 0
         except Exception as e:
             print(f"STT connection test failed: {e}")
             return False
     
-    def disconnect(self):
-        """Clean disconnect"""
+    async def disconnect(self):
+        """Cancel the processing task, including in-flight requests, and close the HTTP client"""
         self.connected = False
-        self.processing_active = False
         
-        try:
-            if self.processing_thread and self.processing_thread.is_alive():
-                self.processing_thread.join(timeout=5)
-                if self.processing_thread.is_alive():
-                    print("Warning: STT processing thread did not terminate cleanly")
-        except Exception as e:
-            print(f"Error joining STT processing thread: {e}")
+        if self.processing_task:
+            self.processing_task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self.processing_task
+            self.processing_task = None
+        await self.dispatcher.cancel_all()
+        await self.backends.stop_probing()
+        
+        # End every subscriber's transcription stream
+        self.hub.close()
         
         try:
-            # Use a new event loop for cleanup
-            loop = asyncio.new_event_loop()
-            loop.run_until_complete(self.client.aclose())
-            loop.close()
+            await self.client.aclose()
         except Exception as e:
             print(f"Error closing HTTP client: {e}")
     
@@ -266,19 +463,34 @@ class WhisperLiveClient:
                 "port": 9000,
                 "model": "small",
                 "language": "en",
-                "task": "transcribe"
+                "task": "transcribe",
+                "upload_format": "wav",
+                "max_in_flight": 2
             },
             "vad": {
                 "enabled": True,
-                "min_silence_duration_ms": 1000,
+                "min_silence_duration_ms": 800,
                 "min_speech_duration_ms": 250,
                 "max_speech_duration_s": 30,
                 "speech_pad_ms": 200,
                 "threshold": 0.5
             },
+            "streaming": {
+                "enabled": False,
+                "partial_interval_ms": 1000,
+                "overlap_s": 0.5
+            },
+            "backpressure": {
+                "max_backlog_s_per_speaker": 20,
+                "stale_after_s": 8,
+                "stale_policy": "merge",
+                "degraded_base_url": None,
+                "bridge_queue_max_utterances": 20
+            },
             "timeouts": {
                 "segment_timeout_s": 3.0,
                 "monitor_interval_s": 0.5,
-                "connection_timeout_s": 5.0
+                "connection_timeout_s": 5.0,
+                "stream_idle_timeout_s": 30.0
             }
         }
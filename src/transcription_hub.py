@@ -0,0 +1,89 @@
+"""
+Transcription Hub - push delivery of transcripts to async subscribers
+
+The STT client publishes every partial and final transcript to the hub the
+moment it is ready, and each subscriber awaits its own queue instead of
+polling. Subscriptions can be limited to one Discord user and/or to certain
+result types, are bounded (the oldest undelivered transcript is dropped when
+a slow consumer falls behind) and end cleanly when closed, either one at a
+time or all together when the client disconnects.
+"""
+
+import asyncio
+import logging
+from typing import Hashable, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class TranscriptionSubscription(asyncio.Queue):
+    """Bounded queue of transcripts for one consumer; iterate it with `async for`"""
+
+    def __init__(self, hub: 'TranscriptionHub', user_id: Optional[Hashable] = None,
+                 types: Optional[Iterable[str]] = None, maxsize: int = 100):
+        super().__init__(maxsize)
+        self.hub = hub
+        self.user_id = user_id
+        self.types = set(types) if types else None
+        self.closed = False
+        self.dropped = 0
+
+    def matches(self, transcription: dict) -> bool:
+        if self.user_id is not None and transcription.get("user_id") != self.user_id:
+            return False
+        return self.types is None or transcription.get("type") in self.types
+
+    def put_nowait(self, item):
+        """Enqueue without blocking, dropping the oldest transcript if the consumer is behind"""
+        if self.full():
+            self.get_nowait()
+            self.dropped += 1
+        super().put_nowait(item)
+
+    def close(self):
+        """Stop the subscription; pending iteration ends after queued transcripts"""
+        if self.closed:
+            return
+        self.closed = True
+        self.hub.unsubscribe(self)
+        self.put_nowait(None)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> dict:
+        transcription = await self.get()
+        if transcription is None:
+            raise StopAsyncIteration
+        return transcription
+
+
+class TranscriptionHub:
+    """Fans published transcripts out to every matching subscription"""
+
+    def __init__(self):
+        self.subscriptions: List[TranscriptionSubscription] = []
+        self.published = 0
+
+    def subscribe(self, user_id: Optional[Hashable] = None, types: Optional[Iterable[str]] = None,
+                  maxsize: int = 100) -> TranscriptionSubscription:
+        """Subscribe to transcripts, optionally for one user and/or certain types ("partial", "final")"""
+        subscription = TranscriptionSubscription(self, user_id, types, maxsize)
+        self.subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: TranscriptionSubscription):
+        if subscription in self.subscriptions:
+            self.subscriptions.remove(subscription)
+
+    def publish(self, transcription: dict):
+        """Deliver a transcript to every matching subscriber (call from the event loop)"""
+        self.published += 1
+        for subscription in self.subscriptions:
+            if subscription.matches(transcription):
+                subscription.put_nowait(transcription)
+
+    def close(self):
+        """End every subscription"""
+        for subscription in list(self.subscriptions):
+            subscription.close()
@@ -0,0 +1,271 @@
+"""
+Transcription Stream - one real-time WebSocket transcription session
+
+A voice-mode client streams audio to the bridge's WebSocket endpoint as
+binary messages (raw s16le PCM at any rate, or one Opus packet per message)
+and receives JSON transcripts as they are produced:
+
+    {"type": "ready", "session_id": ...}
+    {"type": "partial", "text": ..., "stable_text": ..., "unstable_text": ...}
+    {"type": "final", "text": ..., "start": ..., "end": ...}
+    {"type": "error", "detail": ...}
+
+Sending the text message {"type": "end"} flushes the open utterance and
+closes the session after its last final. Audio goes through the same
+resampler, endpointer, partial-window and whisper plumbing as the rest of the
+bridge. Flow control is per connection: inbound audio waits in a small
+bounded queue and the socket is not read while it is full, so a client that
+sends faster than we can process is slowed down by TCP instead of buffering
+without limit; at most max_in_flight whisper requests run per stream.
+"""
+
+import asyncio
+import json
+import logging
+import time
+import uuid
+from typing import Dict, Optional
+
+import numpy as np
+
+from .audio_dsp import pcm16_to_array, rms_energy
+from .endpointer import Utterance, UtteranceEndpointer
+from .partial_transcripts import PartialTranscriptState
+from .resampler import PolyphaseResampler
+from .segment_dispatcher import SegmentDispatcher
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+
+
+class TranscriptionStreamSession:
+    """Reader, processor and sender tasks for one WebSocket transcription stream"""
+
+    def __init__(self, bridge, websocket, encoding: str = 'pcm', sample_rate: int = 48000,
+                 language: Optional[str] = None, queue_chunks: int = 50, max_in_flight: int = 2):
+        if encoding not in ('pcm', 'opus'):
+            raise ValueError(f"Unsupported stream encoding: {encoding}")
+
+        self.session_id = str(uuid.uuid4())
+        self.bridge = bridge
+        self.websocket = websocket
+        self.encoding = encoding
+        self.language = language
+
+        stt_config = bridge.config
+        self.energy_threshold = stt_config.get('audio', {}).get('energy_threshold', 50)
+        self.endpointer = UtteranceEndpointer.from_config(
+            stt_config.get('vad', {}), SAMPLE_RATE,
+            stt_config.get('audio', {}).get('buffer_capacity_s', 60.0),
+            stt_config.get('timeouts', {}).get('segment_timeout_s', 8.0)
+        )
+
+        if encoding == 'opus':
+            # Opus is decoded straight to 16kHz mono; no resampling needed
+            from .opus_decoding import mono_decoder_class
+            self.decoder = mono_decoder_class(SAMPLE_RATE)()
+            self.resampler = None
+        else:
+            self.decoder = None
+            self.resampler = PolyphaseResampler(sample_rate, SAMPLE_RATE)
+
+        streaming_config = stt_config.get('streaming', {})
+        self.partials_enabled = streaming_config.get('enabled', False)
+        self.partial_interval = streaming_config.get('partial_interval_ms', 1000) / 1000.0
+        self.partial_overlap = streaming_config.get('overlap_s', 0.5)
+        self.partial_state: Optional[PartialTranscriptState] = None
+
+        # Flow control
+        self.inbound: asyncio.Queue = asyncio.Queue(maxsize=queue_chunks)
+        self.outbound: asyncio.Queue = asyncio.Queue()
+        self.dispatcher = SegmentDispatcher(self.outbound.put_nowait, max_in_flight=max_in_flight)
+
+        # Stats
+        self.started_at = time.time()
+        self.stream_samples = 0  # 16kHz samples received, for transcript offsets
+        self.utterance_starts: Dict[int, int] = {}
+        self.bytes_received = 0
+        self.decode_errors = 0
+        self.finals_sent = 0
+        self.partials_sent = 0
+
+    async def run(self):
+        """Serve the stream until the client ends it or disconnects"""
+        await self.websocket.send_json({"type": "ready", "session_id": self.session_id})
+
+        sender = asyncio.create_task(self._send_loop())
+        processor = asyncio.create_task(self._process_loop())
+        ended = False
+        try:
+            ended = await self._read_loop()
+            if ended:
+                # Client sent "end": flush what was received and deliver the last finals
+                await self.inbound.put(None)
+                await processor
+                await self.dispatcher.drain()
+        finally:
+            processor.cancel()
+            await asyncio.gather(processor, return_exceptions=True)
+            await self.dispatcher.cancel_all()
+            self.outbound.put_nowait(None)
+            await asyncio.gather(sender, return_exceptions=True)
+
+        if ended:
+            await self.websocket.close()
+
+    async def _read_loop(self) -> bool:
+        """Receive audio until the client ends the stream (True) or disconnects (False)"""
+        while True:
+            message = await self.websocket.receive()
+            if message.get('type') == 'websocket.disconnect':
+                return False
+
+            if message.get('bytes') is not None:
+                self.bytes_received += len(message['bytes'])
+                # Blocks while the processor is behind, which stops reading the socket
+                await self.inbound.put(message['bytes'])
+            elif message.get('text') is not None:
+                try:
+                    control = json.loads(message['text'])
+                except ValueError:
+                    control = {}
+                if control.get('type') == 'end':
+                    return True
+
+    async def _process_loop(self):
+        """Decode, endpoint and dispatch audio; polls the endpointer when audio stops"""
+        while True:
+            deadline = self.endpointer.next_deadline()
+            timeout = max(deadline - time.time(), 0.0) if deadline is not None else None
+            try:
+                chunk = await asyncio.wait_for(self.inbound.get(), timeout)
+            except asyncio.TimeoutError:
+                self._dispatch_final(self.endpointer.poll())
+                continue
+
+            if chunk is None:
+                self._dispatch_final(self.endpointer.flush())
+                return
+
+            try:
+                samples = self._decode(chunk)
+            except Exception as e:
+                self.decode_errors += 1
+                logger.debug(f"Stream {self.session_id} decode error: {e}")
+                continue
+            if samples.size == 0:
+                continue
+
+            is_speech = rms_energy(samples.tobytes()) >= self.energy_threshold
+            for utterance in self.endpointer.push(samples, is_speech):
+                self._dispatch_final(utterance)
+            self.stream_samples += samples.size
+            if self.endpointer.in_utterance and self.endpointer.utterance_index not in self.utterance_starts:
+                # Stream offset of the utterance's first buffered sample (including pre-roll)
+                self.utterance_starts[self.endpointer.utterance_index] = (
+                    self.stream_samples - len(self.endpointer.buffer)
+                )
+            self._maybe_dispatch_partial()
+
+    def _decode(self, chunk: bytes) -> np.ndarray:
+        if self.decoder is not None:
+            return pcm16_to_array(self.decoder.decode(chunk)).copy()
+        return self.resampler.process_pcm16(chunk)
+
+    def _dispatch_final(self, utterance: Optional[Utterance]):
+        """Send a closed utterance to whisper; results are emitted in spoken order"""
+        if utterance is None:
+            return
+        state = self.partial_state
+        if state is None or state.utterance_index != utterance.index:
+            state = None
+        else:
+            state.finalized = True
+        self.partial_state = None
+
+        start = self.utterance_starts.pop(utterance.index, self.stream_samples) / SAMPLE_RATE
+        end = start + utterance.samples.size / SAMPLE_RATE
+        self.dispatcher.submit(self._transcribe_final(utterance, state, start, end))
+
+    def _maybe_dispatch_partial(self):
+        """Send a window of the open utterance if a partial hypothesis is due"""
+        if not self.partials_enabled or not self.endpointer.in_utterance:
+            return
+        # Partials are skipped while finals are waiting for a request slot
+        if self.dispatcher.queue_depth:
+            return
+
+        index = self.endpointer.utterance_index
+        if self.partial_state is None or self.partial_state.utterance_index != index:
+            self.partial_state = PartialTranscriptState(
+                index, SAMPLE_RATE, self.partial_interval, self.partial_overlap
+            )
+        state = self.partial_state
+        open_samples = self.endpointer.open_samples()
+        window = state.next_window(open_samples.size)
+        if window is None:
+            return
+
+        state.in_flight = True
+        samples = open_samples[window[0]:window[1]].copy()
+        self.dispatcher.submit(self._transcribe_partial(state, samples), ordered=False)
+
+    async def _transcribe_partial(self, state: PartialTranscriptState, samples: np.ndarray):
+        try:
+            result = await self.bridge._transcribe_audio_result(samples.tobytes(), self.language, SAMPLE_RATE)
+            text = result.get('text', '').strip() if result else ""
+            if not text or state.finalized:
+                return None
+            stable, unstable = state.merger.update(text)
+            self.partials_sent += 1
+            return {
+                "type": "partial",
+                "text": f"{stable} {unstable}".strip(),
+                "stable_text": stable,
+                "unstable_text": unstable
+            }
+        finally:
+            state.in_flight = False
+
+    async def _transcribe_final(self, utterance: Utterance, state: Optional[PartialTranscriptState],
+                                start: float, end: float):
+        window_start = state.window_start if state else 0
+        result = await self.bridge._transcribe_audio_result(
+            utterance.samples[window_start:].tobytes(), self.language, SAMPLE_RATE
+        )
+        if result is None:
+            return {"type": "error", "detail": "transcription failed",
+                    "start": round(start, 3), "end": round(end, 3)}
+        text = result.get('text', '').strip()
+        if text and state:
+            text = state.merger.finalize(text)
+        if not text:
+            return None
+
+        self.finals_sent += 1
+        return {"type": "final", "text": text, "start": round(start, 3), "end": round(end, 3)}
+
+    async def _send_loop(self):
+        """Push transcripts to the client as they are released"""
+        while True:
+            message = await self.outbound.get()
+            if message is None:
+                return
+            try:
+                await self.websocket.send_json(message)
+            except Exception:
+                return  # Client went away; the reader will notice
+
+    def stats(self) -> dict:
+        return {
+            "encoding": self.encoding,
+            "age_s": time.time() - self.started_at,
+            "audio_s": self.stream_samples / SAMPLE_RATE,
+            "bytes_received": self.bytes_received,
+            "queued_chunks": self.inbound.qsize(),
+            "partials_sent": self.partials_sent,
+            "finals_sent": self.finals_sent,
+            "decode_errors": self.decode_errors,
+            **{f"dispatch_{key}": value for key, value in self.dispatcher.stats().items()}
+        }
@@ -1,4 +1,5 @@
 import requests
+import httpx
 import io
 from typing import Optional
 import time
@@ -10,18 +11,21 @@ class PiperTTSClient:
     def __init__(self, host="piper-tts", port=8080):
         self.base_url = f"http://{host}:{port}"
         self.voice = "en_GB-alba-medium"
+        # Sentences of one reply are synthesized back to back, so keep the connection alive
+        self.client: Optional[httpx.AsyncClient] = None
         
     async def synthesize(self, text: str) -> Optional[bytes]:
         """Convert text to speech"""
         try:
-            response = requests.post(
+            if self.client is None:
+                self.client = httpx.AsyncClient(timeout=10)
+            response = await self.client.post(
                 f"{self.base_url}/synthesize",
                 json={
                     "text": text,
                     "voice": self.voice,
                     "format": "wav"
-                },
-                timeout=10
+                }
             )
             
             if response.status_code == 200:
@@ -31,7 +35,7 @@ class PiperTTSClient:
                 logging.error(f"TTS Error: {response.status_code} - {response.text}")
                 return None
                 
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             logging.error(f"TTS Request Error: {e}")
             return None
     
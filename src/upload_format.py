@@ -0,0 +1,98 @@
+"""
+Upload Format - wire encodings for audio sent to the whisper /asr endpoint
+
+Audio is already 16kHz mono int16 by the time it is uploaded, so the choice
+of container only affects bytes on the wire and work on the server:
+
+- wav: 44-byte header plus samples; the webservice still runs ffmpeg on it
+- pcm: raw s16le with encode=false, which skips the server-side ffmpeg decode
+- flac: lossless, roughly half the size of PCM for speech; for remote STT
+  services where bandwidth matters more than the decode (needs soundfile)
+
+The format comes from `whisper.upload_format` in stt_config.json. If the
+server rejects a compact format (400/415/422), callers downgrade the encoder
+to WAV. A 500 may just be a transient server fault, so that request is
+retried once as WAV and the encoder is only downgraded if the retry works.
+"""
+
+import io
+import logging
+from typing import Optional, Tuple
+
+import numpy as np
+
+from .audio_dsp import PCM_DTYPE, pcm_to_wav
+
+try:
+    import soundfile
+except ImportError:  # Optional: only needed for FLAC uploads
+    soundfile = None
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_FORMATS = ('wav', 'pcm', 'flac')
+
+# Statuses meaning the server could not take the upload's format
+REJECTED_STATUSES = (400, 415, 422)
+
+# encode=false makes the webservice read the body as 16kHz mono s16le
+RAW_PCM_SAMPLE_RATE = 16000
+
+
+class UploadEncoder:
+    """Encodes 16-bit mono samples into /asr multipart files and query params"""
+
+    def __init__(self, upload_format: str = 'wav', sample_rate: int = 16000):
+        self.sample_rate = sample_rate
+        self.requested_format = upload_format
+        self.format = self._supported_format(upload_format)
+        self.bytes_uploaded = 0
+
+    @classmethod
+    def from_config(cls, whisper_config: dict, sample_rate: int = 16000) -> 'UploadEncoder':
+        """Build an encoder from the `whisper` config section"""
+        return cls(whisper_config.get('upload_format', 'wav'), sample_rate)
+
+    def _supported_format(self, upload_format: str) -> str:
+        """Resolve the configured format, falling back to WAV when it cannot be used"""
+        if upload_format not in UPLOAD_FORMATS:
+            logger.warning(f"Unknown upload_format '{upload_format}', using wav")
+            return 'wav'
+        if upload_format == 'flac' and soundfile is None:
+            logger.warning("upload_format 'flac' needs the soundfile package, using wav")
+            return 'wav'
+        if upload_format == 'pcm' and self.sample_rate != RAW_PCM_SAMPLE_RATE:
+            logger.warning(f"Raw PCM uploads must be {RAW_PCM_SAMPLE_RATE}Hz, using wav")
+            return 'wav'
+        return upload_format
+
+    def encode(self, samples: np.ndarray, upload_format: Optional[str] = None) -> Tuple[dict, dict]:
+        """Return (files, params) for an /asr request carrying `samples` (in `upload_format` if given)"""
+        samples = np.asarray(samples, dtype=PCM_DTYPE)
+        upload_format = upload_format or self.format
+
+        if upload_format == 'pcm':
+            body = samples.tobytes()
+            files = {'audio_file': ('audio.pcm', body, 'application/octet-stream')}
+            params = {'encode': 'false'}
+        elif upload_format == 'flac':
+            buffer = io.BytesIO()
+            soundfile.write(buffer, samples, self.sample_rate, format='FLAC', subtype='PCM_16')
+            body = buffer.getvalue()
+            files = {'audio_file': ('audio.flac', body, 'audio/flac')}
+            params = {}
+        else:
+            body = pcm_to_wav(samples, sample_rate=self.sample_rate)
+            files = {'audio_file': ('audio.wav', body, 'audio/wav')}
+            params = {}
+
+        self.bytes_uploaded += len(body)
+        return files, params
+
+    def downgrade(self, status_code: Optional[int] = None) -> bool:
+        """Fall back to WAV after the server rejected a compact upload; False if already WAV"""
+        if self.format == 'wav':
+            return False
+        logger.warning(f"STT service rejected {self.format} upload ({status_code}), falling back to wav")
+        self.format = 'wav'
+        return True
@@ -0,0 +1,187 @@
+"""
+Spectral VAD - adaptive-noise-floor voice activity detection per speaker
+
+A fixed RMS threshold lets keyboard clicks, fans and mic hiss through, and all
+of it ends up buffered and uploaded to whisper. SpectralVAD instead compares
+each frame against a noise floor it learns for the speaker and requires the
+frame to look like voice:
+
+- SNR: frame energy must exceed the tracked noise floor by snr_threshold_db
+- Band energy: enough of the spectrum must sit in the speech band
+- Zero-crossing rate: hiss and clicks cross zero far more often than voice
+
+The noise floor is a minimum-statistics estimate: the quietest frame of the
+last noise_window_s, which it follows straight down but rises towards at no
+more than noise_rise_db_per_s, whether or not frames are classified as
+voiced. A steady noise that appears therefore stops counting as speech
+within a couple of seconds, while the pauses between words keep the floor
+from climbing to speech level. Digital silence is left out of the estimate so
+it cannot pin the floor far below any real noise.
+
+A hangover keeps the decision on for a few frames after speech so word
+endings are not clipped. Frame features are computed with one rfft per frame.
+"""
+
+import logging
+from collections import deque
+from typing import Dict, Hashable, Optional, Tuple
+
+import numpy as np
+
+from .audio_dsp import PCMLike, int16_to_float32, pcm16_to_array
+
+logger = logging.getLogger(__name__)
+
+DIGITAL_SILENCE_DB = -90.0  # Frames below this are (near-)zero samples, not room noise
+
+
+class SpectralVAD:
+    """Voice activity detector with per-speaker noise floor tracking and hangover"""
+
+    def __init__(self, sample_rate: int = 48000,
+                 snr_threshold_db: float = 9.0,
+                 noise_window_s: float = 1.0,
+                 noise_rise_db_per_s: float = 20.0,
+                 speech_band_hz: Tuple[float, float] = (200.0, 4000.0),
+                 min_band_ratio: float = 0.4,
+                 zcr_max: float = 0.35,
+                 hangover_ms: float = 200,
+                 min_energy: float = 50.0,
+                 frame_ms: float = 20.0):
+        self.sample_rate = sample_rate
+        self.snr_threshold_db = snr_threshold_db
+        self.noise_rise_db_per_s = noise_rise_db_per_s
+        self.speech_band_hz = speech_band_hz
+        self.min_band_ratio = min_band_ratio
+        self.zcr_max = zcr_max
+        self.hangover_frames = int(round(hangover_ms / frame_ms))
+        self.min_energy_db = 20 * np.log10(max(min_energy, 1e-3) / 32768.0)
+
+        # Adaptive state
+        self.noise_floor_db: Optional[float] = None
+        self._recent_energy: deque = deque(maxlen=max(int(round(noise_window_s * 1000 / frame_ms)), 1))
+        self.hangover_remaining = 0
+        self._band_masks: Dict[int, np.ndarray] = {}
+
+        # Statistics (in seconds of audio)
+        self.seconds_total = 0.0
+        self.seconds_rejected = 0.0
+
+    @classmethod
+    def from_config(cls, vad_config: dict, sample_rate: int, energy_threshold: float = 50.0) -> 'SpectralVAD':
+        """Build a VAD from the `vad` config section"""
+        return cls(
+            sample_rate,
+            snr_threshold_db=vad_config.get('snr_threshold_db', 9.0),
+            noise_window_s=vad_config.get('noise_window_s', 1.0),
+            noise_rise_db_per_s=vad_config.get('noise_rise_db_per_s', 20.0),
+            speech_band_hz=tuple(vad_config.get('speech_band_hz', (200.0, 4000.0))),
+            min_band_ratio=vad_config.get('min_band_ratio', 0.4),
+            zcr_max=vad_config.get('zcr_max', 0.35),
+            hangover_ms=vad_config.get('hangover_ms', 200),
+            min_energy=energy_threshold
+        )
+
+    def is_speech(self, pcm_data: PCMLike) -> bool:
+        """Classify one mono 16-bit PCM frame, updating the noise floor"""
+        samples = pcm16_to_array(pcm_data)
+        if samples.size < 2:
+            return False
+
+        audio = int16_to_float32(samples)
+        duration = samples.size / self.sample_rate
+        self.seconds_total += duration
+
+        energy_db, band_ratio, zcr = self._features(audio)
+        noise_floor_db = self.noise_floor_db if self.noise_floor_db is not None else energy_db
+
+        voiced = (
+            energy_db > self.min_energy_db
+            and energy_db - noise_floor_db > self.snr_threshold_db
+            and band_ratio >= self.min_band_ratio
+            and zcr <= self.zcr_max
+        )
+
+        self._update_noise_floor(energy_db, duration)
+
+        if voiced:
+            self.hangover_remaining = self.hangover_frames
+            return True
+        if self.hangover_remaining > 0:
+            self.hangover_remaining -= 1
+            return True
+
+        self.seconds_rejected += duration
+        return False
+
+    def _features(self, audio: np.ndarray) -> Tuple[float, float, float]:
+        """Frame energy (dBFS), speech-band energy ratio and zero-crossing rate"""
+        power = np.dot(audio, audio) / audio.size
+        energy_db = 10 * np.log10(power + 1e-12)
+
+        spectrum = np.abs(np.fft.rfft(audio * np.hanning(audio.size))) ** 2
+        band_mask = self._band_mask(audio.size)
+        total = spectrum.sum()
+        band_ratio = spectrum[band_mask].sum() / total if total > 0 else 0.0
+
+        signs = np.signbit(audio)
+        zcr = np.count_nonzero(signs[1:] != signs[:-1]) / (audio.size - 1)
+
+        return float(energy_db), float(band_ratio), float(zcr)
+
+    def _band_mask(self, frame_size: int) -> np.ndarray:
+        """rfft bins inside the speech band, cached per frame size"""
+        mask = self._band_masks.get(frame_size)
+        if mask is None:
+            frequencies = np.fft.rfftfreq(frame_size, d=1.0 / self.sample_rate)
+            low, high = self.speech_band_hz
+            mask = self._band_masks[frame_size] = (frequencies >= low) & (frequencies <= high)
+        return mask
+
+    def _update_noise_floor(self, energy_db: float, duration: float):
+        """Follow the windowed minimum energy: straight down, up at a bounded rate"""
+        if energy_db < DIGITAL_SILENCE_DB:
+            return  # Digital silence says nothing about the room's noise
+        self._recent_energy.append(energy_db)
+        target = min(self._recent_energy)
+
+        if self.noise_floor_db is None or target < self.noise_floor_db:
+            self.noise_floor_db = target
+        else:
+            self.noise_floor_db = min(target, self.noise_floor_db + self.noise_rise_db_per_s * duration)
+
+    @property
+    def rejected_fraction(self) -> float:
+        """Fraction of audio seen so far that was classified as non-speech"""
+        return self.seconds_rejected / self.seconds_total if self.seconds_total else 0.0
+
+
+class SpeakerVADs:
+    """Lazily-created SpectralVAD per speaker, with aggregate rejection metrics"""
+
+    def __init__(self, vad_config: dict, sample_rate: int, energy_threshold: float = 50.0):
+        self.vad_config = vad_config
+        self.sample_rate = sample_rate
+        self.energy_threshold = energy_threshold
+        self.vads: Dict[Hashable, SpectralVAD] = {}
+
+    def is_speech(self, user: Hashable, pcm_data: PCMLike, sample_rate: Optional[int] = None) -> bool:
+        """Classify a frame with the speaker's own VAD"""
+        vad = self.vads.get(user)
+        if vad is None:
+            vad = self.vads[user] = SpectralVAD.from_config(
+                self.vad_config, sample_rate or self.sample_rate, self.energy_threshold
+            )
+        return vad.is_speech(pcm_data)
+
+    def stats(self) -> dict:
+        """Seconds seen and rejected across all speakers"""
+        vads = list(self.vads.values())
+        total = sum(vad.seconds_total for vad in vads)
+        rejected = sum(vad.seconds_rejected for vad in vads)
+        return {
+            "speakers": len(vads),
+            "seconds_total": total,
+            "seconds_rejected": rejected,
+            "rejected_fraction": rejected / total if total else 0.0
+        }